@@ -0,0 +1,41 @@
+"""Benchmarks of the harmonic analysis."""
+import datetime
+import numpy as np
+import uptide
+from .common import CONSTITUENTS
+
+
+class HarmonicAnalysis:
+    params = [[30, 365], [4, 8]]
+    param_names = ['ndays', 'nconstituents']
+
+    def setup(self, ndays, nconstituents):
+        self.tide = uptide.Tides(CONSTITUENTS[:nconstituents])
+        self.tide.set_initial_time(datetime.datetime(2020, 3, 1))
+        self.t = np.arange(0., ndays*86400., 600.)
+        rng = np.random.default_rng(0)
+        amplitudes, phases = rng.random((2, nconstituents))
+        self.eta = self.tide.from_amplitude_phase(amplitudes, phases, self.t) + 0.01*rng.standard_normal(len(self.t))
+        self.etas = self.eta[:, None] + 0.01*rng.standard_normal((len(self.t), 100))
+
+    def time_harmonic_analysis(self, ndays, nconstituents):
+        uptide.harmonic_analysis(self.tide, self.eta, self.t)
+
+    def time_harmonic_analysis_100_signals(self, ndays, nconstituents):
+        uptide.harmonic_analysis(self.tide, self.etas, self.t)
+
+
+class ParallelHarmonicAnalysis:
+    params = [[1, 4]]
+    param_names = ['max_workers']
+    timeout = 300
+
+    def setup(self, max_workers):
+        self.tide = uptide.Tides(CONSTITUENTS)
+        self.tide.set_initial_time(datetime.datetime(2020, 3, 1))
+        self.t = np.arange(0., 60*86400., 600.)
+        rng = np.random.default_rng(0)
+        self.etas = rng.standard_normal((1000, len(self.t)))
+
+    def time_parallel_harmonic_analysis(self, max_workers):
+        uptide.parallel_harmonic_analysis(self.tide, self.etas, self.t, max_workers=max_workers)
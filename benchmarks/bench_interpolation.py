@@ -0,0 +1,82 @@
+"""Benchmarks of loading tidal databases, and interpolating from them, using synthetic NetCDF files."""
+import datetime
+import uptide
+from uptide.netcdf_reader import file_pool
+from uptide.tidal_netcdf import AMCGTidalInterpolator, TPXOTidalInterpolator
+from .common import CONSTITUENTS, amcg_file, tpxo_files, random_points
+
+AMCG_RANGES = ((50., 60.), (-10., 5.))
+TPXO_RANGES = ((350., 365.), (50., 60.))
+
+
+def _tide():
+    tide = uptide.Tides(CONSTITUENTS)
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    return tide
+
+
+class Loading:
+    params = [['amcg', 'tpxo'], [100, 500]]
+    param_names = ['database', 'n']
+
+    def setup(self, database, n):
+        self.tide = _tide()
+        self.files = amcg_file(n) if database == 'amcg' else tpxo_files(n)
+
+    def time_load(self, database, n):
+        if isinstance(self.files, tuple):
+            tnci = TPXOTidalInterpolator(self.tide, *self.files)
+        else:
+            tnci = AMCGTidalInterpolator(self.tide, self.files)
+        tnci.close()
+        # make sure the files are opened again in the next repeat
+        assert len(file_pool) == 0
+
+    def time_load_ranges(self, database, n):
+        if isinstance(self.files, tuple):
+            tnci = TPXOTidalInterpolator(self.tide, *self.files, ranges=((355., 360.), (53., 57.)))
+        else:
+            tnci = AMCGTidalInterpolator(self.tide, self.files, ranges=((53., 57.), (-5., 0.)))
+        tnci.close()
+
+
+class SetTime:
+    params = [[100, 500]]
+    param_names = ['n']
+
+    def setup(self, n):
+        self.tnci = TPXOTidalInterpolator(_tide(), *tpxo_files(n))
+        self.tnci.set_time(0.)
+
+    def teardown(self, n):
+        self.tnci.close()
+
+    def time_set_time(self, n):
+        self.tnci.set_time(3600.)
+
+
+class Interpolation:
+    params = [[1, 100, 10000]]
+    param_names = ['npoints']
+
+    def setup(self, npoints):
+        self.tnci = TPXOTidalInterpolator(_tide(), *tpxo_files(200))
+        self.tnci.set_time(3600.)
+        self.xs = random_points(npoints, TPXO_RANGES)
+        self.stencil = self.tnci.compute_stencil(self.xs)
+
+    def teardown(self, npoints):
+        self.tnci.close()
+
+    def time_get_val(self, npoints):
+        for x in self.xs:
+            self.tnci.get_val(x)
+
+    def time_get_vals(self, npoints):
+        self.tnci.get_vals(self.xs)
+
+    def time_get_vals_extrapolation(self, npoints):
+        self.tnci.get_vals(self.xs, allow_extrapolation=True)
+
+    def time_get_complex_components_stencil(self, npoints):
+        self.tnci.get_complex_components(self.xs, stencil=self.stencil)
@@ -0,0 +1,56 @@
+"""Benchmarks of the reconstruction of the tide from its constituents."""
+import datetime
+import numpy as np
+import uptide
+from .common import CONSTITUENTS
+
+
+# additional constituents for the reconstruction of larger sets
+_MORE_CONSTITUENTS = CONSTITUENTS + ('M4', 'MS4', 'MN4', '2N2', 'MU2', 'NU2', 'L2', 'T2')
+
+
+class Reconstruction:
+    params = [[100, 1000, 10000, 100000], [4, 8, 16]]
+    param_names = ['npoints', 'nconstituents']
+
+    def setup(self, npoints, nconstituents):
+        self.tide = uptide.Tides(_MORE_CONSTITUENTS[:nconstituents])
+        self.tide.set_initial_time(datetime.datetime(2020, 3, 1))
+        rng = np.random.default_rng(0)
+        self.real_parts, self.imag_parts = rng.random((2, nconstituents, npoints))
+        self.prepared = uptide.PreparedTides(self.tide, self.real_parts, self.imag_parts)
+        self.prepared.evaluate(0.)
+        self.prepared_einsum = uptide.PreparedTides(self.tide, self.real_parts, self.imag_parts, engine='einsum')
+        self.prepared_einsum.evaluate(0.)
+        self.out = np.empty(npoints)
+
+    def time_from_complex_components(self, npoints, nconstituents):
+        self.tide.from_complex_components(self.real_parts, self.imag_parts, 3600.)
+
+    def time_prepared_evaluate(self, npoints, nconstituents):
+        self.prepared.evaluate(3600.)
+
+    def time_prepared_evaluate_out(self, npoints, nconstituents):
+        self.prepared.evaluate(3600., out=self.out)
+
+    def time_prepared_evaluate_einsum(self, npoints, nconstituents):
+        self.prepared_einsum.evaluate(3600., out=self.out)
+
+
+class TimeSeries:
+    params = [[100, 10000]]
+    param_names = ['ntimes']
+
+    def setup(self, ntimes):
+        self.tide = uptide.Tides(CONSTITUENTS)
+        self.tide.set_initial_time(datetime.datetime(2020, 3, 1))
+        self.ts = np.arange(ntimes)*600.
+        rng = np.random.default_rng(0)
+        self.amplitudes, self.phases = rng.random((2, len(CONSTITUENTS), 50))
+        self.prepared = uptide.PreparedTides.from_amplitude_phase(self.tide, self.amplitudes, self.phases)
+
+    def time_from_amplitude_phase(self, ntimes):
+        self.tide.from_amplitude_phase(self.amplitudes[:, :, None], self.phases[:, :, None], self.ts)
+
+    def time_prepared_evaluate(self, ntimes):
+        self.prepared.evaluate(self.ts)
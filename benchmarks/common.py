@@ -0,0 +1,79 @@
+"""Synthetic NetCDF databases for the benchmarks, similar to the fixtures in tests/test_dummy_tidal_netcdf.py.
+The files are created once per benchmark process in a temporary directory."""
+import atexit
+import os
+import shutil
+import tempfile
+import netCDF4
+import numpy as np
+
+CONSTITUENTS = ('M2', 'S2', 'N2', 'K2', 'K1', 'O1', 'P1', 'Q1')
+
+_directory = None
+
+
+def _path(file_name):
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix='uptide_benchmarks_')
+        atexit.register(shutil.rmtree, _directory, True)
+    return os.path.join(_directory, file_name)
+
+
+def amcg_file(n):
+    """An AMCG file with an n x n grid, covering 50N-60N, 10W-5E, with amplitudes and phases of CONSTITUENTS."""
+    file_name = _path('amcg_{}.nc'.format(n))
+    if os.path.exists(file_name):
+        return file_name
+    lat = np.linspace(50., 60., n)
+    lon = np.linspace(-10., 5., n)
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    with netCDF4.Dataset(file_name, 'w') as ds:
+        ds.createDimension('latitude', n)
+        ds.createDimension('longitude', n)
+        ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+        ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+        for i, constituent in enumerate(CONSTITUENTS):
+            amp = ds.createVariable(constituent.lower() + 'amp', 'float64', ('latitude', 'longitude'))
+            amp[:] = (1. + 0.1*lat2d - 0.05*lon2d)/(i+1)
+            phase = ds.createVariable(constituent.lower() + 'phase', 'float64', ('latitude', 'longitude'))
+            phase[:] = 2.*lat2d + 3.*lon2d + i
+        mask = np.ones((n, n))
+        mask[:, :n//10] = 0.
+        ds.createVariable('mask', 'float64', ('latitude', 'longitude'))[:] = mask
+    return file_name
+
+
+def tpxo_files(n):
+    """A TPXO grid and elevation file with an n x n grid, covering 350E-365E, 50N-60N, with CONSTITUENTS."""
+    grid_file_name = _path('grid_{}.nc'.format(n))
+    data_file_name = _path('h_{}.nc'.format(n))
+    if os.path.exists(data_file_name):
+        return grid_file_name, data_file_name
+    lon = np.linspace(350., 365., n)
+    lat = np.linspace(50., 60., n)
+    lon2d, lat2d = np.meshgrid(lon, lat, indexing='ij')
+    with netCDF4.Dataset(grid_file_name, 'w') as ds:
+        ds.createDimension('nx', n)
+        ds.createDimension('ny', n)
+        ds.createVariable('lon_z', 'float64', ('nx', 'ny'))[:] = lon2d
+        ds.createVariable('lat_z', 'float64', ('nx', 'ny'))[:] = lat2d
+        mz = np.ones((n, n), dtype=np.int32)
+        mz[:n//10, :] = 0
+        ds.createVariable('mz', np.int32, ('nx', 'ny'))[:] = mz
+    with netCDF4.Dataset(data_file_name, 'w') as ds:
+        ds.createDimension('nx', n)
+        ds.createDimension('ny', n)
+        ds.createDimension('nc', len(CONSTITUENTS))
+        ds.createDimension('nct', 4)
+        ds.createVariable('con', 'c', ('nc', 'nct'))[:] = [c.ljust(4) for c in CONSTITUENTS]
+        k = np.arange(len(CONSTITUENTS))[:, None, None]
+        ds.createVariable('hRe', 'float64', ('nc', 'nx', 'ny'))[:] = np.cos(lon2d + k)/(k+1)
+        ds.createVariable('hIm', 'float64', ('nc', 'nx', 'ny'))[:] = np.sin(lat2d + k)/(k+1)
+    return grid_file_name, data_file_name
+
+
+def random_points(n, ranges, seed=0):
+    """n random points within ranges, a tuple of (min, max) for each coordinate, away from the boundary."""
+    rng = np.random.default_rng(seed)
+    return np.array([rng.uniform(x0 + 0.2*(x1-x0), x1 - 0.2*(x1-x0), n) for x0, x1 in ranges]).T
@@ -29,6 +29,31 @@ class TestAnalysis(unittest.TestCase):
             show()
         self.assertAlmostEqual(numpy.linalg.norm(x-y), 0.0, 5)
 
+    def test_parallel_harmonic_analysis(self):
+        tide = uptide.Tides(['M2', 'S2', 'K1', 'O1'])
+        tide.set_initial_time(datetime.datetime(2003, 1, 17, 19, 30))
+        trange = numpy.arange(0, 86400*30, 600)
+        a = numpy.random.random_sample((3, 5, 4))
+        p = numpy.random.random_sample((3, 5, 4))*2*math.pi
+        x = numpy.array([[tide.from_amplitude_phase(a[i, j], p[i, j], trange) for j in range(5)] for i in range(3)])
+        # a gap in one record, and a record without any data
+        x[1, 2, 100:200] = numpy.nan
+        x[2, 4, :] = numpy.nan
+        calls = []
+        a2, p2, failures = ua.parallel_harmonic_analysis(tide, x, trange, max_workers=2, chunk_size=4,
+                                                         progress=lambda ndone, n: calls.append((ndone, n)))
+        self.assertEqual(a2.shape, (3, 5, 4))
+        self.assertEqual(list(failures.keys()), [14])
+        self.assertTrue(numpy.isnan(a2[2, 4]).all())
+        a[2, 4] = numpy.nan
+        p[2, 4] = numpy.nan
+        numpy.testing.assert_allclose(a2, a, atol=1e-6)
+        numpy.testing.assert_allclose(numpy.cos(p2 - p), numpy.where(numpy.isnan(p), numpy.nan, 1.), atol=1e-6)
+        self.assertEqual(calls[-1], (15, 15))
+        # same as the serial analysis of all signals at once
+        a3, p3 = ua.harmonic_analysis(tide, x[0].T, trange)
+        numpy.testing.assert_allclose(a3.T, a2[0])
+
     def test_error_analysis(self):
         N = len(self.tide.constituents)
         a = numpy.random.random_sample(N)
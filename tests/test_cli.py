@@ -0,0 +1,104 @@
+import csv
+import datetime
+import os
+import netCDF4
+import numpy as np
+import pytest
+import uptide
+import uptide.__main__
+from uptide.__main__ import main
+from uptide.tidal_netcdf import AMCGTidalInterpolator
+
+
+@pytest.fixture
+def amcg_file(tmp_path):
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(-10., 5., 31)
+    ds = netCDF4.Dataset(tmp_path / 'amcg.nc', 'w')
+    ds.createDimension('latitude', len(lat))
+    ds.createDimension('longitude', len(lon))
+    ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+    ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    for constituent, scale in (('m2', 1.), ('s2', 0.3)):
+        ds.createVariable(constituent + 'amp', 'float64', ('latitude', 'longitude'))[:] = scale*(1. + 0.1*lat2d - 0.05*lon2d)
+        ds.createVariable(constituent + 'phase', 'float64', ('latitude', 'longitude'))[:] = 2.*lat2d + 3.*lon2d/scale
+    ds.close()
+    return str(tmp_path / 'amcg.nc')
+
+
+@pytest.fixture
+def stations_file(tmp_path):
+    with open(tmp_path / 'stations.csv', 'w') as f:
+        f.write('name,lon,lat\nwick,-3.08,58.44\nlerwick,-1.14,59.15\nfoo,2.3,51.1\n')
+    return str(tmp_path / 'stations.csv')
+
+
+def expected_values(amcg_file, lonlats, ntimes, step):
+    tide = uptide.Tides(['M2', 'S2'])
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    tnci = AMCGTidalInterpolator(tide, amcg_file)
+    vals = []
+    for t in np.arange(ntimes)*step:
+        tnci.set_time(t)
+        vals.append(tnci.get_vals(np.array(lonlats)[:, ::-1]))
+    return np.array(vals)
+
+
+def test_predict_csv(tmp_path, amcg_file, stations_file):
+    output = str(tmp_path / 'out.csv')
+    main(['predict', '--database', 'amcg', '--data', amcg_file, '--constituents', 'M2,S2',
+          '--stations', stations_file, '--start', '2020-03-01T00:00', '--end', '2020-03-02T00:00',
+          '--step', '3600', '--chunk-size', '7', '--output', output])
+    with open(output) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['time', 'wick', 'lerwick', 'foo']
+    assert rows[1][0] == '2020-03-01T00:00:00' and rows[-1][0] == '2020-03-02T00:00:00'
+    vals = np.array([[float(val) for val in row[1:]] for row in rows[1:]])
+    expected = expected_values(amcg_file, [(-3.08, 58.44), (-1.14, 59.15), (2.3, 51.1)], 25, 3600.)
+    np.testing.assert_allclose(vals, expected, atol=1e-5)
+
+
+def test_predict_netcdf_processes(tmp_path, amcg_file):
+    points = tmp_path / 'points.txt'
+    points.write_text('-3.08 58.44\n2.3 51.1\n')
+    output = str(tmp_path / 'out.nc')
+    main(['predict', '--database', 'amcg', '--data', amcg_file, '--constituents', 'M2,S2',
+          '--points', str(points), '--start', '2020-03-01', '--end', '2020-03-03',
+          '--step', '1800', '--chunk-size', '10', '--processes', '2', '--output', output])
+    with netCDF4.Dataset(output) as nc:
+        assert list(nc.variables['station_name'][:]) == ['0', '1']
+        np.testing.assert_allclose(nc.variables['time'][:], np.arange(97)*1800.)
+        expected = expected_values(amcg_file, [(-3.08, 58.44), (2.3, 51.1)], 97, 1800.)
+        np.testing.assert_allclose(nc.variables['elevation'][:], expected)
+
+
+class CountingPredictor(object):
+    # like FES2014Predictor, sets itself up when first used, recording the process in which that happens
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.ready = False
+
+    def __getstate__(self):
+        return dict(self.__dict__, ready=False)
+
+    def __call__(self, ts):
+        if not self.ready:
+            with open(self.log_file, 'a') as f:
+                f.write('{}\n'.format(os.getpid()))
+            self.ready = True
+        return np.zeros((len(ts), 2))
+
+
+def test_predict_processes_setup(tmp_path, monkeypatch):
+    log_file = str(tmp_path / 'setup.log')
+    monkeypatch.setattr(uptide.__main__, 'create_predictor', lambda args, tide, lonlats: CountingPredictor(log_file))
+    points = tmp_path / 'points.txt'
+    points.write_text('-3.08 58.44\n2.3 51.1\n')
+    main(['predict', '--database', 'amcg', '--data', 'unused.nc', '--constituents', 'M2,S2',
+          '--points', str(points), '--start', '2020-03-01', '--end', '2020-03-03',
+          '--step', '600', '--chunk-size', '10', '--processes', '2', '--output', str(tmp_path / 'out.csv')])
+    # 29 chunks, but the predictor is set up at most once in each of the 2 worker processes
+    with open(log_file) as f:
+        pids = f.read().split()
+    assert 1 <= len(pids) <= 2 and len(set(pids)) == len(pids)
@@ -4,6 +4,8 @@ import netCDF4
 import os
 import numpy as np
 import datetime
+from uptide.netcdf_reader import CoordinateError, NetCDFInterpolator, file_pool, chunk_cache
+from uptide.tidal_netcdf import AMCGTidalInterpolator, MultiRegionTidalInterpolator, FES2014NetCDFTidalInterpolator
 
 constituents = ('M2', 'S2', 'N2', 'K2', 'K1', 'O1', 'P1', 'Q1')
 
@@ -82,3 +84,417 @@ def test_dummy_tpxo_multiple(dummy_tpxo_grid_file, dummy_tpxo_elev_file):
         tnci.set_time(t)
         expected = sum([(i+1.0)*np.cos(omega*t) for i, omega in zip(selection, tide.omega)])
         np.testing.assert_allclose(tnci.get_val([0., 0.]), expected)
+
+
+def test_dummy_tpxo_get_vals(dummy_tpxo_grid_file, dummy_tpxo_elev_file):
+    tide = uptide.Tides(['M2', 'S2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = uptide.TPXOTidalInterpolator(tide, dummy_tpxo_grid_file, dummy_tpxo_elev_file)
+    xs = [[0., 0.], [10., 45.], [359., -89.]]
+    for t in [0., 1000., 86400.]:
+        tnci.set_time(t)
+        np.testing.assert_allclose(tnci.get_vals(xs), [tnci.get_val(x) for x in xs])
+
+
+def test_file_pool(dummy_tpxo_grid_file, dummy_tpxo_elev_file):
+    tide = uptide.Tides(['M2', 'S2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    nfiles = len(file_pool)
+    tncis = [uptide.TPXOTidalInterpolator(tide, dummy_tpxo_grid_file, dummy_tpxo_elev_file) for i in range(3)]
+    # grid and data file are opened only once
+    assert len(file_pool) == nfiles + 2
+    for tnci in tncis[1:]:
+        tnci.close()
+    assert len(file_pool) == nfiles + 2
+    with tncis[0] as tnci:
+        tnci.set_ranges(((0., 180.), (-45., 45.)))
+        tnci.set_time(1000.)
+    assert len(file_pool) == nfiles
+    # interpolation still works after closing
+    tncis[1].set_time(1000.)
+    assert tnci.get_val([10., 10.]) == pytest.approx(tncis[1].get_val([10., 10.]))
+
+
+@pytest.fixture
+def dummy_tpxo_uv_file(tmp_path):
+    ds = netCDF4.Dataset(tmp_path / 'u_tpxo9.nc', 'w', format='NETCDF3_CLASSIC')
+    ds.createDimension('nx', 2)
+    ds.createDimension('ny', 2)
+    ds.createDimension('nc', len(constituents))
+    nct = ds.createDimension('nct', 4)
+    con = ds.createVariable('con', 'c', ('nc', 'nct'))
+    con[:] = [x.ljust(nct.size) for x in constituents]
+    ones = np.ones((len(constituents), 2, 2))
+    # u has amplitude 2 and phase 0, v has amplitude 1 and phase 90 degrees
+    for name, val in (('ua', 2.), ('up', 0.), ('va', 1.), ('vp', 90.)):
+        ds.createVariable(name, np.float64, ('nc', 'nx', 'ny'))[:] = val * ones
+    filepath = ds.filepath()
+    ds.close()
+    return filepath
+
+
+def test_dummy_tpxo_velocity(dummy_tpxo_grid_file, dummy_tpxo_uv_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tide.phi[:] = 0.
+    tide.f[:] = 1
+    tide.u[:] = 0.
+    with uptide.tidal_netcdf.TPXOncTidalVelocityInterpolator(tide, dummy_tpxo_grid_file, dummy_tpxo_uv_file) as tvi:
+        assert tvi.shared_grid
+        xs = [[0., 0.], [10., 45.]]
+        for t in [0., 1000., 86400.]:
+            tvi.set_time(t)
+            omegat = tide.omega[0]*t
+            np.testing.assert_allclose(tvi.get_vals(xs), [[2.*np.cos(omegat), np.cos(omegat-np.pi/2.)]]*2, atol=1e-12)
+            np.testing.assert_allclose(tvi.get_val(xs[0]), tvi.get_vals(xs)[0])
+        a, b, theta, g = tvi.get_ellipse_parameters(xs)
+        assert a.shape == (2, 1)
+        np.testing.assert_allclose(a, 2.)
+        np.testing.assert_allclose(b, 1.)
+        a, b, theta, g = tvi.get_grid_ellipse_parameters(chunk_size=3)
+        assert a.shape == (1, 2, 2)
+        np.testing.assert_allclose(a, 2.)
+        np.testing.assert_allclose(b, 1.)
+
+
+@pytest.fixture
+def dummy_amcg_file(tmp_path):
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(-10., 5., 31)
+    ds = netCDF4.Dataset(tmp_path / 'amcg.nc', 'w')
+    ds.createDimension('latitude', len(lat))
+    ds.createDimension('longitude', len(lon))
+    ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+    ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    ds.createVariable('m2amp', 'float64', ('latitude', 'longitude'))[:] = 1. + 0.1*lat2d - 0.05*lon2d
+    ds.createVariable('m2phase', 'float64', ('latitude', 'longitude'))[:] = 2.*lat2d + 3.*lon2d
+    mask = np.ones(lat2d.shape)
+    mask[:, :3] = 0.
+    ds.createVariable('mask', 'float64', ('latitude', 'longitude'))[:] = mask
+    ds.close()
+    return str(tmp_path / 'amcg.nc')
+
+
+def test_change_ranges(dummy_amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=((51., 53.), (-5., -2.)))
+    tnci.set_time(1000.)
+    # partially overlapping, and disjoint from the initial ranges
+    for ranges in [((52., 55.), (-4., 0.)), ((57., 59.), (1., 4.)), ((50., 60.), (-10., 5.))]:
+        tnci.set_ranges(ranges)
+        fresh = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges)
+        np.testing.assert_array_equal(tnci.real_part, fresh.real_part)
+        np.testing.assert_array_equal(tnci.imag_part, fresh.imag_part)
+        np.testing.assert_array_equal(tnci.mask, fresh.mask)
+        fresh.set_time(1000.)
+        xs = [[ranges[0][0]+0.3, ranges[1][0]+1.6], [ranges[0][1]-0.3, ranges[1][1]-0.2]]
+        np.testing.assert_allclose(tnci.get_vals(xs), fresh.get_vals(xs))
+
+
+def test_unchanged_ranges_no_read(dummy_amcg_file, monkeypatch):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    ranges = ((51., 53.), (-5., -2.))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no values should be read from file")
+    monkeypatch.setattr(tnci, '_read_constituents', fail)
+    tnci.set_ranges(ranges)
+
+
+def test_multi_region(dummy_amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file)
+    tnci.set_time(1000.)
+    ranges_list = [((51., 53.), (-5., -2.)), ((56., 59.), (1., 4.))]
+    mrti = MultiRegionTidalInterpolator(AMCGTidalInterpolator(tide, dummy_amcg_file), ranges_list)
+    assert mrti.regions[1].nci.shape[0] < 21
+    mrti.set_time(1000.)
+    xs = [[52., -3.], [57.5, 2.5], [51.2, -4.8]]
+    np.testing.assert_allclose(mrti.get_vals(xs), tnci.get_vals(xs))
+    assert mrti.get_val(xs[1]) == pytest.approx(tnci.get_val(xs[1]))
+    with pytest.raises(CoordinateError):
+        mrti.get_vals([[52., -3.], [55., 0.]])
+
+    mrti.set_ranges([((54., 56.), (0., 2.))])
+    assert len(mrti.regions) == 1
+    assert mrti.get_val([55., 0.]) == pytest.approx(tnci.get_val([55., 0.]))
+
+
+def test_multi_region_file_pool(dummy_amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    key = file_pool._key(dummy_amcg_file, None)
+    ranges_list = [((51., 53.), (-5., -2.)), ((56., 59.), (1., 4.)), ((54., 56.), (0., 2.))]
+    mrti = MultiRegionTidalInterpolator(AMCGTidalInterpolator(tide, dummy_amcg_file), ranges_list)
+    assert file_pool.files[key][1] == 3
+    # the removed regions release their reference to the file
+    mrti.set_ranges(ranges_list[:1])
+    assert file_pool.files[key][1] == 1
+    mrti.close()
+    assert key not in file_pool.files
+
+
+def test_mmap(dummy_amcg_file):
+    pytest.importorskip('h5py')
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    ranges = ((51., 53.), (-5., -2.))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges)
+    tnci_mmap = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges, mmap=True)
+    assert isinstance(tnci_mmap.nci.mask, np.memmap)
+    np.testing.assert_array_equal(tnci.real_part, tnci_mmap.real_part)
+    tnci.set_time(1000.)
+    tnci_mmap.set_time(1000.)
+    xs = [[52., -3.], [51.2, -4.8]]
+    np.testing.assert_allclose(tnci.get_vals(xs), tnci_mmap.get_vals(xs))
+
+
+def test_concurrent_load(tmp_path):
+    # one file per constituent, as in FES2012
+    lat = np.linspace(50., 60., 11)
+    lon = np.linspace(-10., 5., 16)
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    file_names = []
+    for k, constituent in enumerate(constituents):
+        file_name = str(tmp_path / '{}.nc'.format(constituent))
+        ds = netCDF4.Dataset(file_name, 'w')
+        ds.createDimension('lat', len(lat))
+        ds.createDimension('lon', len(lon))
+        ds.createVariable('lat', 'float64', ('lat',))[:] = lat
+        ds.createVariable('lon', 'float64', ('lon',))[:] = lon
+        ds.createVariable('amp', 'float64', ('lat', 'lon'))[:] = k + 1. + 0.1*lat2d
+        ds.createVariable('pha', 'float64', ('lat', 'lon'))[:] = 10.*k + lon2d
+        ds.close()
+        file_names.append(file_name)
+
+    tide = uptide.Tides(constituents)
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tncis = []
+    for max_workers in (1, 4):
+        tnci = uptide.tidal_netcdf.TidalNetCDFInterpolator(tide, file_names[0], ('lat', 'lon'), ('lat', 'lon'),
+                                                           ranges=((52., 58.), (-8., 0.)), max_workers=max_workers)
+        tnci.load_amplitudes_and_phases(file_names, ['amp']*len(constituents), file_names, ['pha']*len(constituents))
+        tncis.append(tnci)
+    np.testing.assert_array_equal(tncis[0].real_part, tncis[1].real_part)
+    np.testing.assert_array_equal(tncis[0].imag_part, tncis[1].imag_part)
+    k = constituents.index('K1')
+    (imin, imax), (jmin, jmax) = tncis[1].nci.iranges
+    amp, pha = k + 1. + 0.1*lat2d[imin:imax, jmin:jmax], 10.*k + lon2d[imin:imax, jmin:jmax]
+    np.testing.assert_allclose(tncis[1].real_part[k], amp*np.cos(np.radians(pha)))
+
+
+@pytest.fixture
+def dummy_fes2014_path(tmp_path):
+    # global 1 degree grid, with a land mask north of 80N
+    lat = np.arange(-89.5, 90., 1.)
+    lon = np.arange(0., 360., 1.)
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    for k, constituent in enumerate(('M2', 'S2')):
+        ds = netCDF4.Dataset(tmp_path / '{}.nc'.format(constituent.lower()), 'w')
+        ds.createDimension('lat', len(lat))
+        ds.createDimension('lon', len(lon))
+        ds.createVariable('lat', 'float32', ('lat',))[:] = lat
+        ds.createVariable('lon', 'float32', ('lon',))[:] = lon
+        ds.variables['lon'].units = 'degrees_east'
+        amp = ds.createVariable('amplitude', 'float32', ('lat', 'lon'), fill_value=1.8446743e+19)
+        amp[:] = np.ma.masked_where(lat2d > 80., 100.*(k+1) + 0.*lon2d)
+        amp.units = 'cm'
+        ds.createVariable('phase', 'float32', ('lat', 'lon'))[:] = lon2d
+        ds.close()
+    return str(tmp_path)
+
+
+def test_fes2014_netcdf(dummy_fes2014_path):
+    tide = uptide.Tides(['M2', 'S2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = FES2014NetCDFTidalInterpolator(tide, dummy_fes2014_path, ranges=((40., 60.), (350., 10.)))
+    xs = np.array([[50., 359.5], [50., 0.5], [45., 5.]])
+    for t in (0., 3600.):
+        tnci.set_time(t)
+        eta = sum(tide.f[k]*(k+1.)*np.cos(tide.omega[k]*t + tide.phi[k] + tide.u[k] - np.radians(xs[:, 1]))
+                  for k in range(2))
+        # bilinear interpolation of the complex components is only approximately the same
+        np.testing.assert_allclose(tnci.get_vals(xs), eta, rtol=1e-4)
+
+    tnci.set_ranges(((75., 89.), (0., 20.)))
+    tnci.get_val((79., 3.))
+    with pytest.raises(CoordinateError):
+        tnci.get_val((81.5, 3.))
+
+
+@pytest.fixture
+def dummy_fes2004_file(tmp_path):
+    # all constituents in the 3D Ha and Hg fields, with a land mask north of 55N
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(350., 365., 31)
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    ds = netCDF4.Dataset(tmp_path / 'fes2004.nc', 'w')
+    ds.createDimension('Y', len(lat))
+    ds.createDimension('X', len(lon))
+    ds.createDimension('N', len(constituents))
+    ds.createDimension('nchar', 4)
+    ds.createVariable('lat', 'float64', ('Y',))[:] = lat
+    ds.createVariable('lon', 'float64', ('X',))[:] = lon
+    spectrum = ds.createVariable('spectrum', 'c', ('N', 'nchar'))
+    spectrum[:] = np.array([list(constituent.ljust(4)) for constituent in constituents])
+    amp = ds.createVariable('Ha', 'float32', ('N', 'Y', 'X'))
+    amp.missing_value = np.float32(-9999.)
+    values = np.array([(k+1.) + 0.*lat2d for k in range(len(constituents))])
+    values[:, lat2d > 55.] = -9999.
+    amp[:] = values
+    ds.createVariable('Hg', 'float32', ('N', 'Y', 'X'))[:] = np.array([lon2d for k in range(len(constituents))])
+    ds.close()
+    return str(tmp_path / 'fes2004.nc')
+
+
+def test_fes2004(dummy_fes2004_file):
+    tide = uptide.Tides(['S2', 'M2', 'K1'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = uptide.tidal_netcdf.FESTidalInterpolator(tide, dummy_fes2004_file, ranges=((51., 54.), (352., 358.)),
+                                                    stats=True)
+    # the mask is derived from the amplitudes as loaded, without reading Ha another time, and
+    # Ha and Hg are each read in two slabs: M2 and S2 (indices 0 and 1), and K1 (index 4)
+    assert tnci.stats.calls['read'] == 4
+    assert tnci.mask.all()
+    xs = np.array([[52., 353.5], [53.2, 356.]])
+    amplitudes = [constituents.index(constituent) + 1. for constituent in tide.constituents]
+    for t in (0., 3600.):
+        tnci.set_time(t)
+        eta = sum(tide.f[k]*amplitudes[k]*np.cos(tide.omega[k]*t + tide.phi[k] + tide.u[k] - np.radians(xs[:, 1]))
+                  for k in range(3))
+        np.testing.assert_allclose(tnci.get_vals(xs), eta, rtol=1e-4)
+
+    # the mask is extended when the ranges are changed
+    tnci.set_ranges(((53., 58.), (352., 358.)))
+    assert not tnci.mask.all()
+    tnci.get_val((54.8, 355.))
+    with pytest.raises(CoordinateError):
+        tnci.get_val((55.8, 355.))
+
+
+def test_fes2004_mask_component(dummy_fes2004_file):
+    # the first component of Ha has a different land mask, north of 53N
+    ds = netCDF4.Dataset(dummy_fes2004_file, 'a')
+    lat = ds.variables['lat'][:]
+    ds.variables['Ha'][0, lat > 53., :] = -9999.
+    ds.close()
+    tide = uptide.Tides(['K1'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = uptide.tidal_netcdf.FESTidalInterpolator(tide, dummy_fes2004_file, ranges=((51., 52.), (352., 358.)))
+    assert tnci.mask.all()
+    # the mask is extended from the amplitudes of K1, not from the first component
+    tnci.set_ranges(((53., 58.), (352., 358.)))
+    tnci.set_time(0.)
+    tnci.get_val((54.8, 355.))
+    with pytest.raises(CoordinateError):
+        tnci.get_val((55.8, 355.))
+
+
+def test_read_components(dummy_fes2004_file, dummy_tpxo_grid_file, dummy_tpxo_elev_file):
+    nci = NetCDFInterpolator(dummy_fes2004_file, ('X', 'Y'), ('lon', 'lat'), ranges=((352., 358.), (51., 54.)))
+    components = [5, 1, 2, 1, 7]
+    val = nci.read_components('Ha', components)
+    assert val.flags.c_contiguous and val.shape == (5,) + tuple(nci.shape)
+    np.testing.assert_array_equal(val, [nci.read_field('Ha', component=component) for component in components])
+
+    # all constituents of the TPXO file are read in a single slab for each of hRe and hIm
+    tide = uptide.Tides(constituents[::-1])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = uptide.TPXOTidalInterpolator(tide, dummy_tpxo_grid_file, dummy_tpxo_elev_file, stats=True)
+    assert tnci.stats.calls['read'] == 2
+    np.testing.assert_array_equal(tnci.real_part[:, 0, 0], np.arange(len(constituents), 0., -1.))
+
+
+def test_velocity_separate_grids(dummy_amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci_u = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=((51., 53.), (-5., -2.)))
+    tnci_v = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=((51., 54.), (-5., -2.)))
+    tvi = uptide.tidal_netcdf.TidalVelocityInterpolator(tnci_u, tnci_v)
+    assert not tvi.shared_grid
+    xs = [[52., -3.], [51.2, -4.8]]
+    tvi.set_time(1000.)
+    uvs = tvi.get_vals(xs)
+    np.testing.assert_allclose(uvs[:, 0], uvs[:, 1])
+    tvi.set_ranges(((51., 53.), (-5., -2.)))
+    assert tvi.shared_grid
+    np.testing.assert_allclose(tvi.get_vals(xs), uvs)
+    a, b, theta, g = tvi.get_ellipse_parameters(xs)
+    # u and v in phase: flat ellipse at 45 degrees
+    np.testing.assert_allclose(b, 0., atol=1e-12)
+    np.testing.assert_allclose(np.cos(theta)**2, 0.5)
+
+
+def test_stats(dummy_amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=((51., 55.), (-10., -2.)))
+    assert tnci.stats is None and tnci.nci.stats is None
+    tnci.set_time(1000.)
+    assert tnci.interpolator.stats is None
+
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=((51., 55.), (-10., -2.)), stats=True)
+    stats = tnci.stats
+    tnci.set_time(1000.)
+    # the second point is on land (the mask is zero in the first three columns) and requires extrapolation
+    xs = [(52., -5.), (52., -9.2)]
+    vals = tnci.get_vals(xs, allow_extrapolation=True)
+    assert tnci.get_val(xs[1], allow_extrapolation=True) == pytest.approx(vals[1])
+    for phase in ('read', 'load', 'convert', 'set_time', 'stencil', 'get_vals', 'get_val'):
+        assert stats.calls[phase] > 0
+        assert stats.times[phase] >= 0.
+    # the mask, amplitude and phase
+    assert stats.counters['bytes_read'] == 3*tnci.real_part.nbytes
+    assert stats.counters['extrapolated_points'] == 2
+    assert stats.counters['extrapolation_cache_misses'] == 1
+    assert stats.counters['extrapolation_cache_hits'] == 1
+    assert 'set_time' in str(stats)
+    stats.reset()
+    assert stats.as_dict() == {'times': {}, 'calls': {}, 'counters': {}}
+
+
+def test_chunks_discarded_after_load(tmp_path):
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(-10., 5., 31)
+    ds = netCDF4.Dataset(tmp_path / 'amcg.nc', 'w')
+    ds.createDimension('latitude', len(lat))
+    ds.createDimension('longitude', len(lon))
+    ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+    ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    for name, values in (('m2amp', 1. + 0.1*lat2d - 0.05*lon2d), ('m2phase', 2.*lat2d + 3.*lon2d),
+                         ('mask', np.ones(lat2d.shape))):
+        ds.createVariable(name, 'float64', ('latitude', 'longitude'), zlib=True, chunksizes=(5, 8))[:] = values
+    ds.close()
+
+    chunk_cache.clear()
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    tnci = AMCGTidalInterpolator(tide, str(tmp_path / 'amcg.nc'), ranges=((51., 55.), (-8., -2.)), stats=True)
+    assert chunk_cache.misses > 0
+    # the files are still open, but their chunks are no longer cached
+    assert len(chunk_cache.chunks) == 0
+    tnci.set_ranges(((52., 57.), (-8., -2.)))
+    assert len(chunk_cache.chunks) == 0
+    # only the chunks actually read are counted
+    assert tnci.stats.counters['bytes_read'] == chunk_cache.misses*5*8*8
+    tnci.close()
+
+
+def test_h5py_backend(dummy_amcg_file):
+    pytest.importorskip('h5py')
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2003, 3, 28, 0, 0, 0))
+    ranges = ((51., 55.), (-8., -2.))
+    tnci = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges, backend='h5py')
+    reference = AMCGTidalInterpolator(tide, dummy_amcg_file, ranges=ranges)
+    np.testing.assert_array_equal(tnci.real_part, reference.real_part)
+    np.testing.assert_array_equal(tnci.mask, reference.mask)
+    tnci.set_time(1000.)
+    reference.set_time(1000.)
+    assert tnci.get_val((52., -5.)) == pytest.approx(reference.get_val((52., -5.)))
@@ -1,6 +1,7 @@
 import unittest
 import uptide.ellipse as ue
 import math
+import numpy
 
 
 class TestEllipse(unittest.TestCase):
@@ -24,6 +25,20 @@ class TestEllipse(unittest.TestCase):
         for x, y in zip((a, b, math.sin(theta), math.sin(pha)), (7.0, 1.0, 0.0, math.sin(-math.pi*2/3))):
             self.assertAlmostEqual(x, y)
 
+    def test_tidal_ellipse_parameters_from_complex(self):
+        rng = numpy.random.default_rng(1)
+        au, av = rng.random((2, 3, 4, 5))
+        pu, pv = rng.uniform(-math.pi, math.pi, (2, 3, 4, 5))
+        expected = ue.tidal_ellipse_parameters(au, pu, av, pv)
+        for chunk_size in (None, 7):
+            result = ue.tidal_ellipse_parameters_from_complex(au*numpy.cos(pu), -au*numpy.sin(pu),
+                                                              av*numpy.cos(pv), -av*numpy.sin(pv), chunk_size=chunk_size)
+            for x, y in zip(result, expected):
+                numpy.testing.assert_allclose(x, y, atol=1e-12)
+        a, b, theta, pha = ue.tidal_ellipse_parameters_from_complex(math.cos(2.0), -math.sin(2.0), 3.0*math.cos(4.0), -3.0*math.sin(4.0))
+        for x, y in zip((a, b, theta, pha), (3.0315505539181253, 0.8998340063804587, -1.4195315055223143, 0.90362100129612022)):
+            self.assertAlmostEqual(x, y)
+
 
 if __name__ == '__main__':
     unittest.main()
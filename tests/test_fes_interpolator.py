@@ -0,0 +1,48 @@
+import datetime
+import numpy as np
+from uptide.fes_interpolator import FES2014TidalInterpolator
+
+
+class DummyHandler(object):
+    """Mimics the pyfes Handler: returns lat + lon + hours since 2000-01-01 as the short period tide (in cm)
+    and 1 cm as the long period tide."""
+    def __init__(self):
+        self.calls = []
+
+    def calculate(self, lons, lats, dates):
+        self.calls.append(len(lons))
+        hours = (dates - np.datetime64('2000-01-01T00:00')) / np.timedelta64(1, 'h')
+        return lats + lons + hours, np.ones(len(lons)), np.zeros(len(lons))
+
+
+def dummy_interpolator(chunk_size=100000):
+    # avoid the FES library in __init__
+    tnci = FES2014TidalInterpolator.__new__(FES2014TidalInterpolator)
+    tnci.fh = DummyHandler()
+    tnci.include_long_period = True
+    tnci.chunk_size = chunk_size
+    tnci.set_initial_time(datetime.datetime(2000, 1, 1, 0, 0))
+    return tnci
+
+
+def test_get_vals():
+    tnci = dummy_interpolator(chunk_size=3)
+    tnci.set_time(7200.)
+    xs = np.array([[10., 20.], [-5., 300.], [0., 0.], [45., 1.], [1., 2.]])
+    np.testing.assert_allclose(tnci.get_vals(xs), (xs[:, 0] + xs[:, 1] + 2. + 1.)*0.01)
+    assert tnci.fh.calls == [3, 2]
+    np.testing.assert_allclose(tnci.get_val(xs[0]), tnci.get_vals(xs[:1])[0])
+
+
+def test_time_series():
+    tnci = dummy_interpolator()
+    ts = np.array([0., 1800., 3600.*24])
+    np.testing.assert_allclose(tnci.get_time_series((10., 20.), ts), (31. + ts/3600.)*0.01)
+    xs = np.array([[10., 20.], [-5., 300.]])
+    vals = tnci.get_vals_at_times(xs, ts)
+    assert vals.shape == (3, 2)
+    np.testing.assert_allclose(vals, (1. + xs[:, 0] + xs[:, 1] + ts[:, None]/3600.)*0.01)
+    assert tnci.fh.calls == [3, 6]
+
+    tnci.include_long_period = False
+    np.testing.assert_allclose(tnci.get_time_series((10., 20.), ts), (30. + ts/3600.)*0.01)
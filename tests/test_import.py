@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+
+def _run(code):
+    return subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout.split()
+
+
+def test_lightweight_import():
+    # importing uptide, and using Tides and harmonic_analysis, should not import any netCDF, scipy or fes package
+    modules = ['netCDF4', 'scipy', 'h5py', 'pytz', 'uptide.netcdf_reader', 'uptide.tidal_netcdf', 'uptide.fes_interpolator']
+    imported = _run("import sys, datetime, numpy, uptide\n"
+                    "tide = uptide.Tides(['M2', 'S2'])\n"
+                    "tide.set_initial_time(datetime.datetime(2020, 1, 1))\n"
+                    "t = numpy.arange(0., 30*86400., 3600.)\n"
+                    "uptide.harmonic_analysis(tide, tide.from_amplitude_phase([1., 0.5], [0., 1.], t), t)\n"
+                    "print(*[m for m in {!r} if m in sys.modules])".format(modules))
+    assert imported == []
+
+
+def test_lazy_attributes():
+    out = _run("import uptide\n"
+               "from uptide.netcdf_reader import NetCDFFile\n"
+               "print(uptide.TPXOTidalInterpolator.__module__, uptide.tidal_netcdf.__name__, NetCDFFile.__module__)")
+    assert out[:2] == ['uptide.tidal_netcdf', 'uptide.tidal_netcdf']
+    assert out[2].startswith('netCDF4')
@@ -0,0 +1,382 @@
+import pytest
+import netCDF4
+import numpy as np
+from uptide.netcdf_reader import NetCDFInterpolator, CoordinateError, RectilinearGrid, CurvilinearGrid, ChunkCache, chunk_cache
+from uptide.storage import open_dataset
+
+
+# function used to fill the netcdf field, has to be linear
+def f(x, y):
+    return x*10 + y
+
+
+@pytest.fixture
+def nonuniform_file(tmp_path):
+    # lat is stretched, lon is equidistant but stored in decreasing order
+    lat = np.arange(10.)**1.5
+    lon = np.arange(10.)[::-1]
+    ds = netCDF4.Dataset(tmp_path / 'nonuniform.nc', 'w')
+    ds.createDimension('lat', 10)
+    ds.createDimension('lon', 10)
+    ds.createVariable('latitude', 'float64', ('lat', ))[:] = lat
+    ds.createVariable('longitude', 'float64', ('lon', ))[:] = lon
+    ds.createVariable('z', 'float64', ('lat', 'lon'))[:] = f(lat[:, None], lon[None, :])
+    mask = np.ones((10, 10))
+    mask[0:2, :] = 0.0
+    ds.createVariable('mask', 'float64', ('lat', 'lon'))[:] = mask
+    ds.close()
+    return str(tmp_path / 'nonuniform.nc')
+
+
+@pytest.fixture
+def curvilinear_file(tmp_path):
+    # grid rotated by 30 degrees, with a stretched second dimension
+    pytest.importorskip('scipy.spatial')
+    i, j = np.meshgrid(np.arange(12.), np.arange(8.)**1.2, indexing='ij')
+    theta = np.pi/6.
+    x = np.cos(theta)*i - np.sin(theta)*j
+    y = np.sin(theta)*i + np.cos(theta)*j
+    ds = netCDF4.Dataset(tmp_path / 'curvilinear.nc', 'w')
+    ds.createDimension('xi', 12)
+    ds.createDimension('eta', 8)
+    ds.createVariable('x', 'float64', ('xi', 'eta'))[:] = x
+    ds.createVariable('y', 'float64', ('xi', 'eta'))[:] = y
+    ds.createVariable('z', 'float64', ('xi', 'eta'))[:] = f(x, y)
+    # the same field, stored transposed
+    ds.createVariable('zt', 'float64', ('eta', 'xi'))[:] = f(x, y).T
+    ds.close()
+    return str(tmp_path / 'curvilinear.nc')
+
+
+def test_nonuniform(nonuniform_file):
+    nci = NetCDFInterpolator(nonuniform_file, ('lat', 'lon'), ('latitude', 'longitude'))
+    assert isinstance(nci.grid, RectilinearGrid)
+    nci.set_field('z')
+    for xy in [(4.33, 5.2), (0.5, 0.1), (26.9, 8.9)]:
+        assert nci.get_val(xy) == pytest.approx(f(*xy))
+    for xy in [(-0.1, 5.), (27.1, 5.), (5., 9.1)]:
+        with pytest.raises(CoordinateError):
+            nci.get_val(xy)
+    xys = [(4.33, 5.2), (0.5, 0.1), (26.9, 8.9)]
+    np.testing.assert_allclose(nci.get_vals(xys), [f(*xy) for xy in xys])
+
+    nci.set_mask('mask')
+    # mask contains the first two rows, i.e. latitudes 0 and 1
+    assert nci.get_val((1.5, 3.3)) == pytest.approx(f(2.**1.5, 3.3))
+    with pytest.raises(CoordinateError):
+        nci.get_val((0.5, 3.3))
+
+
+def test_nonuniform_ranges(nonuniform_file):
+    nci = NetCDFInterpolator(nonuniform_file, ('lon', 'lat'), ('longitude', 'latitude'))
+    nci.set_ranges(((2., 4.), (3., 9.)))
+    nci.set_field('z')
+    assert nci.get_val((3.1, 4.4)) == pytest.approx(f(4.4, 3.1))
+    with pytest.raises(CoordinateError):
+        nci.get_val((3.1, 26.))
+
+
+def test_curvilinear(curvilinear_file):
+    for transposed in (False, True):
+        nci = NetCDFInterpolator(curvilinear_file, ('xi', 'eta'), ('x', 'y'))
+        assert isinstance(nci.grid, CurvilinearGrid)
+        nci.set_field('zt' if transposed else 'z')
+        xys = np.array([(3.2, 4.1), (0.1, 0.2), (5., 9.), (7.3, 5.5)])
+        for xy in xys:
+            assert nci.get_val(xy) == pytest.approx(f(*xy))
+        np.testing.assert_allclose(nci.get_vals(xys), f(xys[:, 0], xys[:, 1]))
+        # outside the rotated grid, though inside its bounding box:
+        with pytest.raises(CoordinateError):
+            nci.get_val((9., 0.5))
+
+
+def test_curvilinear_ranges(curvilinear_file):
+    nci = NetCDFInterpolator(curvilinear_file, ('xi', 'eta'), ('x', 'y'))
+    nci.set_field('z')
+    nci.set_ranges(((2., 4.), (3., 5.)))
+    assert nci.shape[0] < 12
+    assert nci.get_val((3.2, 4.1)) == pytest.approx(f(3.2, 4.1))
+    with pytest.raises(CoordinateError):
+        nci.get_val((7.3, 5.5))
+
+
+def test_get_vals_extrapolation():
+    nci = NetCDFInterpolator('tests/test_netcdf_reader1.nc', ('lat', 'lon'), ('latitude', 'longitude'))
+    nci.set_field('z')
+    nci.set_mask('mask')
+    xys = [(4.33, 5.2), (1.2, 8.3), (0.95, 8.3)]
+    with pytest.raises(CoordinateError):
+        nci.get_vals(xys)
+    vals = nci.get_vals(xys, allow_extrapolation=True)
+    np.testing.assert_allclose(vals, [nci.get_val(xy, allow_extrapolation=True) for xy in xys])
+    with pytest.raises(CoordinateError):
+        nci.get_vals([(4.33, 5.2), (4.33, 9.5)])
+
+
+@pytest.fixture
+def global_file(tmp_path):
+    # global grid, where the last longitude (330) is connected to the first (0)
+    lon = np.arange(0., 360., 30.)
+    lat = np.arange(-60., 61., 30.)
+    ds = netCDF4.Dataset(tmp_path / 'global.nc', 'w')
+    ds.createDimension('lon', len(lon))
+    ds.createDimension('lat', len(lat))
+    ds.createVariable('lon', 'float64', ('lon', ))[:] = lon
+    ds.variables['lon'].units = 'degrees_east'
+    ds.createVariable('lat', 'float64', ('lat', ))[:] = lat
+    ds.variables['lat'].units = 'degrees_north'
+    # value k in the k-th longitude, independent of latitude
+    ds.createVariable('z', 'float64', ('lat', 'lon'))[:] = np.arange(len(lon))[None, :] * np.ones((len(lat), 1))
+    # same grid with non-equidistant latitudes
+    ds.createVariable('lat_stretched', 'float64', ('lat', ))[:] = np.sign(lat)*np.abs(lat)**1.1
+    ds.close()
+    return str(tmp_path / 'global.nc')
+
+
+def _test_periodic(nci):
+    # in the cell between 330 and 360, we interpolate between the last value (11) and the first (0)
+    for lon in (345., -15., 705.):
+        assert nci.get_val((lon, 10.)) == pytest.approx(5.5)
+    assert nci.get_val((15., 10.)) == pytest.approx(0.5)
+    np.testing.assert_allclose(nci.get_vals([(345., 10.), (-15., 10.), (15., -10.)]), [5.5, 5.5, 0.5])
+
+
+def test_periodic(global_file):
+    for lat_name in ('lat', 'lat_stretched'):
+        nci = NetCDFInterpolator(global_file, ('lon', 'lat'), ('lon', lat_name))
+        assert nci.periods == [360., None]
+        nci.set_field('z')
+        _test_periodic(nci)
+
+
+def test_periodic_ranges(global_file):
+    for lat_name in ('lat', 'lat_stretched'):
+        for ranges in (((340., 20.), (0., 20.)), ((-20., 20.), (0., 20.))):
+            nci = NetCDFInterpolator(global_file, ('lon', 'lat'), ('lon', lat_name))
+            nci.set_ranges(ranges)
+            # only the columns around the periodic boundary are read
+            assert nci.shape[0] < 12
+            nci.set_field('z')
+            _test_periodic(nci)
+            with pytest.raises(CoordinateError):
+                nci.get_val((180., 10.))
+
+
+def test_change_ranges(global_file):
+    for lat_name in ('lat', 'lat_stretched'):
+        nci = NetCDFInterpolator(global_file, ('lon', 'lat'), ('lon', lat_name))
+        nci.set_ranges(((340., 20.), (0., 20.)))
+        nci.set_field('z')
+        # overlapping across the periodic boundary, disjoint, and overlapping again
+        for ranges in (((-50., 40.), (-40., 20.)), ((100., 140.), (0., 20.)), ((130., 10.), (-60., 60.))):
+            nci.set_ranges(ranges)
+            fresh = NetCDFInterpolator(global_file, ('lon', 'lat'), ('lon', lat_name), ranges=ranges)
+            fresh.set_field('z')
+            assert nci.shape == fresh.shape
+            np.testing.assert_array_equal(nci.val, fresh.val)
+            xs = [(ranges[0][0] + 1., 10.), (ranges[0][1] - 1., 10.)]
+            np.testing.assert_allclose(nci.get_vals(xs), fresh.get_vals(xs))
+            assert nci.in_ranges(xs).all()
+        assert not nci.in_ranges([(20., 0.)]).any()
+        assert nci.in_ranges([(-200., 0.)]).all()
+
+
+def test_copy_ranges(nonuniform_file):
+    nci = NetCDFInterpolator(nonuniform_file, ('lat', 'lon'), ('latitude', 'longitude'))
+    nci.set_mask('mask')
+    nci.set_ranges(((1., 10.), (2., 5.)))
+    nci.set_field('z')
+    nci2 = nci.copy(((4., 20.), (3., 8.)))
+    assert nci.get_val((5., 4.)) == pytest.approx(f(5., 4.))
+    assert nci2.get_val((15., 7.5)) == pytest.approx(f(15., 7.5))
+    with pytest.raises(CoordinateError):
+        nci.get_val((15., 7.5))
+
+
+@pytest.mark.parametrize('file_format', ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET', 'NETCDF4'])
+def test_mmap(tmp_path, file_format):
+    if file_format == 'NETCDF4':
+        pytest.importorskip('h5py')
+    lat = np.linspace(0., 9., 10)
+    lon = np.linspace(0., 5., 6)
+    ds = netCDF4.Dataset(tmp_path / 'mmap.nc', 'w', format=file_format)
+    ds.createDimension('lat', len(lat))
+    ds.createDimension('lon', len(lon))
+    ds.createVariable('lat', 'float64', ('lat', ))[:] = lat
+    ds.createVariable('lon', 'float64', ('lon', ))[:] = lon
+    kwargs = {'contiguous': True} if file_format == 'NETCDF4' else {}
+    ds.createVariable('z', 'float32', ('lon', 'lat'), **kwargs)[:] = f(lat[None, :], lon[:, None])
+    zf = f(lat[:, None], lon[None, :])
+    zf[:, :2] = -9999.
+    ds.createVariable('zf', 'float64', ('lat', 'lon'), fill_value=-9999., **kwargs)[:] = zf
+    if file_format == 'NETCDF4':
+        ds.createVariable('zc', 'float32', ('lat', 'lon'), zlib=True)[:] = f(lat[:, None], lon[None, :])
+    ds.close()
+
+    nci = NetCDFInterpolator(str(tmp_path / 'mmap.nc'), ('lat', 'lon'), ('lat', 'lon'), mmap=True)
+    nci.set_field('z')
+    assert isinstance(nci.val, np.memmap)
+    assert nci.get_val((3.3, 1.2)) == pytest.approx(f(3.3, 1.2))
+    nci.set_ranges(((2., 5.), (1., 3.)))
+    assert isinstance(nci.val, np.memmap)
+    assert nci.get_val((3.3, 1.2)) == pytest.approx(f(3.3, 1.2))
+    if file_format == 'NETCDF4':
+        # compressed fields are read as usual
+        nci.set_field('zc')
+        assert not isinstance(nci.val, np.memmap)
+        assert nci.get_val((3.3, 1.2)) == pytest.approx(f(3.3, 1.2))
+    # fields with a fill value are read as usual, and masked
+    nci.set_field('zf')
+    assert not isinstance(nci.val, np.memmap)
+    assert nci.val.mask[:, 0].all() and not nci.val.mask[:, 2].any()
+    assert nci.get_val((3.3, 2.2)) == pytest.approx(f(3.3, 2.2))
+
+
+def test_h5py_backend(nonuniform_file, curvilinear_file):
+    pytest.importorskip('h5py')
+    for file_name, dimensions, coordinates in ((nonuniform_file, ('lat', 'lon'), ('latitude', 'longitude')),
+                                               (curvilinear_file, ('xi', 'eta'), ('x', 'y'))):
+        nci = NetCDFInterpolator(file_name, dimensions, coordinates, backend='h5py')
+        assert nci.nc.dimensions[dimensions[0]] == nci.file_shape[0]
+        nci.set_ranges(((2., 5.), (3., 9.)))
+        nci.set_field('z')
+        reference = NetCDFInterpolator(file_name, dimensions, coordinates, ranges=((2., 5.), (3., 9.)))
+        reference.set_field('z')
+        np.testing.assert_array_equal(nci.val, reference.val)
+        assert nci.get_val((3.2, 4.1)) == pytest.approx(f(3.2, 4.1))
+        nci.close()
+
+
+def test_zarr_backend(tmp_path):
+    zarr = pytest.importorskip('zarr')
+    lat = np.linspace(0., 9., 10)
+    lon = np.linspace(0., 5., 6)
+    group = zarr.open_group(str(tmp_path / 'grid.zarr'), mode='w')
+    for name, values, dimensions in (('lat', lat, ['lat']), ('lon', lon, ['lon']),
+                                     ('z', f(lat[:, None], lon[None, :]), ['lat', 'lon'])):
+        # create_dataset() in zarr 2
+        create = getattr(group, 'create_array', None) or group.create_dataset
+        array = create(name, shape=values.shape, dtype=values.dtype, chunks=(4,)*values.ndim)
+        array[...] = values
+        array.attrs['_ARRAY_DIMENSIONS'] = dimensions
+    nci = NetCDFInterpolator(str(tmp_path / 'grid.zarr'), ('lat', 'lon'), ('lat', 'lon'))
+    assert nci.backend is None and nci.nc.variables['z'].thread_safe
+    nci.set_ranges(((2., 5.), (1., 3.)))
+    nci.set_field('z')
+    assert nci.get_val((3.3, 1.2)) == pytest.approx(f(3.3, 1.2))
+
+
+def test_zarr_fill_value(tmp_path):
+    zarr = pytest.importorskip('zarr')
+    if not hasattr(zarr.open_group(str(tmp_path / 'v3.zarr'), mode='w'), 'create_array'):
+        pytest.skip('requires zarr 3')
+    lat = np.linspace(0., 9., 10)
+    lon = np.linspace(0., 5., 6)
+    group = zarr.open_group(str(tmp_path / 'v3.zarr'), mode='w', zarr_format=3)
+    for name, values, dimensions in (('lat', lat, ['lat']), ('lon', lon, ['lon']),
+                                     ('z', np.zeros((10, 6)), ['lat', 'lon'])):
+        # the default fill_value of 0 does not mark missing values
+        group.create_array(name, shape=values.shape, dtype=values.dtype, dimension_names=dimensions)[...] = values
+    group.create_array('w', shape=(10, 6), dtype='f8', dimension_names=['lat', 'lon'],
+                       attributes={'_FillValue': -9999.})[...] = np.where(lat[:, None] > 7., -9999., 0.)
+    nci = NetCDFInterpolator(str(tmp_path / 'v3.zarr'), ('lat', 'lon'), ('lat', 'lon'))
+    assert not hasattr(nci.nc.variables['z'], '_FillValue')
+    assert not np.ma.isMaskedArray(nci.nc.variables['z'][...])
+    nci.set_field('z')
+    assert nci.get_val((3.3, 1.2)) == 0.
+    nci.set_mask_from_fill_value('w', nci.nc.variables['w']._FillValue)
+    assert nci.get_val((3.3, 1.2)) == 0.
+    with pytest.raises(CoordinateError):
+        nci.get_val((8.5, 1.2))
+
+
+def test_packed_variable(tmp_path):
+    # int16 values, unpacked with scale_factor and add_offset, and masked where they equal _FillValue
+    lat = np.linspace(0., 9., 10)
+    lon = np.linspace(0., 5., 6)
+    z = f(lat[:, None], lon[None, :])
+    ds = netCDF4.Dataset(tmp_path / 'packed.nc', 'w')
+    ds.createDimension('lat', len(lat))
+    ds.createDimension('lon', len(lon))
+    ds.createVariable('lat', 'float64', ('lat', ))[:] = lat
+    ds.createVariable('lon', 'float64', ('lon', ))[:] = lon
+    packed = ds.createVariable('z', 'int16', ('lat', 'lon'), fill_value=-32767)
+    packed.scale_factor = 0.01
+    packed.add_offset = 100.
+    packed[:] = np.ma.masked_where(lat[:, None] + 0.*lon > 7., z)
+    ds.close()
+    reference = netCDF4.Dataset(tmp_path / 'packed.nc').variables['z'][...]
+    assert reference.mask.sum() == 12
+
+    pytest.importorskip('h5py')
+    zarr = pytest.importorskip('zarr')
+    # the same packed values and attributes in a zarr store
+    raw = netCDF4.Dataset(tmp_path / 'packed.nc')
+    raw.set_auto_maskandscale(False)
+    group = zarr.open_group(str(tmp_path / 'packed.zarr'), mode='w')
+    for name in ('lat', 'lon', 'z'):
+        var = raw.variables[name]
+        create = getattr(group, 'create_array', None) or group.create_dataset
+        array = create(name, shape=var.shape, dtype=var.dtype)
+        array[...] = var[...]
+        array.attrs.update({key: var.getncattr(key).item() for key in var.ncattrs()})
+        array.attrs['_ARRAY_DIMENSIONS'] = list(var.dimensions)
+    raw.close()
+
+    for ds in (open_dataset(str(tmp_path / 'packed.nc'), backend='h5py'), open_dataset(str(tmp_path / 'packed.zarr'))):
+        values = ds.variables['z'][...]
+        np.testing.assert_array_equal(values.mask, reference.mask)
+        np.testing.assert_allclose(values, reference, rtol=1e-6)
+        np.testing.assert_allclose(ds.variables['z'][2:4, 3], reference[2:4, 3], rtol=1e-6)
+        ds.variables['z'].set_auto_maskandscale(False)
+        assert ds.variables['z'][...].dtype == np.int16
+        ds.close()
+
+
+def test_chunk_cache(tmp_path):
+    lat = np.linspace(0., 19., 20)
+    lon = np.linspace(0., 11., 12)
+    ds = netCDF4.Dataset(tmp_path / 'chunked.nc', 'w')
+    ds.createDimension('lat', len(lat))
+    ds.createDimension('lon', len(lon))
+    ds.createVariable('lat', 'float64', ('lat', ))[:] = lat
+    ds.createVariable('lon', 'float64', ('lon', ))[:] = lon
+    z = f(lat[:, None], lon[None, :])
+    z[:5, :3] = -9999.
+    ds.createVariable('z', 'float64', ('lat', 'lon'), zlib=True, chunksizes=(8, 5))[:] = z
+    ds.close()
+
+    chunk_cache.clear()
+    ranges = ((3., 12.), (2., 7.))
+    nci = NetCDFInterpolator(str(tmp_path / 'chunked.nc'), ('lat', 'lon'), ('lat', 'lon'), stats=True)
+    nci.set_ranges(ranges)
+    nci.set_mask_from_fill_value('z', -9999.)
+    # the window overlaps 2x2 chunks, which are read once for the mask
+    assert chunk_cache.misses == 4 and chunk_cache.hits == 0
+    assert nci.stats.counters['bytes_read'] == 4*8*5*8
+    nci.set_field('z')
+    assert chunk_cache.misses == 4 and chunk_cache.hits == 4
+    assert nci.stats.counters['chunk_cache_hits'] == 4
+    # chunks found in the cache are not read again
+    assert nci.stats.counters['bytes_read'] == 4*8*5*8
+    # the newly exposed strip lies within the cached chunks
+    nci.set_ranges(((3., 13.), (2., 7.)))
+    assert chunk_cache.misses == 4
+    assert nci.get_val((12.3, 4.2)) == pytest.approx(f(12.3, 4.2))
+    np.testing.assert_array_equal(nci.val, z[2:16, 1:10])
+
+    # without cache
+    chunk_cache.max_bytes = 0
+    try:
+        reference = NetCDFInterpolator(str(tmp_path / 'chunked.nc'), ('lat', 'lon'), ('lat', 'lon'), ranges=ranges)
+        reference.set_mask_from_fill_value('z', -9999.)
+        reference.set_field('z')
+        assert chunk_cache.misses == 4
+    finally:
+        chunk_cache.max_bytes = ChunkCache().max_bytes
+    nci.set_ranges(ranges)
+    np.testing.assert_array_equal(nci.val, reference.val)
+    np.testing.assert_array_equal(nci.mask, reference.mask)
+    nci.close()
+    reference.close()
+    assert len(chunk_cache.chunks) == 0
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from uptide.projection import UTM, OutOfRangeError, latitude_to_zone_letter, latlon_to_zone_number, \
+    utm_from_latlon, utm_to_latlon
+
+
+def test_utm_from_latlon():
+    # reference values from the utm package
+    easting, northing, zone_number, zone_letter = utm_from_latlon([50.77535, 40.71435, -33.92487, 60.],
+                                                                  [6.08389, -74.00597, 18.42406, 5.])
+    np.testing.assert_allclose(easting, [294409., 583960., 261878., 276980.], atol=1.)
+    np.testing.assert_allclose(northing, [5628898., 4507523., 6243186., 6658157.], atol=1.)
+    np.testing.assert_array_equal(zone_number, [32, 18, 34, 32])
+    assert list(zone_letter) == ['U', 'T', 'H', 'V']
+    assert latitude_to_zone_letter(84.5) is None
+    assert latitude_to_zone_letter(-80.) == 'C'
+    assert latlon_to_zone_number(78., 20.) == 33
+    with pytest.raises(OutOfRangeError):
+        utm_from_latlon([50., 85.], [0., 0.])
+
+
+def test_utm_to_latlon():
+    lat = np.linspace(-79., 83., 50)
+    lon = np.linspace(-179., 179., 50)
+    easting, northing, zone_number, zone_letter = utm_from_latlon(lat, lon)
+    for i in range(len(lat)):
+        lat1, lon1 = utm_to_latlon(easting[i], northing[i], zone_number[i], zone_letter[i])
+        np.testing.assert_allclose([lat1, lon1], [lat[i], lon[i]], atol=1e-6)
+    lat2, lon2 = utm_to_latlon(easting[lat > 0], northing[lat > 0], 30, northern=True)
+    assert lat2.shape == (np.sum(lat > 0),)
+    with pytest.raises(ValueError):
+        utm_to_latlon(500000., 0., 30)
+
+
+def test_utm_projection():
+    # first point of regression/orkney.xy, which is the point (-1.675, 59.0) in regression/orkney.geo
+    xys = np.array([(576121.127234, 6540806.52604), (561128.951408, 6451448.66227)])
+    projection = UTM(30, 'V')
+    lonlats = projection.transform(xys)
+    assert lonlats.shape == (2, 2)
+    np.testing.assert_allclose(lonlats[0], (-1.675, 59.), atol=1e-7)
+    np.testing.assert_allclose(UTM(30, northern=True, order='latlon').transform(xys), lonlats[:, ::-1])
+    np.testing.assert_allclose(projection.inverse(lonlats), xys, atol=1e-3)
+    with pytest.raises(ValueError):
+        UTM(30, 'V', order='xy')
@@ -0,0 +1,148 @@
+import datetime
+import json
+import threading
+import urllib.request
+import netCDF4
+import numpy as np
+import pytest
+import uptide
+from uptide.service import LRUCache, TidePredictor, make_server
+from uptide.tidal_netcdf import AMCGTidalInterpolator, MultiRegionTidalInterpolator
+
+
+class CountingInterpolator(object):
+    # eta = t + x + 10*y, counting the number of set_time calls
+    def __init__(self):
+        self.tide = uptide.Tides(['M2'])
+        self.tide.set_initial_time(datetime.datetime(2020, 1, 1))
+        self.set_time_calls = 0
+
+    def set_time(self, t):
+        self.t = t
+        self.set_time_calls += 1
+
+    def get_vals(self, xs):
+        xs = np.asarray(xs)
+        return self.t + xs[:, 0] + 10*xs[:, 1]
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # discards b, the least recently used
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_predictor():
+    interpolator = CountingInterpolator()
+    predictor = TidePredictor(interpolator, stations={'A': (1., 2.), 'B': (3., 4.)}, time_bucket=60.)
+    times = [datetime.datetime(2020, 1, 1, 1, 0), '2020-01-01T02:00:10', np.datetime64('2020-01-01T03:00')]
+    vals = predictor.predict(['A', 'B', (5., 6.)], times)
+    assert vals.shape == (3, 3)
+    np.testing.assert_allclose(vals[:, 0], [3600. + 21., 7200. + 21., 10800. + 21.])
+    np.testing.assert_allclose(vals[1], 7200. + np.array([21., 43., 65.]))
+    assert interpolator.set_time_calls == 3
+
+    # all cached
+    vals2 = predictor.predict(['A', 'B', (5., 6.)], times)
+    np.testing.assert_array_equal(vals, vals2)
+    assert interpolator.set_time_calls == 3
+    # only the new station is computed
+    predictor.add_station('C', (7., 8.))
+    predictor.predict(['B', 'C'], times[:1])
+    assert interpolator.set_time_calls == 4
+    assert predictor.stats() == {'hits': 10, 'misses': 10, 'cached': 10}
+
+
+def test_predictor_move_station():
+    interpolator = CountingInterpolator()
+    predictor = TidePredictor(interpolator, stations={'A': (1., 2.), 'B': (3., 4.)})
+    np.testing.assert_allclose(predictor.predict(['A', 'B'], [0.]), [[21., 43.]])
+    # predictions for the new location of A, those of B are still cached
+    predictor.add_station('A', (5., 6.))
+    np.testing.assert_allclose(predictor.predict(['A', 'B'], [0.]), [[65., 43.]])
+    assert predictor.stats()['hits'] == 1
+
+
+def test_predictor_datetime0():
+    # times are counted from datetime0, and passed to set_time() relative to the datetime0 of the Tides object
+    interpolator = CountingInterpolator()
+    predictor = TidePredictor(interpolator, stations={'A': (0., 0.)}, datetime0=datetime.datetime(2020, 1, 2))
+    assert predictor.predict(['A'], [3600.])[0, 0] == 86400. + 3600.
+    assert predictor.predict(['A'], ['2020-01-01T01:00'])[0, 0] == 3600.
+
+
+class CountingProjection(object):
+    # shifts x by 100, counting the number of transformed points
+    def __init__(self):
+        self.npoints = 0
+
+    def transform(self, xys):
+        self.npoints += len(xys)
+        return np.asarray(xys) + (100., 0.)
+
+
+def test_predictor_projection():
+    projection = CountingProjection()
+    predictor = TidePredictor(CountingInterpolator(), stations={'A': (1., 2.), 'B': (3., 4.)}, projection=projection)
+    assert projection.npoints == 2
+    assert predictor.stations['A'] == (1., 2.)
+    vals = predictor.predict(['A', 'B', (5., 6.), (7., 8.)], [0.])
+    np.testing.assert_allclose(vals, [[121., 143., 165., 187.]])
+    # station coordinates are only transformed once
+    assert projection.npoints == 4
+    predictor.add_station('C', (5., 6.))
+    assert projection.npoints == 5
+    vals = predictor.predict(['C', (5., 6.)], [0.])
+    np.testing.assert_allclose(vals, [[165., 165.]])
+    assert projection.npoints == 6
+
+
+def test_predictor_multi_region(tmp_path):
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(-10., 5., 31)
+    ds = netCDF4.Dataset(tmp_path / 'amcg.nc', 'w')
+    ds.createDimension('latitude', len(lat))
+    ds.createDimension('longitude', len(lon))
+    ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+    ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+    ds.createVariable('m2amp', 'float64', ('latitude', 'longitude'))[:] = np.ones((21, 31))
+    ds.createVariable('m2phase', 'float64', ('latitude', 'longitude'))[:] = 10.*np.ones((21, 31))
+    ds.close()
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2020, 1, 1))
+    tnci = AMCGTidalInterpolator(tide, str(tmp_path / 'amcg.nc'))
+    mrti = MultiRegionTidalInterpolator(AMCGTidalInterpolator(tide, str(tmp_path / 'amcg.nc')),
+                                        [((51., 53.), (-5., -2.)), ((56., 59.), (1., 4.))])
+    predictor = TidePredictor(mrti, stations={'A': (52., -3.), 'B': (57.5, 2.5)})
+    assert predictor.datetime0 == np.datetime64('2020-01-01')
+    vals = predictor.predict(['A', 'B'], ['2020-01-01T01:00'])
+    tnci.set_time(3600.)
+    np.testing.assert_allclose(vals, [tnci.get_vals([(52., -3.), (57.5, 2.5)])])
+
+
+def test_server():
+    predictor = TidePredictor(CountingInterpolator(), stations={'A': (1., 2.)})
+    server = make_server(predictor, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+        query = {'stations': ['A'], 'times': ['2020-01-01T01:00', '2020-01-01T02:00']}
+        request = urllib.request.Request(url + 'predict', data=json.dumps(query).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            values = json.loads(response.read())['values']
+        np.testing.assert_allclose(values, [[3621.], [7221.]])
+        with urllib.request.urlopen(url + 'stations') as response:
+            assert json.loads(response.read()) == {'A': [1., 2.]}
+        request = urllib.request.Request(url + 'predict', data=json.dumps({'stations': ['X'], 'times': []}).encode())
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(request)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -107,3 +107,47 @@ def test_select_constituents():
     constituents = ['M2', 'S2', 'N2', 'K2', 'O1', 'P1', 'Q1', 'K1', 'M4', 'S1', 'MU2', 'NU2', 'L2', 'T2', 'Z0']
     assert uptide.select_constituents(constituents, 15*86400.) == ['M2', 'S2', 'O1', 'P1', 'M4', 'Z0']
     assert uptide.select_constituents(constituents, 31*86400.) == ['M2', 'S2', 'N2', 'O1', 'P1', 'Q1', 'M4', 'Z0']
+
+
+def test_prepared_tides():
+    tide = uptide.Tides(['M2', 'S2', 'K1', 'O1'])
+    tide.set_initial_time(datetime.datetime(2003, 1, 17, 19, 30))
+    rng = numpy.random.default_rng(42)
+    real_parts, imag_parts = rng.random((2, 4, 5, 3))
+    prepared = uptide.PreparedTides(tide, real_parts, imag_parts)
+    for t in (0., 1000., 86400.*3):
+        assert_almost_equal(prepared.evaluate(t), tide.from_complex_components(real_parts, imag_parts, t))
+    # coefficients are refolded when the nodal corrections change
+    tide.compute_nodal_corrections(86400.*200)
+    assert_almost_equal(prepared.evaluate(1000.), tide.from_complex_components(real_parts, imag_parts, 1000.))
+
+    amplitudes, phases = [1., 0.5, 0.2, 0.1], [0.1, 2., 3., -1.]
+    prepared = uptide.PreparedTides.from_amplitude_phase(tide, amplitudes, phases)
+    assert_almost_equal(prepared.evaluate(3600.), tide.from_amplitude_phase(amplitudes, phases, 3600.))
+    # many times at once
+    ts = numpy.array([0., 3600., 7200.])
+    assert_almost_equal(prepared.evaluate(ts), [tide.from_amplitude_phase(amplitudes, phases, t) for t in ts])
+
+
+def test_prepared_tides_engines():
+    tide = uptide.Tides(['M2', 'S2', 'K1', 'O1'])
+    tide.set_initial_time(datetime.datetime(2003, 1, 17, 19, 30))
+    rng = numpy.random.default_rng(42)
+    real_parts, imag_parts = rng.random((2, 4, 5, 3))
+    ts = numpy.array([0., 1000., 86400.*3])
+    expected = [tide.from_complex_components(real_parts, imag_parts, t) for t in ts]
+    for engine in uptide.PreparedTides.engines:
+        prepared = uptide.PreparedTides(tide, real_parts, imag_parts, engine=engine)
+        assert_almost_equal(prepared.evaluate(ts[1]), expected[1])
+        assert_almost_equal(prepared.evaluate(ts), expected)
+        # preallocated output, for a single time and for many
+        out = numpy.empty((5, 3))
+        assert prepared.evaluate(ts[2], out=out) is out
+        assert_almost_equal(out, expected[2])
+        out = numpy.empty((3, 5, 3))
+        prepared.evaluate(ts, out=out)
+        assert_almost_equal(out, expected)
+        with pytest.raises(ValueError):
+            prepared.evaluate(ts, out=numpy.empty((5, 3)))
+    with pytest.raises(ValueError):
+        uptide.PreparedTides(tide, real_parts, imag_parts, engine='loop')
@@ -0,0 +1,180 @@
+import datetime
+import netCDF4
+import numpy as np
+import pytest
+import uptide
+from uptide.mesh import read_boundaries, read_boundary_nodes, read_boundary_polylines
+from uptide.projection import UTM
+from uptide.tidal_netcdf import AMCGTidalInterpolator
+from uptide.transect import TransectTidalInterpolator, resample_polyline
+
+
+@pytest.fixture
+def amcg_file(tmp_path):
+    lat = np.linspace(50., 60., 21)
+    lon = np.linspace(-10., 5., 31)
+    ds = netCDF4.Dataset(tmp_path / 'amcg.nc', 'w')
+    ds.createDimension('latitude', len(lat))
+    ds.createDimension('longitude', len(lon))
+    ds.createVariable('latitude', 'float64', ('latitude',))[:] = lat
+    ds.createVariable('longitude', 'float64', ('longitude',))[:] = lon
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing='ij')
+    ds.createVariable('m2amp', 'float64', ('latitude', 'longitude'))[:] = 1. + 0.1*lat2d - 0.05*lon2d
+    ds.createVariable('m2phase', 'float64', ('latitude', 'longitude'))[:] = 2.*lat2d + 3.*lon2d
+    ds.close()
+    return str(tmp_path / 'amcg.nc')
+
+
+# a square with corners (52, -5) and (54, -3), and its 4 sides with physical ids 1 to 4
+nodes = [(1, 52., -5.), (2, 54., -5.), (3, 54., -3.), (4, 52., -3.), (5, 53., -5.), (6, 53., -4.)]
+elements = [(1, 1, 2, 1, 1, 1, 5), (2, 1, 2, 1, 1, 5, 2), (3, 1, 2, 2, 2, 2, 3), (4, 1, 2, 3, 3, 3, 4),
+            (5, 1, 2, 4, 4, 4, 1), (6, 2, 2, 5, 5, 1, 5, 6)]
+
+
+def write_msh(file_name, nodes, elements):
+    with open(file_name, 'w') as f:
+        f.write('$MeshFormat\n2.2 0 8\n$EndMeshFormat\n$Nodes\n{}\n'.format(len(nodes)))
+        for node in nodes:
+            f.write('{} {} {} 0\n'.format(*node))
+        f.write('$EndNodes\n$Elements\n{}\n'.format(len(elements)))
+        for element in elements:
+            f.write(' '.join(str(i) for i in element) + '\n')
+        f.write('$EndElements\n')
+    return str(file_name)
+
+
+@pytest.fixture
+def msh_file(tmp_path):
+    return write_msh(tmp_path / 'square.msh', nodes, elements)
+
+
+@pytest.fixture
+def binary_msh_file(tmp_path):
+    # the same mesh in the binary msh format, with the elements in blocks of the same type and number of tags
+    with open(tmp_path / 'square_bin.msh', 'wb') as f:
+        f.write(b'$MeshFormat\n2.2 1 8\n' + np.int32(1).tobytes() + b'\n$EndMeshFormat\n')
+        f.write('$Nodes\n{}\n'.format(len(nodes)).encode())
+        for node in nodes:
+            f.write(np.int32(node[0]).tobytes() + np.array([node[1], node[2], 0.]).tobytes())
+        f.write('\n$EndNodes\n$Elements\n{}\n'.format(len(elements)).encode())
+        for element_type, block in ((1, elements[:2]), (1, elements[2:5]), (2, elements[5:])):
+            f.write(np.array([element_type, len(block), 2], dtype=np.int32).tobytes())
+            f.write(np.array([(e[0],) + e[3:] for e in block], dtype=np.int32).tobytes())
+        f.write(b'\n$EndElements\n')
+    return str(tmp_path / 'square_bin.msh')
+
+
+def test_resample_polyline():
+    xs = resample_polyline([(0., 0.), (3., 0.), (3., 2.)], 0.45)
+    # 5 units long, so 12 segments of 5/12
+    assert len(xs) == 13
+    np.testing.assert_allclose(xs[:8, 0], np.minimum(np.arange(8)*5./12., 3.))
+    np.testing.assert_allclose(xs[:, 1], np.maximum(np.arange(13)*5./12.-3., 0.))
+
+
+def test_read_boundary_nodes(msh_file):
+    np.testing.assert_array_equal(read_boundary_nodes(msh_file, [1]), [(52., -5.), (54., -5.), (53., -5.)])
+    np.testing.assert_array_equal(read_boundary_nodes(msh_file, [2, 3]), [(54., -5.), (54., -3.), (52., -3.)])
+
+
+def test_read_boundaries(msh_file, binary_msh_file):
+    for file_name in (msh_file, binary_msh_file):
+        boundaries = read_boundaries(file_name)
+        assert sorted(boundaries) == [1, 2, 3, 4]
+        np.testing.assert_array_equal(boundaries[1], [(52., -5.), (54., -5.), (53., -5.)])
+        np.testing.assert_array_equal(boundaries[4], [(52., -5.), (52., -3.)])
+        assert list(read_boundaries(file_name, [2])) == [2]
+        np.testing.assert_array_equal(read_boundary_nodes(file_name, [2, 3]), [(54., -5.), (54., -3.), (52., -3.)])
+
+
+def test_read_boundaries_numbering(tmp_path):
+    # node numbers that are not contiguous, a second order line, and Windows line endings
+    with open(tmp_path / 'lines.msh', 'w', newline='\r\n') as f:
+        f.write('$MeshFormat\n2.2 0 8\n$EndMeshFormat\n$Nodes\n4\n')
+        f.write('10 0. 0. 0\n20 1. 0. 0\n40 2. 0. 0\n50 3. 0. 0\n$EndNodes\n')
+        f.write('$Elements\n3\n1 1 2 7 1 50 20\n2 8 2 9 2 10 40 20\n3 15 2 7 3 10\n$EndElements\n')
+    boundaries = read_boundaries(str(tmp_path / 'lines.msh'))
+    assert sorted(boundaries) == [7, 9]
+    np.testing.assert_array_equal(boundaries[7], [(1., 0.), (3., 0.)])
+    np.testing.assert_array_equal(boundaries[9], [(0., 0.), (1., 0.), (2., 0.)])
+
+
+def test_read_boundary_polylines(msh_file):
+    # sides 1 and 2 are joined at the corner (54, -5)
+    polylines = read_boundary_polylines(msh_file, [1, 2])
+    assert len(polylines) == 1
+    np.testing.assert_array_equal(polylines[0], [(52., -5.), (53., -5.), (54., -5.), (54., -3.)])
+    # all sides form a closed loop
+    polylines = read_boundary_polylines(msh_file, [1, 2, 3, 4])
+    assert len(polylines) == 1 and len(polylines[0]) == 6
+    np.testing.assert_array_equal(polylines[0][0], polylines[0][-1])
+
+
+def test_transect(amcg_file, msh_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    tnci = AMCGTidalInterpolator(tide, amcg_file, ranges=((51., 55.), (-6., -2.)))
+    ts = np.arange(5)*3600.
+    for transect in (TransectTidalInterpolator.from_polyline(tnci, [(52., -5.), (54., -3.)], 0.1),
+                     TransectTidalInterpolator.from_gmsh(tnci, msh_file, [1, 2, 3, 4]),
+                     TransectTidalInterpolator.from_gmsh(tnci, msh_file, [1, 2], spacing=0.25)):
+        expected = []
+        for t in ts:
+            tnci.set_time(t)
+            expected.append(tnci.get_vals(transect.xs))
+        np.testing.assert_allclose(transect.get_vals_at_times(ts), expected)
+        np.testing.assert_allclose(transect.get_vals(ts[2]), expected[2])
+    # the sides with physical ids 1 and 2 resampled at a spacing of 0.25
+    np.testing.assert_allclose(transect.xs[:, 0], np.minimum(52. + 0.25*np.arange(17), 54.))
+    np.testing.assert_allclose(transect.xs[:, 1], np.maximum(-5. + 0.25*np.arange(17) - 2., -5.))
+
+
+def test_transect_projection(amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    tnci = AMCGTidalInterpolator(tide, amcg_file, ranges=((51., 55.), (-6., -2.)))
+    projection = UTM(30, 'U', order='latlon')
+    xys = projection.inverse([(52., -5.), (54., -3.)])
+    transect = TransectTidalInterpolator.from_polyline(tnci, xys, 5000., projection=projection)
+    np.testing.assert_allclose(transect.xs[[0, -1]], xys)
+    np.testing.assert_allclose(transect.coordinates, projection.transform(transect.xs))
+    tnci.set_time(3600.)
+    np.testing.assert_allclose(transect.get_vals(3600.), tnci.get_vals(transect.coordinates))
+
+
+def test_tidal_interpolator_projection(amcg_file):
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    projection = UTM(30, 'U', order='latlon')
+    xys = projection.inverse([(52., -5.), (54., -3.), (53.1, -4.2)])
+    model_ranges = tuple(zip(xys.min(axis=0) - 1000., xys.max(axis=0) + 1000.))
+    tnci = AMCGTidalInterpolator(tide, amcg_file, ranges=model_ranges, projection=projection)
+    reference = AMCGTidalInterpolator(tide, amcg_file, ranges=((51., 55.), (-6., -2.)))
+    # the ranges contain the points, which are given in UTM coordinates
+    assert tnci.in_ranges(xys).all()
+    assert tnci.nci.in_ranges(projection.transform(xys)).all()
+    tnci.set_time(3600.)
+    reference.set_time(3600.)
+    np.testing.assert_allclose(tnci.get_vals(xys), reference.get_vals(projection.transform(xys)))
+    assert tnci.get_val(xys[2]) == pytest.approx(reference.get_val(tuple(projection.transform(xys[2:])[0])))
+    mrti = uptide.tidal_netcdf.MultiRegionTidalInterpolator(tnci.copy(), [model_ranges])
+    mrti.set_time(3600.)
+    np.testing.assert_allclose(mrti.get_vals(xys), tnci.get_vals(xys))
+    # a transect along the boundary of a mesh in UTM coordinates, without a projection of its own
+    transect = TransectTidalInterpolator.from_polyline(tnci, xys[:2], 5000.)
+    np.testing.assert_allclose(transect.get_vals(3600.), reference.get_vals(projection.transform(transect.xs)))
+
+
+def test_transect_gmsh_branch(amcg_file, tmp_path):
+    # a line with physical id 5 from the middle of side 1, at (53, -5), into the square: the boundary branches there
+    msh_file = write_msh(tmp_path / 'branch.msh', nodes, elements + [(7, 1, 2, 5, 5, 5, 6)])
+    polylines = read_boundary_polylines(msh_file, [1, 5])
+    assert len(polylines) == 3
+    tide = uptide.Tides(['M2'])
+    tide.set_initial_time(datetime.datetime(2020, 3, 1))
+    tnci = AMCGTidalInterpolator(tide, amcg_file, ranges=((51., 55.), (-6., -2.)))
+    transect = TransectTidalInterpolator.from_gmsh(tnci, msh_file, [1, 5], spacing=0.5)
+    # the branch point is only repeated where a polyline does not start at the end of the previous one
+    assert len(transect.xs) == 3*3 - 1
+    np.testing.assert_array_equal(np.unique(transect.xs, axis=0), [(52., -5.), (52.5, -5.), (53., -5.), (53., -4.5),
+                                                                   (53., -4.), (53.5, -5.), (54., -5.)])
@@ -15,12 +15,39 @@ Python package for tidal computations. Main components:
         class of objects to reconstruct tidal signal from tidal database of
         amplitudes and phases of tidal constituents stored in NetCDF format.
         Different formats, OTPSnc, FES and AMCG, are supported.
+        tidal_netcdf.FES2014NetCDFTidalInterpolator reads the FES2014 files
+        directly, without the fes library.
 
 """
 
-from uptide.tides import Tides, select_constituents  # NOQA
-from .analysis import harmonic_analysis  # NOQA
-from .tidal_netcdf import OTPSncTidalInterpolator  # NOQA
-from .tidal_netcdf import TPXOTidalInterpolator  # NOQA
-from .fes_interpolator import FES2014TidalInterpolator, ALL_FES2014_TIDAL_CONSTITUENTS  # NOQA
-from .ellipse import tidal_ellipse_parameters  # NOQA
+from uptide.tides import Tides, PreparedTides, select_constituents  # NOQA
+from .analysis import harmonic_analysis, parallel_harmonic_analysis  # NOQA
+from .ellipse import tidal_ellipse_parameters, tidal_ellipse_parameters_from_complex  # NOQA
+import importlib
+
+# The NetCDF and FES based interpolators, and the submodules that are not imported above, are only imported when first
+# accessed, so that "import uptide" stays cheap for users of Tides and harmonic_analysis only (see PEP 562).
+_lazy_attributes = {
+    'OTPSncTidalInterpolator': 'tidal_netcdf',
+    'TPXOTidalInterpolator': 'tidal_netcdf',
+    'FES2014NetCDFTidalInterpolator': 'tidal_netcdf',
+    'FES2014TidalInterpolator': 'fes_interpolator',
+    'ALL_FES2014_TIDAL_CONSTITUENTS': 'fes_interpolator',
+}
+_lazy_submodules = ('netcdf_reader', 'tidal_netcdf', 'fes_interpolator', 'service', 'stats', 'mesh', 'transect',
+                    'projection')
+__all__ = ['Tides', 'PreparedTides', 'select_constituents', 'harmonic_analysis', 'parallel_harmonic_analysis',
+           'tidal_ellipse_parameters', 'tidal_ellipse_parameters_from_complex'] + list(_lazy_attributes)
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module('.' + _lazy_attributes[name], __name__)
+        return getattr(module, name)
+    if name in _lazy_submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes) + list(_lazy_submodules))
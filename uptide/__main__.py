@@ -0,0 +1,231 @@
+"""Command line interface of uptide. Currently provides a single command, predict, that computes tidal elevations
+in a list of stations (or points) for a range of times:
+
+    python -m uptide predict --database tpxo --grid-file gridES2008.nc --data hf.ES2008.nc \\
+        --stations stations.csv --start 2020-03-01 --end 2020-04-01 --step 600 --output tides.nc
+
+The stations file is a CSV file with a header and "name", "lon" and "lat" columns. Alternatively --points
+can be used for a text file with a lon and lat coordinate on each line. The supported databases are
+tpxo (--grid-file and --data the grid and elevation file), amcg (--data the netCDF file), fes2014-netcdf
+(--data the directory with the FES2014 constituent files, read by uptide itself) and fes2014 (--data the same
+directory, or an ocean_tide.ini file, using the fes library). Output is written as CSV (--output ending in .csv or
+"-" for stdout), with a column for each station, or as NetCDF (--output ending in .nc).
+
+For the NetCDF databases, the complex components of the constituents are interpolated to the stations once,
+after which the tide is evaluated for chunks of --chunk-size times at once. The chunks can be divided over
+several processes with --processes. All times are in UTC; the nodal corrections are computed for the start time."""
+import argparse
+import csv
+import datetime
+import multiprocessing
+import sys
+import numpy
+import uptide
+from uptide import tidal_netcdf
+
+DEFAULT_CONSTITUENTS = 'M2,S2,N2,K2,K1,O1,P1,Q1'
+
+
+def read_stations(file_name):
+    """Read station names and (lon, lat) coordinates from a CSV file with "name", "lon" and "lat" columns
+    ("longitude" and "latitude" are also accepted)."""
+    names, coordinates = [], []
+    with open(file_name, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): value for key, value in row.items()}
+            lon = row['lon'] if 'lon' in row else row['longitude']
+            lat = row['lat'] if 'lat' in row else row['latitude']
+            names.append(row['name'].strip())
+            coordinates.append((float(lon), float(lat)))
+    return names, numpy.array(coordinates).reshape(-1, 2)
+
+
+def read_points(file_name):
+    """Read (lon, lat) coordinates from a text file with a point on each line. The points are named by their index."""
+    coordinates = numpy.loadtxt(file_name, delimiter=',' if file_name.endswith('.csv') else None, ndmin=2)
+    return [str(i) for i in range(len(coordinates))], coordinates[:, :2]
+
+
+class PreparedPredictor(object):
+    """Predicts the tide in a fixed set of points from the complex components of the constituents in these points."""
+    def __init__(self, tide, real_parts, imag_parts):
+        self.prepared = uptide.PreparedTides(tide, real_parts, imag_parts)
+
+    def __call__(self, ts):
+        return self.prepared.evaluate(ts)
+
+
+class FES2014Predictor(object):
+    """Predicts the tide in a fixed set of points using the fes library. The FES2014TidalInterpolator
+    is created when first used, so that each process of a multiprocessing pool creates its own (once, see _init_worker)."""
+    def __init__(self, tide, fes_data, xs, chunk_size):
+        self.tide, self.fes_data, self.xs, self.chunk_size = tide, fes_data, xs, chunk_size
+        self.tnci = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['tnci'] = None
+        return state
+
+    def __call__(self, ts):
+        if self.tnci is None:
+            if self.fes_data.endswith('.ini'):
+                self.tnci = uptide.FES2014TidalInterpolator(self.fes_data, chunk_size=self.chunk_size)
+                self.tnci.set_initial_time(self.tide.datetime0)
+            else:
+                self.tnci = uptide.FES2014TidalInterpolator(self.tide, self.fes_data, chunk_size=self.chunk_size)
+        return self.tnci.get_vals_at_times(self.xs, ts)
+
+
+def create_predictor(args, tide, lonlats):
+    """Create a predictor for the stations with coordinates lonlats, from the database specified in args."""
+    if args.database == 'fes2014':
+        latlons = numpy.stack([lonlats[:, 1], lonlats[:, 0] % 360.], axis=1)
+        return FES2014Predictor(tide, args.data, latlons, args.chunk_size*len(latlons))
+
+    if args.database == 'tpxo':
+        if args.grid_file is None:
+            raise SystemExit("--grid-file is required for the tpxo database")
+        xs = lonlats
+    elif args.database == 'fes2014-netcdf':
+        xs = numpy.stack([lonlats[:, 1], lonlats[:, 0] % 360.], axis=1)
+    else:
+        xs = lonlats[:, ::-1]
+    pad = args.pad
+    ranges = tuple((xs[:, i].min() - pad, xs[:, i].max() + pad) for i in range(2))
+    if args.database == 'tpxo':
+        tnci = tidal_netcdf.TPXOTidalInterpolator(tide, args.grid_file, args.data, ranges=ranges)
+    elif args.database == 'fes2014-netcdf':
+        tnci = tidal_netcdf.FES2014NetCDFTidalInterpolator(tide, args.data, ranges=ranges)
+    else:
+        tnci = tidal_netcdf.AMCGTidalInterpolator(tide, args.data, ranges=ranges)
+    with tnci:
+        real_parts, imag_parts = tnci.get_complex_components(xs, allow_extrapolation=args.allow_extrapolation)
+    return PreparedPredictor(tide, real_parts.T, imag_parts.T)
+
+
+class CSVWriter(object):
+    def __init__(self, file_name, names, lonlats, datetime0):
+        self.file = sys.stdout if file_name == '-' else open(file_name, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['time'] + list(names))
+        self.datetime0 = numpy.datetime64(datetime0, 's')
+
+    def write(self, ts, vals):
+        dates = self.datetime0 + numpy.round(ts).astype('timedelta64[s]')
+        for date, row in zip(dates, vals):
+            self.writer.writerow([str(date)] + ['{:.6f}'.format(val) for val in row])
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class NetCDFWriter(object):
+    def __init__(self, file_name, names, lonlats, datetime0):
+        import netCDF4
+        self.nc = netCDF4.Dataset(file_name, 'w')
+        self.nc.createDimension('time', None)
+        self.nc.createDimension('station', len(names))
+        time = self.nc.createVariable('time', 'float64', ('time',))
+        time.units = 'seconds since {}'.format(datetime0.strftime('%Y-%m-%d %H:%M:%S'))
+        time.calendar = 'standard'
+        self.nc.createVariable('station_name', str, ('station',))[:] = numpy.array(names, dtype=object)
+        lon = self.nc.createVariable('lon', 'float64', ('station',))
+        lon.units = 'degrees_east'
+        lon[:] = lonlats[:, 0]
+        lat = self.nc.createVariable('lat', 'float64', ('station',))
+        lat.units = 'degrees_north'
+        lat[:] = lonlats[:, 1]
+        elevation = self.nc.createVariable('elevation', 'float64', ('time', 'station'))
+        elevation.units = 'm'
+        self.n = 0
+
+    def write(self, ts, vals):
+        self.nc.variables['time'][self.n:self.n+len(ts)] = ts
+        self.nc.variables['elevation'][self.n:self.n+len(ts), :] = vals
+        self.n += len(ts)
+
+    def close(self):
+        self.nc.close()
+
+
+# the predictor of a worker process of the multiprocessing pool in predict()
+_worker_predictor = None
+
+
+def _init_worker(predictor):
+    """Initialize a worker process with the predictor, which is pickled only once for each worker."""
+    global _worker_predictor
+    _worker_predictor = predictor
+
+
+def _predict_chunk(ts):
+    return _worker_predictor(ts)
+
+
+def parse_datetime(s):
+    dt = datetime.datetime.fromisoformat(s)
+    if dt.tzinfo:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def predict(args):
+    if args.stations is not None:
+        names, lonlats = read_stations(args.stations)
+    else:
+        names, lonlats = read_points(args.points)
+    start, end = parse_datetime(args.start), parse_datetime(args.end)
+    tide = uptide.Tides(args.constituents.split(','))
+    tide.set_initial_time(start)
+    predictor = create_predictor(args, tide, lonlats)
+
+    ts = numpy.arange(0., (end - start).total_seconds() + args.step/2., args.step)
+    chunks = [ts[i:i+args.chunk_size] for i in range(0, len(ts), args.chunk_size)]
+    writer_class = NetCDFWriter if args.output.endswith('.nc') else CSVWriter
+    writer = writer_class(args.output, names, lonlats, start)
+    try:
+        if args.processes > 1:
+            with multiprocessing.Pool(args.processes, initializer=_init_worker, initargs=(predictor,)) as pool:
+                # results are returned in order of the chunks
+                for chunk, vals in zip(chunks, pool.imap(_predict_chunk, chunks)):
+                    writer.write(chunk, vals)
+        else:
+            for chunk in chunks:
+                writer.write(chunk, predictor(chunk))
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m uptide', description='uptide tidal computations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    p = subparsers.add_parser('predict', help='predict tidal elevations in stations for a range of times')
+    p.add_argument('--database', required=True, choices=['tpxo', 'amcg', 'fes2014-netcdf', 'fes2014'])
+    p.add_argument('--data', required=True,
+                   help='data file (tpxo, amcg), or directory with constituent files or .ini file (fes2014)')
+    p.add_argument('--grid-file', help='grid file (tpxo)')
+    p.add_argument('--constituents', default=DEFAULT_CONSTITUENTS,
+                   help='comma separated list of constituents (default: %(default)s)')
+    stations = p.add_mutually_exclusive_group(required=True)
+    stations.add_argument('--stations', help='CSV file with name, lon and lat columns')
+    stations.add_argument('--points', help='text file with lon, lat on each line')
+    p.add_argument('--start', required=True, help='start time (ISO 8601, UTC)')
+    p.add_argument('--end', required=True, help='end time (ISO 8601, UTC)')
+    p.add_argument('--step', type=float, default=600., help='time step in seconds (default: %(default)s)')
+    p.add_argument('--output', default='-', help='output file, .csv or .nc (default: CSV to stdout)')
+    p.add_argument('--chunk-size', type=int, default=1000,
+                   help='number of times evaluated at once (default: %(default)s)')
+    p.add_argument('--processes', type=int, default=1, help='number of processes (default: %(default)s)')
+    p.add_argument('--pad', type=float, default=1.0,
+                   help='margin in degrees around the stations of the region read from the database (default: %(default)s)')
+    p.add_argument('--allow-extrapolation', action='store_true',
+                   help='extrapolate from the nearest wet point for stations on land according to the database')
+    args = parser.parse_args(argv)
+    if args.command == 'predict':
+        predict(args)
+
+
+if __name__ == '__main__':
+    main()
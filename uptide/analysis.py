@@ -2,16 +2,9 @@ import numpy
 import numpy.linalg
 
 
-def harmonic_analysis(tide, x, t):
-    """Perform tidal harmonic analysis for a given signal x at times t.
-    Returns the amplitudes and phases of the constituents defined in tide
-    (a Tides object), in the order of tide.constituents. The times t are
-    in seconds after the date time set with tide.set_initial_time()."""
-    if not len(x) == len(t):
-        raise Exception("Length of x and t should be the same")
+def _basis_matrix(tide, t):
+    """The matrix of the least squares problem solved by harmonic_analysis(), with a row for each time in t."""
     N = len(t)
-    M = len(tide.omega)
-
     """We first target for a solution of the form:
         eta = Z0 + \\sum_n B_n cos omega_n t + C_n sin omega_n t
                 = Z0 + \\sum_n Re[ (B_n-i C_n) e^(i omega_n t) ]"""
@@ -22,7 +15,7 @@ def harmonic_analysis(tide, x, t):
             B_j=Z0 and we leave out C_j (as its associated sin() is always zero)"""
         # the indices of the constituents other than Z0
         nonz0 = numpy.array(tide.constituents) != 'Z0'
-        mat = numpy.hstack([
+        return numpy.hstack([
             numpy.cos(numpy.outer(t, tide.omega)),
             numpy.sin(numpy.outer(t, tide.omega[nonz0]))
         ])
@@ -30,34 +23,159 @@ def harmonic_analysis(tide, x, t):
         """we solve for the least squares approximation
                 y=[Z0, B_1, B_2,...B_M, C_1, C_2,...C_M]
             that closest approximates x at all t"""
-        mat = numpy.hstack([
+        return numpy.hstack([
             numpy.ones((N, 1)),
             numpy.cos(numpy.outer(t, tide.omega)),
             numpy.sin(numpy.outer(t, tide.omega))
         ])
 
-    y = numpy.linalg.lstsq(mat, x, rcond=None)
 
+def _amplitudes_and_phases(tide, y):
+    """Convert the least squares solution y (of shape (2M+1,) or (2M+1, nsignals)) to amplitudes and phases."""
+    M = len(tide.omega)
     if "Z0" in tide.constituents:
-        B = y[0][0:M]
+        nonz0 = numpy.array(tide.constituents) != 'Z0'
+        B = y[0:M]
         # the C_j associated with Z0 is left zero
-        C = numpy.zeros(M)
-        C[nonz0] = y[0][M:]
+        C = numpy.zeros(B.shape)
+        C[nonz0] = y[M:]
     else:
-        B = y[0][1:M+1]
-        C = y[0][M+1:]
+        B = y[1:M+1]
+        C = y[M+1:]
     A = B - 1j*C
     """Now with A_n=B_n -i C_n, we have
           eta = Z0 + \\sum_n Re[ A_n e^(i omega_n t) ]
                   = Z0 + \\sum_n Re[ C_n f_n e^(i (-g+phi+u)) e^(i omega_n t)]
                   = Z0 + \\sum_n a_n f_n cos(omega_n t-g+phi_n+u_n),
     i.o.w. A_n = a_n f_n e^(i (-g+phi+u))"""
-    a = numpy.abs(A)/tide.f
+    # reshape f, phi and u such that they broadcast over any further dimensions of A
+    shape = (M,) + (1,)*(A.ndim-1)
+    a = numpy.abs(A)/tide.f.reshape(shape)
     arg = numpy.angle(A)
-    g = (tide.phi+tide.u-arg) % (2*numpy.pi)
+    g = ((tide.phi+tide.u).reshape(shape)-arg) % (2*numpy.pi)
     return a, g
 
 
+def harmonic_analysis(tide, x, t):
+    """Perform tidal harmonic analysis for a given signal x at times t.
+    Returns the amplitudes and phases of the constituents defined in tide
+    (a Tides object), in the order of tide.constituents. The times t are
+    in seconds after the date time set with tide.set_initial_time().
+    Several signals at the same times may be analysed at once by providing x as an
+    array of shape (len(t), nsignals), in which case the amplitudes and phases are
+    of shape (nconstituents, nsignals)."""
+    if not len(x) == len(t):
+        raise Exception("Length of x and t should be the same")
+    mat = _basis_matrix(tide, t)
+    y = numpy.linalg.lstsq(mat, x, rcond=None)
+    return _amplitudes_and_phases(tide, y[0])
+
+
+# shared memory blocks and arrays attached to by the worker processes of parallel_harmonic_analysis()
+_shared = {}
+
+
+def _attach_shared_memory(name, shape, dtype):
+    from multiprocessing import shared_memory
+    # the block is unlinked by the process that created it
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_analysis_worker(tide, basis_spec, signal_spec):
+    # attach to the basis matrix and signals created by parallel_harmonic_analysis()
+    _shared['tide'] = tide
+    _shared['basis'] = _attach_shared_memory(*basis_spec)
+    _shared['signals'] = _attach_shared_memory(*signal_spec)
+
+
+def _analyse_records(start, stop):
+    """Analyse records start:stop of the shared signals. Returns their amplitudes and phases and a dict
+    with the reason of failure of any records that could not be analysed."""
+    tide = _shared['tide']
+    mat = _shared['basis'][1]
+    x = _shared['signals'][1][start:stop]
+    amplitudes = numpy.full((len(x), len(tide.omega)), numpy.nan)
+    phases = numpy.full((len(x), len(tide.omega)), numpy.nan)
+    failures = {}
+    # records without missing values are solved all at once
+    valid = numpy.isfinite(x)
+    complete = valid.all(axis=1)
+    if complete.any():
+        y = numpy.linalg.lstsq(mat, x[complete].T, rcond=None)[0]
+        a, g = _amplitudes_and_phases(tide, y)
+        amplitudes[complete], phases[complete] = a.T, g.T
+    for i in numpy.flatnonzero(~complete):
+        if valid[i].sum() < mat.shape[1]:
+            failures[start+i] = "Only {} valid values for {} unknowns".format(valid[i].sum(), mat.shape[1])
+            continue
+        try:
+            y = numpy.linalg.lstsq(mat[valid[i]], x[i, valid[i]], rcond=None)[0]
+        except numpy.linalg.LinAlgError as e:
+            failures[start+i] = str(e)
+            continue
+        amplitudes[i], phases[i] = _amplitudes_and_phases(tide, y)
+    return amplitudes, phases, failures
+
+
+def parallel_harmonic_analysis(tide, x, t, max_workers=None, chunk_size=100, progress=None):
+    """Perform the harmonic analysis of many signals at the same times t, in parallel using a
+    pool of max_workers processes (by default the number of processors). The signals x are given as an
+    array of shape (..., len(t)), e.g. (nstations, len(t)) for a set of tide gauge records or
+    (nx, ny, len(t)) for a tile of a grid. Missing values may be given as NaN. The basis matrix and the
+    signals are shared with the worker processes through shared memory, and the signals are divided over
+    the workers in chunks of chunk_size records. If provided, progress(ndone, ntotal) is called after each
+    completed chunk.
+
+    Returns amplitudes and phases, arrays of shape (..., nconstituents) in the same order as the signals,
+    and a dict that maps the (flattened) indices of the records that could not be analysed, and
+    for which NaN amplitudes and phases are returned, to the reason of their failure."""
+    import concurrent.futures
+    from multiprocessing import shared_memory
+    x = numpy.asarray(x, dtype=float)
+    if not x.shape[-1] == len(t):
+        raise Exception("Last dimension of x and length of t should be the same")
+    shape = x.shape[:-1]
+    x = x.reshape(-1, len(t))
+    n = len(x)
+    M = len(tide.omega)
+    amplitudes = numpy.full((n, M), numpy.nan)
+    phases = numpy.full((n, M), numpy.nan)
+    failures = {}
+
+    blocks = []
+    try:
+        specs = []
+        for array in (_basis_matrix(tide, t), x):
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(shm)
+            numpy.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            specs.append((shm.name, array.shape, array.dtype.str))
+        with concurrent.futures.ProcessPoolExecutor(max_workers, initializer=_init_analysis_worker,
+                                                    initargs=(tide, *specs)) as executor:
+            futures = {executor.submit(_analyse_records, start, min(start+chunk_size, n)): start
+                       for start in range(0, n, chunk_size)}
+            ndone = 0
+            for future in concurrent.futures.as_completed(futures):
+                start = futures[future]
+                stop = min(start+chunk_size, n)
+                try:
+                    amplitudes[start:stop], phases[start:stop], chunk_failures = future.result()
+                    failures.update(chunk_failures)
+                except Exception as e:
+                    for i in range(start, stop):
+                        failures[i] = "{}: {}".format(type(e).__name__, e)
+                ndone += stop - start
+                if progress is not None:
+                    progress(ndone, n)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return amplitudes.reshape(shape + (M,)), phases.reshape(shape + (M,)), failures
+
+
 def error_analysis(mod_amp, mod_phase, obs_amp, obs_phase):
     """Perform error analysis of model and observations (or two models) based
     on amplitudes and phases of components. The test is based on
@@ -25,3 +25,35 @@ def tidal_ellipse_parameters(au, pu, av, pv):
     theta = 0.5 * (gc+gac)
     g = 0.5 * (gc-gac) % (2*numpy.pi)
     return a, b, theta, g
+
+
+def tidal_ellipse_parameters_from_complex(u_real, u_imag, v_real, v_imag, chunk_size=None):
+    """Computes the same ellipse parameters as tidal_ellipse_parameters(), but from the real and imaginary
+    parts of the u and v components of velocity, where real=amplitude*cos(phase) and imag=-amplitude*sin(phase),
+    as used by Tides.from_complex_components() and TidalNetCDFInterpolator. The arrays may have any (broadcastable)
+    shape, e.g. (nconstituents, nx, ny) for the coefficients on a grid. The parameters are computed from the
+    rotary (counter-clockwise and clockwise) components, which requires fewer transcendental function evaluations. If
+    chunk_size is specified, the computation is done for chunk_size entries at a time, so that the
+    temporary arrays are limited to that size."""
+    arrays = numpy.broadcast_arrays(*[numpy.asarray(x, dtype=float) for x in (u_real, u_imag, v_real, v_imag)])
+    shape = arrays[0].shape
+    ur, ui, vr, vi = [x.reshape(-1) for x in arrays]
+    n = ur.size
+    a, b, theta, g = [numpy.empty(n) for i in range(4)]
+    if chunk_size is None:
+        chunk_size = max(n, 1)
+    for start in range(0, n, chunk_size):
+        s = slice(start, start+chunk_size)
+        # u + i*v = w_plus*exp(i*omega*t) + w_minus*exp(-i*omega*t), where
+        # w_plus = (ur-vi + i*(ui+vr))/2 and w_minus = (ur+vi + i*(vr-ui))/2
+        re_plus, im_plus = ur[s]-vi[s], ui[s]+vr[s]
+        re_minus, im_minus = ur[s]+vi[s], vr[s]-ui[s]
+        abs_plus = 0.5*numpy.hypot(re_plus, im_plus)
+        abs_minus = 0.5*numpy.hypot(re_minus, im_minus)
+        arg_plus = numpy.arctan2(im_plus, re_plus)
+        arg_minus = numpy.arctan2(im_minus, re_minus)
+        a[s] = abs_plus + abs_minus
+        b[s] = numpy.abs(abs_plus - abs_minus)
+        theta[s] = 0.5*(arg_plus + arg_minus)
+        g[s] = 0.5*(arg_minus - arg_plus) % (2*numpy.pi)
+    return tuple(x.reshape(shape)[()] for x in (a, b, theta, g))
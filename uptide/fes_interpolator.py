@@ -60,6 +60,13 @@ def temporary_fes_ini_file(tide, fes_data_path):
     os.remove(file_name)
 
 
+def _to_datetime64(dt):
+    """Convert a datetime (naive datetimes are assumed to be in UTC) to numpy.datetime64 in UTC."""
+    if dt.tzinfo:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return numpy.datetime64(dt, 'us')
+
+
 class FES2014TidalInterpolator(TidalInterpolator):
     """Tidal interpolator based on FES2014 global solution.
 
@@ -99,11 +106,19 @@ class FES2014TidalInterpolator(TidalInterpolator):
         tnci.set_time(self, t)
         eta = tnci.get_val(self, (lat, lon))
 
-    Here -90<lat<90 and 0<lon<360. Finally, the long period (longer than a year) tidal constituents can be excluded via:
+    Here -90<lat<90 and 0<lon<360. Many points, or many times, are evaluated in a single call to the FES library with:
+
+        etas = tnci.get_vals(xs)  # in all points xs (array of shape (npoints, 2)) at the time set with set_time()
+        etas = tnci.get_time_series(x, ts)  # in point x at all times ts (in seconds), returns an array of shape (ntimes,)
+        etas = tnci.get_vals_at_times(xs, ts)  # in all points xs at all times ts, returns an array of shape (ntimes, npoints)
+
+    To limit memory usage, these are passed to the FES library in chunks of at most chunk_size points and times, which
+    can be set via FES2014TidalInterpolator(..., chunk_size=100000). Finally, the long period (longer than a year)
+    tidal constituents can be excluded via:
 
         tnci = uptide.FES2014TidalInterpolator(..., include_long_period=False)"""
     def __init__(self, tide_or_fes_ini_file,
-                 fes_data_path=None, include_long_period=True):
+                 fes_data_path=None, include_long_period=True, chunk_size=100000):
         # only import here to avoid hard dependency on fes
         # there are two versions of this, the old (pre 2.9.1) is imported as fes,
         # but from 2.9.1 we need to `import pyfes`
@@ -124,6 +139,7 @@ class FES2014TidalInterpolator(TidalInterpolator):
             self.fh = fes.Handler("ocean", "io", tide_or_fes_ini_file)
 
         self.include_long_period = include_long_period
+        self.chunk_size = chunk_size
 
     def set_time(self, t):
         """Set time (in seconds) at which to reconstruct tide
@@ -136,14 +152,62 @@ class FES2014TidalInterpolator(TidalInterpolator):
         """Evaluate tide in location x=(lat, lon)
 
         Here -90<lat<90 and 0<lon<360."""
-        try:
-            # old API:
-            st, lt = self.fh.scalar(x[0], x[1], self.current_datetime)
-        except AttributeError:
+        if not hasattr(self.fh, 'scalar'):
             # new API
-            st, lt, fes_min = self.fh.calculate(numpy.array([x[1]]), numpy.array([x[0]]), numpy.array([self.current_datetime]))
+            return self.get_vals([x])[0]
+        # old API:
+        st, lt = self.fh.scalar(x[0], x[1], self.current_datetime)
         # FES2014 is in cm, others are all in m
         if self.include_long_period:
             return (st+lt) * 0.01
         else:
             return st * 0.01
+
+    def _datetime64(self, ts):
+        """Convert times ts (in seconds after datetime0) to an array of numpy.datetime64 (UTC)."""
+        ts = numpy.asarray(ts, dtype=float)
+        return _to_datetime64(self.datetime0) + numpy.round(ts*1e6).astype('timedelta64[us]')
+
+    def _calculate(self, lats, lons, dates):
+        """Evaluate the tide in points (lats[i], lons[i]) at dates[i] (numpy.datetime64), passing
+        at most chunk_size points at a time to the FES library."""
+        vals = numpy.empty(len(lats))
+        for start in range(0, len(lats), self.chunk_size):
+            chunk = slice(start, start+self.chunk_size)
+            if hasattr(self.fh, 'calculate'):
+                # new API
+                st, lt, fes_min = self.fh.calculate(lons[chunk], lats[chunk], dates[chunk])
+            else:
+                # old API:
+                st, lt = self.fh.vector(lats[chunk], lons[chunk], dates[chunk].astype(datetime.datetime))
+            if self.include_long_period:
+                vals[chunk] = st + lt
+            else:
+                vals[chunk] = st
+        # FES2014 is in cm, others are all in m
+        return vals * 0.01
+
+    def get_vals(self, xs):
+        """Evaluate tide in many locations at once, at the time set with set_time()
+
+        Here xs is an array of shape (npoints, 2) with (lat, lon) coordinates, where -90<lat<90 and 0<lon<360."""
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        dates = numpy.full(len(xs), _to_datetime64(self.current_datetime))
+        return self._calculate(xs[:, 0], xs[:, 1], dates)
+
+    def get_time_series(self, x, ts):
+        """Evaluate tide in location x=(lat, lon) at times ts
+
+        Times ts (in seconds) are with respect to datetime set via set_initial_time(), as in set_time()."""
+        dates = self._datetime64(ts).ravel()
+        return self._calculate(numpy.full(len(dates), float(x[0])), numpy.full(len(dates), float(x[1])), dates)
+
+    def get_vals_at_times(self, xs, ts):
+        """Evaluate tide in many locations xs, array of shape (npoints, 2), at many times ts
+
+        Returns an array of shape (ntimes, npoints)."""
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        dates = self._datetime64(ts).ravel()
+        vals = self._calculate(numpy.tile(xs[:, 0], len(dates)), numpy.tile(xs[:, 1], len(dates)),
+                               numpy.repeat(dates, len(xs)))
+        return vals.reshape(len(dates), len(xs))
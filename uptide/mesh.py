@@ -0,0 +1,231 @@
+"""Reading the boundary nodes of Gmsh meshes, e.g. to force a model along its open boundaries:
+
+    xy = uptide.mesh.read_boundary_nodes('mesh.msh', [2, 3, 4])
+
+returns the coordinates of the nodes of the line elements with physical ids 2, 3 and 4, as an array of shape
+(nnodes, 2), and
+
+    boundaries = uptide.mesh.read_boundaries('mesh.msh')
+
+returns a dictionary that maps each physical id of the line elements to the coordinates of its nodes. The line elements
+can also be joined into polylines along the boundary, with read_boundary_polylines('mesh.msh', [2, 3, 4]). Meshes should be
+stored in the msh format version 2 (gmsh -format msh2), either ASCII or binary (gmsh -bin). The node and element
+sections are parsed with numpy all at once, so that reading meshes with millions of nodes takes seconds.
+See uptide.transect.TransectTidalInterpolator.from_gmsh() for interpolating the tide in these nodes."""
+import collections
+import numpy
+
+# number of nodes of each Gmsh element type
+_NODES_PER_ELEMENT = {1: 2, 2: 3, 3: 4, 4: 4, 5: 8, 6: 6, 7: 5, 8: 3, 9: 6, 10: 9, 11: 10, 12: 27, 13: 18, 14: 14,
+                      15: 1, 16: 8, 17: 20, 18: 15, 19: 13, 20: 9, 21: 10, 22: 12, 23: 15, 24: 15, 25: 21, 26: 4,
+                      27: 5, 28: 6, 29: 20, 30: 35, 31: 56}
+# Gmsh element types of lines: 2-node and 3-node (second order) lines
+_LINES = (1, 8)
+
+
+def _section(data, name, start=0):
+    """Return the offsets in data of the first line after $name, and of $Endname."""
+    begin = data.find(b'$' + name + b'\n', start)
+    if begin < 0:
+        begin = data.find(b'$' + name + b'\r\n', start)
+    if begin < 0:
+        raise ValueError("No ${} section found".format(name.decode()))
+    begin = data.index(b'\n', begin) + 1
+    end = data.find(b'$End' + name, begin)
+    if end < 0:
+        raise ValueError("No $End{} found".format(name.decode()))
+    return begin, end
+
+
+def _lines(block):
+    """Split block, ASCII text, into lines. Returns block as an array of bytes (with a newline appended), and the offsets
+    of the start and of the terminating newline of each non-empty line."""
+    buf = numpy.frombuffer(block + b'\n', dtype=numpy.uint8)
+    ends = numpy.flatnonzero(buf == ord('\n'))
+    starts = numpy.concatenate([[0], ends[:-1] + 1])
+    nonempty = ends > starts
+    return buf, starts[nonempty], ends[nonempty]
+
+
+def _first_tokens(buf, starts):
+    """Return the index of the first whitespace separated token of each line (given by starts) among all tokens of buf,
+    and the offsets of the start of all tokens."""
+    space = buf <= ord(' ')
+    tokens = ~space
+    tokens[1:] &= space[:-1]
+    tokens = numpy.flatnonzero(tokens)
+    return numpy.searchsorted(tokens, starts), tokens
+
+
+def _gather(buf, starts, ends):
+    """Return the bytes of buf from starts to ends (inclusive) of the given lines, concatenated."""
+    lengths = ends - starts + 1
+    offsets = numpy.cumsum(lengths) - lengths
+    return buf[numpy.arange(lengths.sum()) + numpy.repeat(starts - offsets, lengths)].tobytes()
+
+
+def _read_ascii(data):
+    # only the lines of the line elements (elm-number elm-type number-of-tags tags... node-numbers...) are parsed,
+    # they are selected by their (single digit) elm-type
+    begin, end = _section(data, b'Elements')
+    begin = data.index(b'\n', begin) + 1  # skip number of elements
+    buf, starts, ends = _lines(data[begin:end])
+    rows, tokens = _first_tokens(buf, starts)
+    type_starts = tokens[rows + 1]
+    is_line = numpy.isin(buf[type_starts], [ord(str(line_type)) for line_type in _LINES]) & (buf[type_starts+1] <= ord(' '))
+    block = _gather(buf, starts[is_line], ends[is_line])
+    values = numpy.fromstring(block, dtype=numpy.int64, sep=' ')
+    buf, starts, ends = _lines(block)
+    rows = _first_tokens(buf, starts)[0]
+    types, ntags = values[rows+1], values[rows+2]
+    physical_ids, element_nodes = [], []
+    for line_type in _LINES:
+        for n in numpy.unique(ntags[types == line_type]):
+            if n == 0:
+                continue  # no physical id
+            rows_n = rows[(types == line_type) & (ntags == n)]
+            physical_ids.append(values[rows_n+3])
+            element_nodes.append(values[rows_n[:, None] + 3 + n + numpy.arange(_NODES_PER_ELEMENT[line_type])])
+
+    # node-number x y z, only parsing the lines of the nodes of the line elements if the nodes are numbered contiguously
+    begin, end = _section(data, b'Nodes')
+    begin = data.index(b'\n', begin) + 1  # skip number of nodes
+    block = data[begin:end]
+    buf, starts, ends = _lines(block)
+    node_tags = numpy.unique(numpy.concatenate([nodes.ravel() for nodes in element_nodes] or [[]])).astype(numpy.int64)
+    nodes = None
+    if len(starts) > 0:
+        first_tag = int(block[starts[0]:ends[0]].split()[0])
+        last_tag = int(block[starts[-1]:ends[-1]].split()[0])
+        if last_tag - first_tag + 1 == len(starts) and numpy.all((node_tags >= first_tag) & (node_tags <= last_tag)):
+            lines = node_tags - first_tag
+            nodes = numpy.fromstring(_gather(buf, starts[lines], ends[lines]), sep=' ').reshape(-1, 4)
+            if not numpy.array_equal(nodes[:, 0], node_tags):
+                nodes = None
+    if nodes is None:
+        nodes = numpy.fromstring(block, sep=' ').reshape(-1, 4)
+    return nodes[:, 0].astype(numpy.int64), nodes[:, 1:3], physical_ids, element_nodes
+
+
+def _read_binary(data, byte_order):
+    int_type = numpy.dtype(byte_order + 'i4')
+    begin, end = _section(data, b'Nodes')
+    line_end = data.index(b'\n', begin)
+    nnodes = int(data[begin:line_end])
+    node_type = numpy.dtype([('tag', int_type), ('xyz', byte_order + 'f8', 3)])
+    nodes = numpy.frombuffer(data, dtype=node_type, count=nnodes, offset=line_end+1)
+    node_tags, xy = nodes['tag'].astype(numpy.int64), nodes['xyz'][:, :2]
+
+    begin, end = _section(data, b'Elements', line_end + 1 + nnodes*node_type.itemsize)
+    line_end = data.index(b'\n', begin)
+    nelements = int(data[begin:line_end])
+    offset = line_end + 1
+    physical_ids, element_nodes = [], []
+    # blocks of elements of the same type: elm-type number-of-elements number-of-tags, followed by
+    # elm-number tags... node-numbers... of each element
+    while nelements > 0:
+        element_type, count, ntags = numpy.frombuffer(data, dtype=int_type, count=3, offset=offset)
+        offset += 3*int_type.itemsize
+        if element_type not in _NODES_PER_ELEMENT:
+            raise ValueError("Unsupported element type {}".format(element_type))
+        nnodes_element = _NODES_PER_ELEMENT[element_type]
+        elements = numpy.frombuffer(data, dtype=int_type, count=count*(1+ntags+nnodes_element),
+                                    offset=offset).reshape(count, -1)
+        offset += elements.nbytes
+        nelements -= count
+        if element_type in _LINES and ntags > 0:
+            physical_ids.append(elements[:, 1].astype(numpy.int64))
+            element_nodes.append(elements[:, 1+ntags:].astype(numpy.int64))
+    return node_tags, xy, physical_ids, element_nodes
+
+
+def _read_line_elements(file_name):
+    """Read the coordinates of the nodes, and the physical ids and node indices of all line elements of the Gmsh file
+    file_name. Returns xy, an array of shape (nnodes, 2), and two lists of arrays (one for each type of line element
+    and number of tags) with the physical ids, and the node indices of shape (nelements, nnodes_per_element)."""
+    with open(file_name, 'rb') as f:
+        data = f.read()
+    begin, end = _section(data, b'MeshFormat')
+    version, file_type, data_size = data[begin:data.index(b'\n', begin)].split()
+    if not version.startswith(b'2.'):
+        raise ValueError("Unsupported msh format version {} in {}, use gmsh -format msh2".format(version.decode(),
+                                                                                                 file_name))
+    if int(file_type) == 0:
+        node_tags, xy, physical_ids, element_nodes = _read_ascii(data)
+    else:
+        # binary files have the integer 1 after the format line, to detect the byte order
+        one = numpy.frombuffer(data, dtype='<i4', count=1, offset=data.index(b'\n', begin)+1)[0]
+        node_tags, xy, physical_ids, element_nodes = _read_binary(data, '<' if one == 1 else '>')
+
+    # node numbers need not be contiguous
+    node_index = numpy.full(node_tags.max()+1, -1, dtype=numpy.int64)
+    node_index[node_tags] = numpy.arange(len(node_tags))
+    return xy, physical_ids, [node_index[nodes] for nodes in element_nodes]
+
+
+def _read_lines(file_name):
+    """Read the coordinates of all nodes, and the physical id and node indices of the nodes of all line elements of the
+    Gmsh file file_name. Returns xy, an array of shape (nnodes, 2), and two arrays with the physical id and the node
+    index for each node of each line element."""
+    xy, physical_ids, element_nodes = _read_line_elements(file_name)
+    physical_ids = [numpy.repeat(ids, nodes.shape[1]) for ids, nodes in zip(physical_ids, element_nodes)]
+    element_nodes = [nodes.ravel() for nodes in element_nodes]
+    if not physical_ids:
+        return xy, numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    return xy, numpy.concatenate(physical_ids), numpy.concatenate(element_nodes)
+
+
+def read_boundaries(file_name, physical_ids=None):
+    """Read the (x, y) coordinates of the nodes of the line elements of the Gmsh file file_name, for each physical id
+    (or only those in physical_ids). Returns a dictionary that maps each physical id to an array of shape (nnodes, 2),
+    in which each node is included once, in the order of the node numbers."""
+    xy, ids, nodes = _read_lines(file_name)
+    if physical_ids is None:
+        physical_ids = numpy.unique(ids)
+    return {int(physical_id): xy[numpy.unique(nodes[ids == physical_id])] for physical_id in physical_ids}
+
+
+def read_boundary_nodes(file_name, physical_ids):
+    """Read the (x, y) coordinates of the nodes of the line elements with any of the given physical ids from the Gmsh
+    file file_name. Each node is included once, in the order of the node numbers."""
+    xy, ids, nodes = _read_lines(file_name)
+    return xy[numpy.unique(nodes[numpy.isin(ids, list(physical_ids))])]
+
+
+def _chain(edges):
+    """Order edges, pairs of node indices, into chains of connected edges. Chains end at nodes that are not connected to
+    exactly two edges, and closed loops start and end at the same node. Returns a list of lists of node indices."""
+    neighbours = collections.defaultdict(set)
+    for a, b in edges:
+        if a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+    ends = set(node for node, nodes in neighbours.items() if len(nodes) != 2)
+    chains = []
+    # first the open chains, starting from their ends, then the remaining closed loops
+    for start in sorted(ends) + sorted(neighbours):
+        while neighbours[start]:
+            node = start
+            chain = [node]
+            while neighbours[node]:
+                next_node = min(neighbours[node])
+                neighbours[node].discard(next_node)
+                neighbours[next_node].discard(node)
+                chain.append(next_node)
+                node = next_node
+                if node in ends:
+                    break
+            chains.append(chain)
+    return chains
+
+
+def read_boundary_polylines(file_name, physical_ids):
+    """Read the line elements with any of the given physical ids from the Gmsh file file_name, and join them into
+    polylines along the boundary. Returns a list of arrays of (x, y) coordinates of shape (nvertices, 2); a polyline
+    ends where the boundary ends or branches, and closed boundaries start and end at the same vertex. The middle
+    nodes of second order lines are not included."""
+    xy, ids, element_nodes = _read_line_elements(file_name)
+    edges = [nodes[numpy.isin(element_ids, list(physical_ids)), :2] for element_ids, nodes in zip(ids, element_nodes)]
+    if not edges:
+        return []
+    return [xy[chain] for chain in _chain(numpy.concatenate(edges).tolist())]
@@ -1,23 +1,14 @@
-# horrible kludge to import python netcdf class - there's three different implementations to choose from!
-# luckily they adhere to the same API
-try:
-    # this seems to be the most mature and also handles netcdf4 files
-    from netCDF4 import Dataset as NetCDFFile
-except ImportError:
-    try:
-        # this one is older but is quite often installed
-        from Scientific.IO.NetCDF import NetCDFFile
-    except ImportError:
-        # finally, try the one in scipy that I hear conflicting things about
-        try:
-            # this only works in python 2.7
-            from scipy.io.netcdf import NetCDFFile
-        except ImportError:
-            # in python 2.6 it's called something else
-            from scipy.io.netcdf import netcdf_file as NetCDFFile
+import collections
+import copy
+import itertools
 import math
+import os.path
+import struct
+import threading
 import numpy
 import numpy.ma
+from uptide.stats import _stats
+from uptide import storage
 
 
 # any error generated by the NetCDFInterpolator object:
@@ -36,12 +27,474 @@ class CoordinateError(NetCDFInterpolatorError):
         return "at x, y={} indexed at i, j={}; {}".format(self.x, self.ij, self.message)
 
 
+def __getattr__(name):
+    # NetCDFFile is resolved on first access, see storage._netcdf_file_class()
+    if name == 'NetCDFFile':
+        return storage._netcdf_file_class()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# the netCDF library is not thread-safe, so all access to NetCDF variables from concurrent threads
+# (see TidalNetCDFInterpolator) is serialized; reading from memory-mapped fields is not
+_netcdf_lock = threading.RLock()
+
+
+def _read_direct(field, index):
+    """Read field[index] from the NetCDF variable or numpy array field, without going through the chunk cache."""
+    if isinstance(field, numpy.ndarray) or getattr(field, 'thread_safe', False):
+        return field[index]
+    with _netcdf_lock:
+        return field[index]
+
+
+def _chunk_shape(field):
+    """The shape of the storage chunks of a NetCDF variable (or variable of another storage backend), or None
+    if it is stored contiguously, or is a numpy array."""
+    if isinstance(field, numpy.ndarray):
+        return None
+    if hasattr(field, 'chunking'):
+        # netCDF4: returns 'contiguous', or None for NetCDF3 files
+        chunking = field.chunking()
+        return None if chunking is None or chunking == 'contiguous' else tuple(chunking)
+    chunks = getattr(field, 'chunks', None)
+    return None if chunks is None else tuple(chunks)
+
+
+class ChunkCache(object):
+    """Least recently used cache of the decompressed storage chunks of chunked (typically compressed) NetCDF4, HDF5
+    and Zarr variables. Reads from such variables are aligned to the chunk boundaries: every chunk that overlaps
+    the requested index ranges is read (and decompressed) as a whole, once, and the requested values are copied out of
+    the cached chunks. The netCDF and HDF5 libraries decompress whole chunks anyway, so this reads no more from disk, but
+    subsequent reads of the same chunks, e.g. of a field after the mask has been derived from it with
+    set_mask_from_fill_value(), of the strips of a window moved with set_ranges(), or of neighbouring windows of copies
+    of a NetCDFInterpolator, do not read and decompress them again.
+
+    The cache holds at most max_bytes of chunks; chunks that are larger than that are not cached and only the requested
+    values are read from them. Setting max_bytes to 0 disables the cache. The numbers of chunks found in the
+    cache, and read from file, are counted in hits and misses. The chunks of a file are dropped from the cache when
+    it is closed (see NetCDFFilePool), and a TidalNetCDFInterpolator drops the chunks of its files once it has read
+    the constituents, as files may be kept open much longer than their chunks are needed."""
+    def __init__(self, max_bytes=256*2**20):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Remove all chunks from the cache, and reset hits and misses."""
+        with self.lock:
+            # maps (id(field), chunk index) to (field, chunk); the field is kept so that its id is not reused
+            self.chunks = collections.OrderedDict()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def discard(self, nc):
+        """Remove the chunks of all variables of the dataset nc from the cache."""
+        ids = set(id(var) for var in nc.variables.values())
+        with self.lock:
+            for key in [key for key in self.chunks if key[0] in ids]:
+                self.nbytes -= self.chunks.pop(key)[1].nbytes
+
+    def get(self, field, chunk_index, chunk_shape, stats=None):
+        """Return the chunk with the given (multi-dimensional) chunk_index of field, reading it if it is not cached."""
+        key = (id(field), chunk_index)
+        with self.lock:
+            entry = self.chunks.get(key)
+            if entry is not None:
+                self.chunks.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            if stats is not None:
+                stats.add('chunk_cache_hits')
+            return entry[1]
+
+        index = tuple(slice(c*n, (c+1)*n) for c, n in zip(chunk_index, chunk_shape))
+        chunk = _read_direct(field, index)
+        if stats is not None:
+            stats.add('chunk_cache_misses')
+            stats.add('bytes_read', chunk.nbytes)
+        with self.lock:
+            self.misses += 1
+            if key not in self.chunks:
+                self.chunks[key] = (field, chunk)
+                self.nbytes += chunk.nbytes
+                while self.nbytes > self.max_bytes:
+                    self.nbytes -= self.chunks.popitem(last=False)[1][1].nbytes
+        return chunk
+
+
+chunk_cache = ChunkCache()
+
+
+def _read_chunked(field, index, chunk_shape, stats=None):
+    """Read field[index], where index is a tuple of integers and slices (with step 1) for all dimensions, by
+    copying the values from the chunks of field in chunk_cache."""
+    ranges = []
+    squeeze = []
+    for d, (idx, n) in enumerate(zip(index, field.shape)):
+        if isinstance(idx, slice):
+            start, stop, _ = idx.indices(n)
+            ranges.append((start, max(start, stop)))
+        else:
+            idx = int(idx) % n
+            ranges.append((idx, idx+1))
+            squeeze.append(d)
+    shape = tuple(stop-start for start, stop in ranges)
+
+    out, mask = None, None
+    chunk_ranges = [range(start//c, (stop-1)//c+1) if stop > start else range(0)
+                    for (start, stop), c in zip(ranges, chunk_shape)]
+    for chunk_index in itertools.product(*chunk_ranges):
+        chunk = chunk_cache.get(field, chunk_index, chunk_shape, stats)
+        src, dst = [], []
+        for (start, stop), c, n in zip(ranges, chunk_index, chunk_shape):
+            a, b = max(start, c*n), min(stop, (c+1)*n)
+            src.append(slice(a-c*n, b-c*n))
+            dst.append(slice(a-start, b-start))
+        src, dst = tuple(src), tuple(dst)
+        if out is None:
+            out = numpy.empty(shape, dtype=chunk.dtype)
+        out[dst] = numpy.ma.getdata(chunk)[src]
+        if numpy.ma.isMaskedArray(chunk):
+            if mask is None:
+                mask = numpy.zeros(shape, dtype=bool)
+            mask[dst] = numpy.ma.getmaskarray(chunk)[src]
+
+    if out is None:
+        out = numpy.empty(shape, dtype=field.dtype)
+    if mask is not None:
+        out = numpy.ma.masked_array(out, mask=mask)
+    return out.reshape(tuple(n for d, n in enumerate(shape) if d not in squeeze))
+
+
+def _read_slice(field, index, stats=None):
+    """Read field[index] where field is a NetCDF variable or numpy array. Chunked variables are read through
+    chunk_cache, unless their chunks are too large to be cached. The bytes read from file (the whole chunks,
+    for chunks that were not cached) are added to the bytes_read counter of stats."""
+    chunk_shape = _chunk_shape(field)
+    if chunk_shape is not None and len(index) == len(field.shape):
+        nbytes = numpy.dtype(field.dtype).itemsize * math.prod(chunk_shape)
+        if nbytes <= chunk_cache.max_bytes:
+            return _read_chunked(field, index, chunk_shape, stats)
+    val = _read_direct(field, index)
+    if stats is not None and not isinstance(field, numpy.ndarray):
+        stats.add('bytes_read', numpy.asarray(val).nbytes)
+    return val
+
+
+class NetCDFFilePool(object):
+    """A pool of open NetCDF files, shared between all NetCDFInterpolators, so that each file is only opened
+    once however many interpolators read from it. Files are reference counted: each acquire() should
+    be paired with a release(), and the file is closed when its last reference is released.
+    Files are opened with a storage backend (see uptide.storage), by default chosen based on the file name."""
+    def __init__(self):
+        # maps the real path and backend of each open file to a list [nc, refcount]
+        self.files = {}
+
+    def _key(self, filename, backend):
+        return os.path.realpath(filename), backend or storage.guess_backend(filename)
+
+    def acquire(self, filename, backend=None):
+        """Return the opened NetCDF file filename, opening it if it is not open already."""
+        key = self._key(filename, backend)
+        with _netcdf_lock:
+            if key in self.files:
+                self.files[key][1] += 1
+            else:
+                self.files[key] = [storage.open_dataset(filename, key[1]), 1]
+            return self.files[key][0]
+
+    def release(self, filename, backend=None):
+        """Release a reference to the NetCDF file filename obtained with acquire(), closing it if this was the last reference."""
+        key = self._key(filename, backend)
+        with _netcdf_lock:
+            entry = self.files[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.files[key]
+                chunk_cache.discard(entry[0])
+                entry[0].close()
+
+    def __len__(self):
+        return len(self.files)
+
+
+file_pool = NetCDFFilePool()
+
+
+# relative tolerance (with respect to the grid spacing) used to decide whether coordinates are equidistant,
+# or whether a 2d coordinate field is constant in one of its dimensions
+_grid_tolerance = 1e-2
+
+
+def _wraps(period, n, delta):
+    """Whether n equidistant points with spacing delta cover a full period, i.e. whether the
+    last point is connected to the first."""
+    return period is not None and abs(n*abs(delta)-period) <= _grid_tolerance*abs(delta)
+
+
+def _window_slices(imin, imax, n):
+    """Slices to read the index range imin:imax, where imax may extend beyond the end
+    of a periodic dimension of length n, wrapping around to its start."""
+    if imin >= n:
+        imin, imax = imin-n, imax-n
+    if imax <= n:
+        return [slice(imin, imax)]
+    else:
+        return [slice(imin, n), slice(0, imax-n)]
+
+
+def _fill_value_mask(val, fill_value):
+    """Mask that is False where val equals fill_value, and True elsewhere. Values that are masked, e.g. by netCDF4
+    based on the missing_value or _FillValue attribute, are also considered equal to fill_value."""
+    return numpy.logical_not(numpy.isclose(numpy.ma.filled(val, fill_value), fill_value))
+
+
+class RectilinearGrid(object):
+    """Logical 2D grid where each of the two coordinates varies along one dimension only, but is not necessarily
+    equidistant. Points are located with a binary search (numpy.searchsorted) along each axis.
+
+    For periodic coordinates (e.g. longitude) the period should be provided in periods. If the coordinates cover
+    the full period, the last point is connected to the first."""
+    def __init__(self, coordinates, periods=(None, None)):
+        self.coordinates = [numpy.asarray(c, dtype=float) for c in coordinates]
+        self.periods = list(periods)
+        self.shape = tuple(len(c) for c in self.coordinates)
+        if min(self.shape) < 2:
+            raise NetCDFInterpolatorError("Need at least two grid points in each dimension")
+        # decreasing coordinates are searched for with their sign flipped
+        self.signs = [1.0 if c[-1] >= c[0] else -1.0 for c in self.coordinates]
+        self._sorted_coordinates = [sign*c for sign, c in zip(self.signs, self.coordinates)]
+        self.wrap = []
+        for d, (c, period) in enumerate(zip(self._sorted_coordinates, self.periods)):
+            wrap = period is not None and c[0]+period-c[-1] <= (1.+_grid_tolerance)*numpy.diff(c).max()
+            if wrap:
+                # add the first point again, to search for points in the cell connecting the last point to the first
+                self._sorted_coordinates[d] = numpy.append(c, c[0]+period)
+            self.wrap.append(wrap)
+
+    def locate(self, xs):
+        """For an array of points xs of shape (npoints, 2), return the indices i, j of the cells containing
+        these points and the local coordinates alpha, beta within these cells. For points outside the grid i and j are -1."""
+        ij = []
+        local = []
+        for d, c in enumerate(self._sorted_coordinates):
+            x = self.signs[d]*xs[:, d]
+            if self.periods[d] is not None:
+                x = c[0] + (x-c[0]) % self.periods[d]
+            i = numpy.searchsorted(c, x, side='right') - 1
+            outside = (i < 0) | (i >= len(c)-1)
+            i = numpy.clip(i, 0, len(c)-2)
+            local.append((x-c[i])/(c[i+1]-c[i]))
+            i[outside] = -1
+            ij.append(i)
+        return ij[0], ij[1], local[0], local[1]
+
+    def transpose(self):
+        """Return the same grid with the order of the dimensions swapped."""
+        return RectilinearGrid(self.coordinates[::-1], self.periods[::-1])
+
+    def subgrid(self, iranges):
+        """Return the grid restricted to the index ranges ((imin, imax), (jmin, jmax)). For periodic coordinates
+        imax may extend beyond the number of points, in which case the range wraps around."""
+        coordinates = []
+        for c, (imin, imax), sign, period in zip(self.coordinates, iranges, self.signs, self.periods):
+            if imax > len(c):
+                c = numpy.concatenate([c[imin:], c[:imax-len(c)] + sign*period])
+            else:
+                c = c[imin:imax]
+            coordinates.append(c)
+        return RectilinearGrid(coordinates, self.periods)
+
+    def index_ranges(self, ranges):
+        """Compute the index ranges ((imin, imax), (jmin, jmax)) that cover the coordinate ranges
+        ((xmin, xmax), (ymin, ymax)), with one extra row/column on either side. For periodic coordinates that
+        cover the full period, the ranges may cross the periodic boundary, in which case imax exceeds the number
+        of points."""
+        iranges = []
+        for xlimits, c, sign, period, wrap, n in zip(ranges, self._sorted_coordinates, self.signs, self.periods,
+                                                     self.wrap, self.shape):
+            if wrap:
+                xmin, xmax = xlimits
+                if xmax < xmin:
+                    # range that crosses the periodic boundary, e.g. (350, 10)
+                    xmax += period
+                lower, upper = sorted((sign*xmin, sign*xmax))
+                shift = c[0] + (lower-c[0]) % period - lower
+                # search in two consecutive periods
+                c = numpy.concatenate([c[:-1], c[:-1]+period])
+                imin = max(numpy.searchsorted(c, lower+shift, side='right')-2, 0)
+                imax = numpy.searchsorted(c, upper+shift, side='right')+2
+                if imax-imin >= n:
+                    imin, imax = 0, n
+            else:
+                lower, upper = sorted((sign*xlimits[0], sign*xlimits[1]))
+                # searchsorted gives the index of the first point above the limit, one more than the cell containing it
+                imin = max(numpy.searchsorted(c, lower, side='right')-2, 0)
+                imax = min(numpy.searchsorted(c, upper, side='right')+2, len(c))
+            if imin >= imax:
+                raise NetCDFInterpolatorError("Provided ranges outside netCDF range")
+            iranges.append((int(imin), int(imax)))
+        return iranges
+
+
+class CurvilinearGrid(object):
+    """Logical 2D grid where both coordinates are given as 2D fields, e.g. a rotated, stretched or ROMS-style
+    curvilinear grid. A spatial index (a KD-tree of the cell centres) is built once. To locate a point, the cells
+    with the nearest centres are tried in turn by inverting their bilinear map, which also provides the cell-local
+    coordinates used as interpolation weights. Requires scipy."""
+
+    # number of nearest cell centres that are tried
+    candidates = 8
+    # number of Newton iterations used to invert the bilinear map of a cell
+    newton_iterations = 8
+
+    def __init__(self, coordinates):
+        # only import here to avoid hard dependency on scipy
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            raise ImportError("Interpolation on curvilinear grids requires scipy.")
+
+        self.coordinates = [numpy.asarray(c, dtype=float) for c in coordinates]
+        self.shape = self.coordinates[0].shape
+        if self.coordinates[1].shape != self.shape or len(self.shape) != 2:
+            raise NetCDFInterpolatorError("Coordinate fields of a curvilinear grid should be 2D fields of the same shape")
+        if min(self.shape) < 2:
+            raise NetCDFInterpolatorError("Need at least two grid points in each dimension")
+        self.points = numpy.stack(self.coordinates, axis=-1)
+        centres = 0.25*(self.points[:-1, :-1]+self.points[1:, :-1]+self.points[:-1, 1:]+self.points[1:, 1:])
+        self.tree = cKDTree(centres.reshape(-1, 2))
+        self.transposed = False
+
+    def locate(self, xs):
+        """For an array of points xs of shape (npoints, 2), return the indices i, j of the cells containing
+        these points and the local coordinates alpha, beta within these cells. For points outside the grid i and j are -1."""
+        if self.transposed:
+            xs = xs[:, ::-1]
+        # shape of the cells, in the original (not transposed) order
+        n0, n1 = self.points.shape[0]-1, self.points.shape[1]-1
+        k = min(self.candidates, n0*n1)
+        cells = self.tree.query(xs, k=k)[1].reshape(len(xs), k)
+        ci, cj = numpy.unravel_index(cells, (n0, n1))
+        alpha, beta = self._invert_bilinear_map(ci, cj, xs[:, numpy.newaxis, :])
+        eps = 1e-6
+        with numpy.errstate(invalid='ignore'):
+            inside = (alpha > -eps) & (alpha < 1.+eps) & (beta > -eps) & (beta < 1.+eps)
+        # pick the first candidate (with the nearest centre) that contains the point
+        first = numpy.argmax(inside, axis=1)
+        points = numpy.arange(len(xs))
+        i, j = ci[points, first], cj[points, first]
+        alpha = numpy.clip(alpha[points, first], 0., 1.)
+        beta = numpy.clip(beta[points, first], 0., 1.)
+        outside = ~inside.any(axis=1)
+        i[outside] = -1
+        j[outside] = -1
+        if self.transposed:
+            return j, i, beta, alpha
+        return i, j, alpha, beta
+
+    def _invert_bilinear_map(self, i, j, x):
+        p00 = self.points[i, j]
+        e1 = self.points[i+1, j] - p00
+        e2 = self.points[i, j+1] - p00
+        e3 = self.points[i+1, j+1] - p00 - e1 - e2
+        alpha = numpy.full(i.shape, 0.5)
+        beta = numpy.full(i.shape, 0.5)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            for it in range(self.newton_iterations):
+                a = alpha[..., numpy.newaxis]
+                b = beta[..., numpy.newaxis]
+                r = p00 + a*e1 + b*e2 + a*b*e3 - x
+                ja = e1 + b*e3
+                jb = e2 + a*e3
+                det = ja[..., 0]*jb[..., 1] - ja[..., 1]*jb[..., 0]
+                alpha = alpha - (r[..., 0]*jb[..., 1] - r[..., 1]*jb[..., 0])/det
+                beta = beta - (ja[..., 0]*r[..., 1] - ja[..., 1]*r[..., 0])/det
+        return alpha, beta
+
+    def transpose(self):
+        """Return the same grid with the order of the dimensions swapped. The spatial index is shared."""
+        grid = object.__new__(CurvilinearGrid)
+        grid.__dict__.update(self.__dict__)
+        grid.transposed = not self.transposed
+        grid.shape = self.shape[::-1]
+        return grid
+
+    def subgrid(self, iranges):
+        """Return the grid restricted to the index ranges ((imin, imax), (jmin, jmax)). This rebuilds the spatial index."""
+        (imin, imax), (jmin, jmax) = iranges
+        return CurvilinearGrid([c[imin:imax, jmin:jmax] for c in self.coordinates])
+
+    def index_ranges(self, ranges):
+        """Compute the index ranges ((imin, imax), (jmin, jmax)) that cover the coordinate ranges
+        ((xmin, xmax), (ymin, ymax)), with one extra row/column on either side."""
+        (xmin, xmax), (ymin, ymax) = [sorted(xlimits) for xlimits in ranges]
+        x, y = self.coordinates
+        i, j = numpy.nonzero((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+        # for ranges that are smaller than a cell we also need the cells that contain its corners
+        corners = numpy.array([[xmin, ymin], [xmax, ymin], [xmin, ymax], [xmax, ymax]])
+        ci, cj, alpha, beta = self.locate(corners)
+        i = numpy.concatenate([i, ci[ci >= 0], ci[ci >= 0]+1])
+        j = numpy.concatenate([j, cj[cj >= 0], cj[cj >= 0]+1])
+        if len(i) == 0:
+            raise NetCDFInterpolatorError("Provided ranges outside netCDF range")
+        return [(max(int(i.min())-1, 0), min(int(i.max())+2, self.shape[0])),
+                (max(int(j.min())-1, 0), min(int(j.max())+2, self.shape[1]))]
+
+
+class Stencil(object):
+    """Interpolation weights for a set of points, as computed by Interpolator.compute_stencil().
+
+    Each point is interpolated from a fixed number of grid points, given by the integer arrays i and j
+    of shape (npoints, nstencil), with weights of the same shape. Points that are interpolated from fewer grid
+    points (e.g. extrapolated points) have zero weights for the remaining entries. As long as the grid and mask
+    do not change, the same stencil can be applied to different fields."""
+    def __init__(self, i, j, weights):
+        self.i = i
+        self.j = j
+        self.weights = weights
+        if len(i) > 0:
+            self.bbox = (int(i.min()), int(i.max())+1, int(j.min()), int(j.max())+1)
+        else:
+            self.bbox = (0, 0, 0, 0)
+
+    def apply(self, val):
+        """Interpolate the 2D or 3D field val (which may also be a NetCDF variable), where the last two dimensions
+        correspond to the grid. Returns an array whose first dimension corresponds to the points."""
+        imin, imax, jmin, jmax = self.bbox
+        # only the bounding box of the stencil is read
+        if len(val.shape) == 2:
+            block = numpy.asarray(val[imin:imax, jmin:jmax])
+        elif len(val.shape) == 3:
+            block = numpy.asarray(val[:, imin:imax, jmin:jmax])
+        else:
+            raise NetCDFInterpolatorError("Field to interpolate, should have 2 or 3 dimensions")
+        values = numpy.einsum('...pk,pk->p...', block[..., self.i-imin, self.j-jmin], self.weights)
+        return values
+
+
+def _read_block(field, i, j):
+    """Read the entries field[i, j] for integer arrays i and j, where field may also be a NetCDF variable."""
+    imin, jmin = i.min(), j.min()
+    block = numpy.asarray(field[imin:i.max()+1, jmin:j.max()+1])
+    return block[i-imin, j-jmin]
+
+
 class Interpolator(object):
-    def __init__(self, origin, delta, val, mask=None):
+    """Interpolator on an equidistant grid, given by its origin and step sizes delta. For periodic
+    coordinates (e.g. longitude) the period may be provided in periods. If the grid covers the full period
+    the last grid point is connected to the first. This only requires index arithmetic, so a global field
+    does not need to be extended with a copy of its first row/column. If a uptide.stats.Stats object is provided,
+    the time spent in interpolation and the number of extrapolated points are recorded in it."""
+    def __init__(self, origin, delta, val, mask=None, periods=(None, None), stats=None):
         self.origin = origin
         self.delta = delta
         self.val = val
         self.mask = mask
+        self.periods = periods
+        self.stats = stats
+        self.wrap = [_wraps(period, n, d) for period, n, d in zip(periods, val.shape[-2:], delta)]
         # cache points that need to be extrapolated
         self.extrapolation_points = {}
 
@@ -50,9 +503,38 @@ class Interpolator(object):
         # changing the mask invalidates the extrapolation cache
         self.extrapolation_points = {}
 
+    def _locate_point(self, x):
+        xhat = (x[0]-self.origin[0])/self.delta[0]
+        yhat = (x[1]-self.origin[1])/self.delta[1]
+        if self.periods[0] is not None:
+            xhat = xhat % (self.periods[0]/abs(self.delta[0]))
+        if self.periods[1] is not None:
+            yhat = yhat % (self.periods[1]/abs(self.delta[1]))
+        i = int(math.floor(xhat))
+        j = int(math.floor(yhat))
+        # this is not catched as an IndexError in get_val, because of wrapping of negative indices
+        if i < 0 or j < 0:
+            raise CoordinateError("Coordinate out of range", x, i, j)
+        return i, j, xhat % 1.0, yhat % 1.0
+
+    def _locate(self, xs):
+        xhat = (xs[:, 0]-self.origin[0])/self.delta[0]
+        yhat = (xs[:, 1]-self.origin[1])/self.delta[1]
+        if self.periods[0] is not None:
+            xhat = xhat % (self.periods[0]/abs(self.delta[0]))
+        if self.periods[1] is not None:
+            yhat = yhat % (self.periods[1]/abs(self.delta[1]))
+        i = numpy.floor(xhat)
+        j = numpy.floor(yhat)
+        return i.astype(int), j.astype(int), xhat-i, yhat-j
+
     def find_extrapolation_points(self, x, i, j):
         if x in self.extrapolation_points:
+            if self.stats is not None:
+                self.stats.add('extrapolation_cache_hits')
             return self.extrapolation_points[x]
+        if self.stats is not None:
+            self.stats.add('extrapolation_cache_misses')
 
         # This should only happen infrequently, so warn user (commented out because a user complained):
         # print "Need to extrapolate point coordinates ", x
@@ -60,7 +542,15 @@ class Interpolator(object):
         ijs += [(i-1, j-1), (i+2, j-1), (i+2, j+2), (i-1, j+2)]  # Diagonal points
 
         extrap_points = []
+        n0, n1 = self.val.shape[-2:]
         for a, b in ijs:
+            # only wrap around in periodic dimensions, where indices on both sides of the grid are neighbours
+            if self.wrap[0]:
+                a = a % n0
+            if self.wrap[1]:
+                b = b % n1
+            if a < 0 or b < 0:
+                continue
             try:
                 if self.mask[a, b]:
                     extrap_points.append((a, b))
@@ -76,28 +566,27 @@ class Interpolator(object):
         return extrap_points
 
     def get_val(self, x, allow_extrapolation=False):
-        xhat = (x[0]-self.origin[0])/self.delta[0]
-        yhat = (x[1]-self.origin[1])/self.delta[1]
-        i = int(math.floor(xhat))
-        j = int(math.floor(yhat))
-        # this is not catched as an IndexError below, because of wrapping of negative indices
-        if i < 0 or j < 0:
-            raise CoordinateError("Coordinate out of range", x, i, j)
-        alpha = xhat % 1.0
-        beta = yhat % 1.0
+        if self.stats is None:
+            return self._get_val(x, allow_extrapolation)
+        with self.stats.timer('get_val'):
+            return self._get_val(x, allow_extrapolation)
+
+    def _get_val(self, x, allow_extrapolation=False):
+        i, j, alpha, beta = self._locate_point(x)
+        i1, j1 = self._next_indices(i, j)
         try:
             if self.mask is not None:
 
                 # case with a land mask
 
                 w00 = (1.0-alpha)*(1.0-beta)*self.mask[i, j]
-                w10 = alpha*(1.0-beta)*self.mask[i+1, j]
-                w01 = (1.0-alpha)*beta*self.mask[i, j+1]
-                w11 = alpha*beta*self.mask[i+1, j+1]
+                w10 = alpha*(1.0-beta)*self.mask[i1, j]
+                w01 = (1.0-alpha)*beta*self.mask[i, j1]
+                w11 = alpha*beta*self.mask[i1, j1]
                 if len(self.val.shape) == 2:
-                    value = w00*self.val[i, j] + w10*self.val[i+1, j] + w01*self.val[i, j+1] + w11*self.val[i+1, j+1]
+                    value = w00*self.val[i, j] + w10*self.val[i1, j] + w01*self.val[i, j1] + w11*self.val[i1, j1]
                 elif len(self.val.shape) == 3:
-                    value = w00*self.val[:, i, j] + w10*self.val[:, i+1, j] + w01*self.val[:, i, j+1] + w11*self.val[:, i+1, j+1]
+                    value = w00*self.val[:, i, j] + w10*self.val[:, i1, j] + w01*self.val[:, i, j1] + w11*self.val[:, i1, j1]
                 else:
                     raise NetCDFInterpolatorError("Field to interpolate, should have 2 or 3 dimensions")
                 sumw = w00+w10+w01+w11
@@ -105,6 +594,8 @@ class Interpolator(object):
                 if sumw > 0.0:
                     value = value/sumw
                 elif allow_extrapolation:
+                    if self.stats is not None:
+                        self.stats.add('extrapolated_points')
                     extrap_points = self.find_extrapolation_points(x, i, j)
                     if len(self.val.shape) == 2:
                         value = sum([self.val[a, b] for a, b in extrap_points])/len(extrap_points)
@@ -120,17 +611,190 @@ class Interpolator(object):
                 # case without a land mask
 
                 if len(self.val.shape) == 2:
-                    value = ((1.0-beta)*((1.0-alpha)*self.val[i, j]+alpha*self.val[i+1, j])
-                             + beta*((1.0-alpha)*self.val[i, j+1]+alpha*self.val[i+1, j+1]))
+                    value = ((1.0-beta)*((1.0-alpha)*self.val[i, j]+alpha*self.val[i1, j])
+                             + beta*((1.0-alpha)*self.val[i, j1]+alpha*self.val[i1, j1]))
                 elif len(self.val.shape) == 3:
-                    value = ((1.0-beta)*((1.0-alpha)*self.val[:, i, j]+alpha*self.val[:, i+1, j])
-                             + beta*((1.0-alpha)*self.val[:, i, j+1]+alpha*self.val[:, i+1, j+1]))
+                    value = ((1.0-beta)*((1.0-alpha)*self.val[:, i, j]+alpha*self.val[:, i1, j])
+                             + beta*((1.0-alpha)*self.val[:, i, j1]+alpha*self.val[:, i1, j1]))
                 else:
                     raise NetCDFInterpolatorError("Field to interpolate, should have 2 or 3 dimensions")
         except IndexError:
             raise CoordinateError("Coordinate out of range", x, i, j)
         return value
 
+    def _next_indices(self, i, j):
+        """Indices i+1 and j+1 of the next grid point, wrapped around in periodic dimensions."""
+        i1, j1 = i+1, j+1
+        if self.wrap[0]:
+            i1 = i1 % self.val.shape[-2]
+        if self.wrap[1]:
+            j1 = j1 % self.val.shape[-1]
+        return i1, j1
+
+    def compute_stencil(self, xs, allow_extrapolation=False):
+        """Compute the interpolation weights for an array of points xs of shape (npoints, 2). Returns a
+        Stencil object that can be applied to any field defined on the same grid (and with the same mask)."""
+        if self.stats is None:
+            return self._compute_stencil(xs, allow_extrapolation)
+        with self.stats.timer('stencil'):
+            return self._compute_stencil(xs, allow_extrapolation)
+
+    def _compute_stencil(self, xs, allow_extrapolation=False):
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        i, j, alpha, beta = self._locate(xs)
+        i1, j1 = self._next_indices(i, j)
+        n0, n1 = self.val.shape[-2:]
+        outside = (i < 0) | (j < 0) | (i1 >= n0) | (j1 >= n1)
+        if outside.any():
+            k = numpy.argmax(outside)
+            raise CoordinateError("Coordinate out of range", tuple(xs[k]), i[k], j[k])
+        si = numpy.stack([i, i1, i, i1], axis=1)
+        sj = numpy.stack([j, j, j1, j1], axis=1)
+        weights = numpy.stack([(1.0-alpha)*(1.0-beta), alpha*(1.0-beta), (1.0-alpha)*beta, alpha*beta], axis=1)
+        if self.mask is not None and len(xs) > 0:
+            weights *= _read_block(self.mask, si, sj)
+            sumw = weights.sum(axis=1)
+            land_points = numpy.nonzero(sumw <= 0.0)[0]
+            if len(land_points) > 0 and not allow_extrapolation:
+                k = land_points[0]
+                raise CoordinateError("Probing point inside land mask", tuple(xs[k]), i[k], j[k])
+            if self.stats is not None:
+                self.stats.add('extrapolated_points', len(land_points))
+            extrap_points = [self.find_extrapolation_points(tuple(xs[k]), int(i[k]), int(j[k])) for k in land_points]
+            nstencil = max([4] + [len(points) for points in extrap_points])
+            if nstencil > 4:
+                si, sj, weights = [numpy.pad(a, ((0, 0), (0, nstencil-4)), mode='edge') for a in (si, sj, weights)]
+                weights[:, 4:] = 0.0
+            sumw[land_points] = 1.0
+            weights /= sumw[:, numpy.newaxis]
+            for k, points in zip(land_points, extrap_points):
+                n = len(points)
+                si[k, :n], sj[k, :n] = zip(*points)
+                si[k, n:], sj[k, n:] = points[0]
+                weights[k, :n] = 1.0/n
+                weights[k, n:] = 0.0
+        return Stencil(si, sj, weights)
+
+    def get_vals(self, xs, allow_extrapolation=False):
+        """Interpolate in many points at once, where xs is an array of shape (npoints, 2). Returns an array whose
+        first dimension corresponds to the points, i.e. get_vals(xs)[k] gives the same as get_val(xs[k])."""
+        if self.stats is None:
+            return self.compute_stencil(xs, allow_extrapolation).apply(self.val)
+        with self.stats.timer('get_vals'):
+            return self.compute_stencil(xs, allow_extrapolation).apply(self.val)
+
+
+class GridInterpolator(Interpolator):
+    """Interpolator on a non-equidistant (RectilinearGrid) or curvilinear (CurvilinearGrid) grid. The dimensions of
+    the grid should be in the same order as the last two dimensions of val."""
+    def __init__(self, grid, val, mask=None, stats=None):
+        self.grid = grid
+        self.val = val
+        self.mask = mask
+        self.stats = stats
+        self.wrap = getattr(grid, 'wrap', [False, False])
+        # cache points that need to be extrapolated
+        self.extrapolation_points = {}
+
+    def _locate_point(self, x):
+        i, j, alpha, beta = self.grid.locate(numpy.array([x], dtype=float))
+        if i[0] < 0 or j[0] < 0:
+            raise CoordinateError("Coordinate out of range", x, i[0], j[0])
+        return int(i[0]), int(j[0]), alpha[0], beta[0]
+
+    def _locate(self, xs):
+        return self.grid.locate(xs)
+
+
+# dtypes of the NetCDF3 external types NC_BYTE, NC_CHAR, NC_SHORT, NC_INT, NC_FLOAT and NC_DOUBLE (stored big-endian)
+_NETCDF3_TYPES = {1: 'i1', 2: 'S1', 3: '>i2', 4: '>i4', 5: '>f4', 6: '>f8'}
+# attributes of variables whose values are masked or scaled when read, so that they cannot be memory-mapped
+_MASK_AND_SCALE_ATTRIBUTES = ('scale_factor', 'add_offset', '_FillValue', 'missing_value', 'valid_min', 'valid_max',
+                              'valid_range')
+
+
+def _netcdf3_variables(f, offset_size):
+    """Parse the header of a classic (offset_size 4) or 64-bit offset (offset_size 8) NetCDF3 file f, positioned after
+    the magic number. Returns a dictionary that maps the name of each variable to its dtype, shape, offset of its values
+    in the file, and whether it is a record variable."""
+    def read(fmt):
+        fmt = '>' + fmt
+        return struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+
+    def read_name():
+        n, = read('i')
+        return f.read(n + (-n) % 4)[:n].decode('utf-8')
+
+    def skip_attributes():
+        _, nattributes = read('ii')
+        for i in range(nattributes):
+            read_name()
+            nc_type, nvalues = read('ii')
+            nbytes = numpy.dtype(_NETCDF3_TYPES[nc_type]).itemsize * nvalues
+            f.seek(nbytes + (-nbytes) % 4, os.SEEK_CUR)
+
+    nrecords, = read('i')
+    _, ndimensions = read('ii')
+    dimensions = []
+    for i in range(ndimensions):
+        read_name()
+        dimensions.append(read('i')[0])
+    skip_attributes()
+    _, nvariables = read('ii')
+    variables = {}
+    for i in range(nvariables):
+        name = read_name()
+        ndims, = read('i')
+        dimids = read('{}i'.format(ndims))
+        skip_attributes()
+        nc_type, _ = read('ii')
+        offset, = read('q' if offset_size == 8 else 'i')
+        # the length of the record (unlimited) dimension is stored as 0
+        shape = tuple(dimensions[d] or nrecords for d in dimids)
+        record = ndims > 0 and dimensions[dimids[0]] == 0
+        variables[name] = (numpy.dtype(_NETCDF3_TYPES[nc_type]), shape, offset, record)
+    return variables
+
+
+def _memory_map(filename, field_name, var):
+    """Memory-map the variable field_name, with NetCDF variable var, of a NetCDF file as a read-only numpy array.
+    Only the pages that are actually indexed are read from disk, and these are shared via the page cache between
+    processes that map the same file. This is possible for variables in classic NetCDF3 files and for
+    uncompressed variables with contiguous storage in NetCDF4 files (requires h5py). Returns None for variables
+    that cannot be memory-mapped, or whose values should be masked or scaled."""
+    if any(hasattr(var, attribute) for attribute in _MASK_AND_SCALE_ATTRIBUTES) or os.path.isdir(filename):
+        return None
+    with open(filename, 'rb') as f:
+        magic = f.read(4)
+        if magic in (b'CDF\x01', b'CDF\x02'):
+            # the location of the values of the variable is read from the header
+            try:
+                variables = _netcdf3_variables(f, 4 if magic == b'CDF\x01' else 8)
+            except (struct.error, KeyError, UnicodeDecodeError):
+                return None
+            if field_name not in variables:
+                return None
+            dtype, shape, offset, record = variables[field_name]
+            if 0 in shape or (record and sum(variable[3] for variable in variables.values()) > 1):
+                # record variables are interleaved with the other record variables
+                return None
+            return numpy.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+    if magic == b'\x89HDF':
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError("Memory-mapping NetCDF4 files requires h5py. Try: pip install h5py")
+        with h5py.File(filename, 'r') as f:
+            dset = f[field_name]
+            if dset.chunks is not None or dset.compression is not None:
+                return None
+            offset = dset.id.get_offset()
+            if offset is None:
+                # no storage allocated, i.e. all values are fill values
+                return None
+            return numpy.memmap(filename, dtype=dset.dtype, mode='r', offset=offset, shape=dset.shape)
+    return None
+
 
 # note that a NetCDFInterpolator is *not* object an Interpolator object
 # the latter is considered immutable, whereas the NetCDFInterpolator may
@@ -139,8 +803,10 @@ class Interpolator(object):
 class NetCDFInterpolator(object):
     """Implements an object to interpolate values from a NetCDF-stored data set.
 
-    The NetCDF file should contain two coordinate fields, e.g. latitude and longitude. Each of those two coordinates
-    is assumed to be aligned with one dimension of the logical 2D grid and should be equi-distant.
+    The NetCDF file should contain two coordinate fields, e.g. latitude and longitude. Typically each of those two coordinates
+    is aligned with one dimension of the logical 2D grid and is equi-distant, which allows for the fastest interpolation.
+    Non-equidistant coordinates, and curvilinear grids where both coordinates vary in both dimensions, are also supported
+    (see below).
     To open the NetCDFInterpolator object:
 
         nci = NetCDFInterpolator('foo.nc', ('nx', 'ny'), ('longitude', latitude'))
@@ -163,9 +829,15 @@ class NetCDFInterpolator(object):
                 double latitude(ny) ;
         }
 
-    The coordinate fields may be stored as 1d or 2d fields (although only two values will actually be read to determine the
-    origin and step size). The order of the dimensions and coordinate fields specified in the call does not have to match that
-    of the netCDF file, i.e. we could have opened the same file with:
+    The coordinate fields may be stored as 1d or 2d fields. If the coordinates are equi-distant, only the origin and step size are
+    used. Otherwise, for coordinates that vary along one dimension only, points are located with a binary search along each axis
+    (see RectilinearGrid). If one of the coordinate fields varies in both dimensions (e.g. a rotated or ROMS-style curvilinear grid),
+    a spatial index is built once to find the cell containing a point, and the interpolation weights are computed from the
+    bilinear map of that cell (see CurvilinearGrid, this requires scipy). Longitude coordinates (recognized by their units
+    or name) are treated as periodic: points may be specified in any longitude convention (e.g. -10 or 350), and if the grid
+    covers the full 360 degrees, points in between the last and first longitude are interpolated between the last and first
+    column of the field, without needing to duplicate any data. The order of the dimensions and coordinate fields
+    specified in the call does not have to match that of the netCDF file, i.e. we could have opened the same file with:
 
         nci_transpose = NetCDFInterpolator('foo.nc', ('ny', 'nx'), ('latitude', longitude'))
 
@@ -178,6 +850,10 @@ class NetCDFInterpolator(object):
 
         nci.get_val((-3.0, 58.5))
 
+    or, to interpolate in many points at once, provide an array of shape (npoints, 2):
+
+        nci.get_vals([(-3.0, 58.5), (-2.9, 58.6)])
+
     If many interpolations are done
     within a sub-domain of the area covered by the NetCDF, it may be much more efficient to indicate the range of coordinates
     with:
@@ -185,6 +861,8 @@ class NetCDFInterpolator(object):
           nci.set_ranges(((-4.0,-2.0),(58.0, 59.0)))
 
     This will load all values within the indicated range (here -4.0<longitude<-2.0 and 58.0<latitude<59.0) in memory.
+    For a global grid, ranges in a periodic longitude coordinate may cross the end of the grid, e.g. (-10.0, 10.0) or (350.0, 10.0)
+    for a grid with longitudes from 0 to 360. The values on both sides are then read and joined into a single window.
     A land-mask can be provided to avoid interpolating from undefined land-values. The mask field should be 0.0 in land points
     and 1.0 at sea.
 
@@ -196,7 +874,9 @@ class NetCDFInterpolator(object):
           nci.set_mask_from_fill_value('z', -9999.)
 
     It is allowed to switch between different fields using multiple calls of set_field(). The mask and ranges will be retained. It is
-    however not allowed to call set_mask() or set_ranges() more than once. Finally,
+    however not allowed to call set_mask() more than once. The ranges can be changed with another call of set_ranges(), in which
+    case only the values that were not already in memory are read from file. A NetCDFInterpolator for a different region of
+    the same file can be obtained with nci.copy(ranges), and nci.in_ranges(xs) tells which points lie within its ranges. Finally,
     for the case where the coordinate fields (and optionally
     the mask field) is stored in a different file than the one containing the field values to be interpolated, the following syntax
     is provided:
@@ -209,21 +889,76 @@ class NetCDFInterpolator(object):
 
     Here, the coordinate information of nci, including the mask and ranges if set, are copied and used in nci2.
 
+    NetCDF files are opened through a shared pool, so that a file that is read by several NetCDFInterpolators
+    is only opened once. When a NetCDFInterpolator is no longer needed, its files can be released with nci.close(),
+    or using a with statement:
+
+        with NetCDFInterpolator('foo.nc', ('nx', 'ny'), ('longitude', latitude')) as nci:
+            ...
+
+    A file is closed when it is no longer used by any NetCDFInterpolator.
+
+    For large uncompressed data bases, such as NetCDF3 files or NetCDF4 files with contiguous storage, the fields
+    can be memory-mapped instead of read into memory:
+
+        nci = NetCDFInterpolator('foo.nc', ('nx', 'ny'), ('longitude', latitude'), mmap=True)
+
+    Only the parts of the file that are within the ranges or that are used in the interpolation are then read from disk,
+    and separate processes on the same node share these through the page cache. This requires h5py for NetCDF4 files.
+    Fields that cannot be memory-mapped (compressed or chunked fields, or fields with a scale_factor, add_offset,
+    _FillValue, missing_value or valid range) are read as usual. A NetCDFInterpolator created from another one inherits its mmap setting.
+
+    Fields stored in chunks (such as compressed NetCDF4 fields) are read in whole chunks, which are kept in a cache of
+    decompressed chunks shared by all NetCDFInterpolators (see ChunkCache), so that for instance reading a field after
+    the mask has been derived from it with set_mask_from_fill_value() does not decompress the same chunks again.
+
+    Besides NetCDF files, data sets stored as HDF5 files or Zarr stores can be read, by selecting a different storage backend
+    with backend='h5py' or backend='zarr' (see uptide.storage). By default the backend is chosen based on the filename:
+    directories and names ending in .zarr use zarr, and names ending in .h5 or .hdf5 use h5py. A NetCDFInterpolator created
+    from another one inherits its backend.
+
+    Reads from file, and the interpolations, can be instrumented by providing a uptide.stats.Stats object (or stats=True
+    to create one), which is then available as nci.stats. A NetCDFInterpolator created from another one shares its stats.
+
     """
     def __init__(self, filename, *args, **kwargs):
-        self.nc = NetCDFFile(filename, 'r')
+        self.filename = filename
+        # the storage backend, by default chosen based on the filename, see uptide.storage
+        if len(args) == 1:
+            self.backend = kwargs.get("backend", args[0].backend)
+        else:
+            self.backend = kwargs.get("backend", None)
+        self.nc = file_pool.acquire(filename, self.backend)
+        # the (filename, backend) of the files for which we hold a reference in file_pool
+        self._files = [(filename, self.backend)]
+        # memory-mapped views of variables, see _variable()
+        self._mapped = {}
 
         if len(args) == 1:
 
             # we copy the grid information of another netcdf interpolator
 
             nci = args[0]
+            self.mmap = kwargs.get("mmap", nci.mmap)
+            self.stats = _stats(kwargs.get("stats", nci.stats))
             self.dimensions = nci.dimensions
             self.shape = nci.shape
             self.origin = nci.origin
             self.delta = nci.delta
+            self.grid = nci.grid
+            self.periods = nci.periods
+            self.file_shape = nci.file_shape
+            self.file_origin = nci.file_origin
+            self.file_grid = nci.file_grid
             self.iranges = nci.iranges
+            self.ranges = nci.ranges
             self.mask = nci.mask
+            self._mask_source = nci._mask_source
+            self._mask_file = nci._mask_file
+            if self._mask_file is not None:
+                # the mask may need to be read again from the file of nci, see set_ranges()
+                file_pool.acquire(*self._mask_file)
+                self._files.append(self._mask_file)
             if nci.mask is not None:
                 self.dim_order = nci.dim_order
 
@@ -231,81 +966,380 @@ class NetCDFInterpolator(object):
 
             dimensions = args[0]
             coordinate_fields = args[1]
+            self.mmap = kwargs.get("mmap", False)
+            self.stats = _stats(kwargs.get("stats", None))
 
             self.dimensions = dimensions
             self.shape = []
             self.origin = []
             self.delta = []
+            self.periods = []
 
+            coordinates = []
             for dimension, field_name in zip(dimensions, coordinate_fields):
                 N = self.nc.dimensions[dimension]
                 if not isinstance(N, int):
                     # let's guess it's a netCDF4.Dimension, so we should ask for its len (yuck)
                     N = len(N)
                 self.shape.append(N)
-                val = self.nc.variables[field_name]
-                if len(val.shape) == 1:
-                    self.origin.append(val[0])
-                    self.delta.append(numpy.diff(val).mean())
-                elif len(val.shape) == 2:
-                    self.origin.append(val[0, 0])
-                    self.delta.append(max(numpy.diff(val, axis=0).mean(),
-                                      numpy.diff(val, axis=1).mean()))
+                coordinates.append(self._read_coordinate_field(field_name, dimension, N))
+                self.periods.append(self._coordinate_period(field_name))
+
+            if all(len(c.shape) == 1 for c in coordinates):
+                equidistant = True
+                for c in coordinates:
+                    delta = (c[-1]-c[0])/max(len(c)-1, 1)
+                    self.origin.append(c[0])
+                    self.delta.append(delta)
+                    deviation = numpy.abs(c - (c[0] + delta*numpy.arange(len(c)))).max()
+                    equidistant = equidistant and deviation <= _grid_tolerance*abs(delta)
+                if equidistant:
+                    self.grid = None
                 else:
-                    raise NetCDFInterpolatorError("Unrecognized shape of coordinate field")
+                    self.grid = RectilinearGrid(coordinates, self.periods)
+            else:
+                # curvilinear grid: both coordinates are needed as 2D fields
+                coordinates = numpy.broadcast_arrays(coordinates[0].reshape(self.shape[0], -1),
+                                                     coordinates[1].reshape(-1, self.shape[1]))
+                self.origin = [c[0, 0] for c in coordinates]
+                self.delta = [numpy.diff(coordinates[0], axis=0).mean(), numpy.diff(coordinates[1], axis=1).mean()]
+                # periodic coordinates are not supported for curvilinear grids
+                self.periods = [None, None]
+                self.grid = CurvilinearGrid(coordinates)
+
+            # the grid of the entire file, which is retained so that the ranges can be changed later on
+            self.file_shape = list(self.shape)
+            self.file_origin = list(self.origin)
+            self.file_grid = self.grid
 
             self.iranges = None
+            self.ranges = None
             self.mask = None
+            # the field (and fill value) that the mask is read from, and its file
+            self._mask_source = None
+            self._mask_file = None
 
         self.interpolator = None
 
         if "ranges" in kwargs:
-            ranges = kwargs("ranges")
+            ranges = kwargs["ranges"]
             self.set_ranges(ranges)
 
+    def _read_coordinate_field(self, field_name, dimension, N):
+        """Read the coordinate field associated with dimension. Returns a 1D array if the coordinate only varies
+        along dimension and otherwise a 2D array (with its dimensions in the order of self.dimensions)."""
+        val = self.nc.variables[field_name]
+        c = numpy.asarray(val[:], dtype=float)
+        if len(c.shape) == 1:
+            return c
+        elif len(c.shape) != 2:
+            raise NetCDFInterpolatorError("Unrecognized shape of coordinate field")
+
+        if sorted(val.dimensions) != sorted(self.dimensions):
+            # we can't tell which dimension is which, so take the step size in the direction that it varies most
+            delta = max(numpy.diff(c, axis=0).mean(), numpy.diff(c, axis=1).mean())
+            return c[0, 0] + delta*numpy.arange(N)
+
+        if list(val.dimensions) != list(self.dimensions):
+            c = c.T
+        axis = list(self.dimensions).index(dimension)
+        c1d = c.take(0, axis=1-axis)
+        delta = abs(c1d[-1]-c1d[0])/max(len(c1d)-1, 1)
+        if numpy.ptp(c, axis=1-axis).max() <= _grid_tolerance*delta:
+            return c1d
+        else:
+            return c
+
+    def _coordinate_period(self, field_name):
+        """Return the period of a coordinate field, i.e. 360 for longitude in degrees, and None otherwise."""
+        val = self.nc.variables[field_name]
+        units = getattr(val, 'units', '')
+        if isinstance(units, bytes):
+            units = units.decode()
+        units = units.lower()
+        if 'east' in units or ('lon' in field_name.lower() and (units == '' or 'degree' in units)):
+            return 360.
+        return None
+
+    def _variable(self, field_name):
+        """Return the variable field_name from which values are read. If mmap is enabled and the variable
+        is stored uncompressed and contiguously, a read-only memory-mapped numpy view is returned, otherwise the
+        NetCDF variable itself."""
+        var = self.nc.variables[field_name]
+        if not self.mmap:
+            return var
+        if field_name not in self._mapped:
+            self._mapped[field_name] = _memory_map(self.filename, field_name, var)
+        mapped = self._mapped[field_name]
+        return var if mapped is None else mapped
+
+    def _field_dim_order(self, field):
+        """Work out the order of the (last two) dimensions of a field with respect to the dimensions specified in __init__."""
+        if list(field.dimensions)[-2:] == list(self.dimensions):
+            return [0, 1]
+        elif list(field.dimensions)[-2:] == list(self.dimensions)[::-1]:
+            return [1, 0]
+        else:
+            raise NetCDFInterpolatorError("Dimensions of field not the same as specified in __init__")
+
+    def _read_window(self, field, dim_order, component=None, iranges=None):
+        """Read the part of field (a NetCDF variable or array) that lies within the index ranges set with set_ranges(),
+        or within the supplied iranges. The last two dimensions of field should be in the order given by dim_order.
+        For 3D fields a single component (or a slice of components) in the first dimension may be selected. Ranges that extend beyond the end of
+        a periodic dimension wrap around to its start, in which case the two parts are read separately and joined."""
+        if self.stats is None:
+            return self._read_window_values(field, dim_order, component, iranges)
+        with self.stats.timer('read'):
+            val = self._read_window_values(field, dim_order, component, iranges)
+        # bytes_read is counted in _read_slice(), as chunks found in chunk_cache are not read again
+        if isinstance(field, numpy.memmap):
+            self.stats.add('bytes_mapped', val.nbytes)
+        return val
+
+    def _read_window_values(self, field, dim_order, component=None, iranges=None):
+        if len(field.shape) < 2:
+            raise NetCDFInterpolatorError("Field should have at least 2 dimensions")
+        elif component is None:
+            lead = (slice(None),)*(len(field.shape)-2)
+        elif len(field.shape) == 3:
+            lead = (component,)
+        else:
+            raise NetCDFInterpolatorError("Can only select a component from a 3D field")
+
+        if iranges is None:
+            iranges = self.iranges
+        if iranges is None:
+            return _read_slice(field, lead + (slice(None), slice(None)), self.stats)
+
+        ir = [iranges[d] for d in dim_order]
+        n = [self.file_shape[d] for d in dim_order]
+        slices0 = _window_slices(ir[0][0], ir[0][1], n[0])
+        slices1 = _window_slices(ir[1][0], ir[1][1], n[1])
+        if len(slices0) == 1 and len(slices1) == 1:
+            return _read_slice(field, lead + (slices0[0], slices1[0]), self.stats)
+        return numpy.concatenate([numpy.concatenate([_read_slice(field, lead + (s0, s1), self.stats) for s1 in slices1], axis=-1)
+                                  for s0 in slices0], axis=-2)
+
+    def _update_window(self, old, old_iranges, dim_order, read):
+        """Return a field in the current window (set with set_ranges()) given its values old in a previous window with
+        index ranges old_iranges. The last two dimensions of old should be in the order given by dim_order. Values in the overlap
+        of the two windows are copied, and only the newly exposed strips are read by calling read(iranges), which should return
+        the values (in the same dimension order) within the given index ranges."""
+        new_ir = [self.iranges[d] for d in dim_order]
+        old_ir = [old_iranges[d] for d in dim_order]
+        overlap = []
+        for (imin, imax), (jmin, jmax), d in zip(new_ir, old_ir, dim_order):
+            n = self.file_shape[d]
+            # in a periodic dimension the old window may also overlap shifted by a period
+            shifts = (-n, 0, n) if _wraps(self.periods[d], n, self.delta[d]) else (0,)
+            best = (imin, imin, 0)
+            for shift in shifts:
+                start, end = max(imin, jmin+shift), min(imax, jmax+shift)
+                if end-start > best[1]-best[0]:
+                    best = (start, end, shift)
+            overlap.append(best)
+
+        (a0, b0), (a1, b1) = new_ir
+        (s0, e0, shift0), (s1, e1, shift1) = overlap
+        c0, c1 = old_ir[0][0]+shift0, old_ir[1][0]+shift1
+        new = numpy.empty(old.shape[:-2] + (b0-a0, b1-a1), dtype=old.dtype)
+        if e0 > s0 and e1 > s1:
+            new[..., s0-a0:e0-a0, s1-a1:e1-a1] = old[..., s0-c0:e0-c0, s1-c1:e1-c1]
+            strips = [((a0, s0), (a1, b1)), ((e0, b0), (a1, b1)), ((s0, e0), (a1, s1)), ((s0, e0), (e1, b1))]
+        else:
+            strips = [((a0, b0), (a1, b1))]
+
+        for r0, r1 in strips:
+            if r0[1] > r0[0] and r1[1] > r1[0]:
+                iranges = [None, None]
+                iranges[dim_order[0]] = r0
+                iranges[dim_order[1]] = r1
+                new[..., r0[0]-a0:r0[1]-a0, r1[0]-a1:r1[1]-a1] = read(iranges)
+        return new
+
+    def _read_mask(self, dim_order, iranges=None):
+        """Read the mask from the field it was originally read from, within the given index ranges, and with its
+        dimensions in the order given by dim_order."""
+        field, mask_dim_order, fill_value, component = self._mask_source
+        if fill_value is None:
+            mask = self._read_window(field, mask_dim_order, iranges=iranges)
+        else:
+            val = self._read_window(field, mask_dim_order, component=component, iranges=iranges)
+            mask = _fill_value_mask(val, fill_value)
+        if mask_dim_order != dim_order:
+            mask = numpy.transpose(mask)
+        return mask
+
+    def read_field(self, field_name, component=None, iranges=None):
+        """Read a 2D field, or a single component (index in the first dimension) of a 3D field, within the
+        ranges set with set_ranges(), or within the index ranges iranges if supplied. The field is returned as
+        an array with its (last) two dimensions in the order specified in __init__."""
+        with _netcdf_lock:
+            dim_order = self._field_dim_order(self.nc.variables[field_name])
+            field = self._variable(field_name)
+        val = self._read_window(field, dim_order, component=component, iranges=iranges)
+        if dim_order[0] == 0:
+            return val
+        else:
+            return numpy.swapaxes(val, -1, -2)
+
+    def read_components(self, field_name, components, iranges=None):
+        """Read the given components (indices in the first dimension) of a 3D field, within the ranges set with set_ranges(),
+        or within the index ranges iranges if supplied. The components are returned, in the order given, as a C-contiguous
+        array of shape (len(components), n0, n1), with the last two dimensions in the order specified in __init__.
+        Rather than reading each component separately, the components are sorted and read in as few slabs of adjacent
+        components as possible (a single one if they are all adjacent), which are then reordered and, if needed, transposed
+        in memory in a single copy."""
+        with _netcdf_lock:
+            dim_order = self._field_dim_order(self.nc.variables[field_name])
+            field = self._variable(field_name)
+        if len(field.shape) != 3:
+            raise NetCDFInterpolatorError("Can only select components from a 3D field")
+        components = numpy.asarray(components, dtype=int)
+        # group the sorted components in runs, including a skipped component in between two requested ones in the run
+        # as reading it costs less than an additional read
+        runs = []
+        for component in numpy.unique(components):
+            if runs and component - runs[-1][1] <= 1:
+                runs[-1][1] = component + 1
+            else:
+                runs.append([component, component + 1])
+
+        val = None
+        for start, stop in runs:
+            slab = self._read_window(field, dim_order, component=slice(start, stop), iranges=iranges)
+            if dim_order[0] == 1:
+                slab = numpy.swapaxes(slab, -1, -2)
+            if val is None:
+                val = numpy.empty((len(components),) + slab.shape[1:], dtype=slab.dtype)
+            selected = numpy.flatnonzero((components >= start) & (components < stop))
+            val[selected] = numpy.ma.getdata(slab)[components[selected]-start]
+        return val
+
+    def same_grid(self, other):
+        """Whether the (restricted) grid of this NetCDFInterpolator is identical to that of the NetCDFInterpolator other,
+        so that interpolation weights computed on one can be used for the other."""
+        if list(self.shape) != list(other.shape) or self.iranges != other.iranges:
+            return False
+        if self.grid is None or other.grid is None:
+            return (self.grid is None and other.grid is None and list(self.origin) == list(other.origin)
+                    and list(self.delta) == list(other.delta) and list(self.periods) == list(other.periods))
+        return (type(self.grid) is type(other.grid) and list(self.periods) == list(other.periods)
+                and all(numpy.array_equal(c1, c2) for c1, c2 in zip(self.grid.coordinates, other.grid.coordinates)))
+
+    def in_ranges(self, xs):
+        """Return for an array of points xs of shape (npoints, 2) whether they lie within the coordinate
+        ranges set with set_ranges(). If no ranges are set, all points are considered within range."""
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        inside = numpy.ones(len(xs), dtype=bool)
+        if self.ranges is None:
+            return inside
+        for x, (lower, upper), period in zip(xs.T, self.ranges, self.periods):
+            if period is None:
+                inside &= (x >= min(lower, upper)) & (x <= max(lower, upper))
+            elif upper < lower or upper-lower < period:
+                inside &= (x-lower) % period <= (upper-lower) % period
+        return inside
+
+    def copy(self, ranges=None):
+        """Return a copy of this NetCDFInterpolator that shares its NetCDF file and grid information. If ranges
+        are provided, the copy is restricted to these; any values that lie within the ranges of this NetCDFInterpolator are
+        copied and only the remaining part is read from file."""
+        nci = copy.copy(self)
+        nci._files = list(self._files)
+        for filename, backend in nci._files:
+            file_pool.acquire(filename, backend)
+        if ranges is not None:
+            nci.set_ranges(ranges)
+        return nci
+
+    def close(self):
+        """Release the NetCDF file(s) of this NetCDFInterpolator. The files are closed if they are not used by any other
+        NetCDFInterpolator. Values that have been read into memory, i.e. within the ranges, can still be interpolated."""
+        for filename, backend in self._files:
+            file_pool.release(filename, backend)
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def set_ranges(self, ranges):
         """Set the range of the coordinates. All the values of points located within this range are read from file at once.
-        This may be more efficient if many interpolations are done within this domain."""
-        if self.iranges is not None:
-            # this could probably be fixed, but requires thought and testing:
-            raise NetCDFInterpolatorError("set_ranges() should only be called once!")
-
-        self.iranges = []
-        origin_new = []
-        shape_new = []
-        for xlimits, xmin, xshape, deltax in zip(ranges, self.origin, self.shape, self.delta):
-            # compute the index range imin:imax
-            # for the min, take one off (i.e. add an extra row column) to avoid rounding issues:
-            imin = max(int((xlimits[0]-xmin)/deltax)-1, 0)
-            # for the max, we add 3 because:
-            # 1) we're rounding off first
-            # 2) add one extra for rounding off issues
-            # 3) python imin:imax range means up to and *excluding* imax
-            # Example: xmin=0.0, deltax=1.0, xlimits[1]=3.7 -> imax=6
-            # (which is one too many, but nearing 3.999 we may get into a situation where we have to interpolate between 4 and 5)
-            imax = min(int((xlimits[1]-xmin)/deltax)+3, xshape)
-            if imin >= imax:
-                raise NetCDFInterpolatorError("Provided ranges outside netCDF range")
-            self.iranges.append((imin, imax))
-            origin_new.append(xmin+imin*deltax)
-            shape_new.append(imax-imin)
-
-        self.origin = origin_new
-        self.shape = shape_new
+        This may be more efficient if many interpolations are done within this domain. The ranges may be changed later on
+        with another call, in which case only the values that were not within the previous ranges are read from file."""
+        old_iranges = self.iranges
+
+        if self.file_grid is not None:
+            self.iranges = self.file_grid.index_ranges(ranges)
+            self.grid = self.file_grid.subgrid(self.iranges)
+            self.origin = [xmin+imin*deltax for xmin, (imin, imax), deltax in zip(self.file_origin, self.iranges, self.delta)]
+            self.shape = [imax-imin for imin, imax in self.iranges]
+        else:
+            self.iranges = []
+            origin_new = []
+            shape_new = []
+            for xlimits, xmin, xshape, deltax, period in zip(ranges, self.file_origin, self.file_shape, self.delta, self.periods):
+                if _wraps(period, xshape, deltax):
+                    imin, imax = self._periodic_index_range(xlimits, xmin, xshape, deltax, period)
+                    self.iranges.append((imin, imax))
+                    origin_new.append(xmin+imin*deltax)
+                    shape_new.append(imax-imin)
+                    continue
+                # compute the index range imin:imax
+                # for the min, take one off (i.e. add an extra row column) to avoid rounding issues:
+                imin = max(int((xlimits[0]-xmin)/deltax)-1, 0)
+                # for the max, we add 3 because:
+                # 1) we're rounding off first
+                # 2) add one extra for rounding off issues
+                # 3) python imin:imax range means up to and *excluding* imax
+                # Example: xmin=0.0, deltax=1.0, xlimits[1]=3.7 -> imax=6
+                # (which is one too many, but nearing 3.999 we may get into a situation where we have to interpolate between 4 and 5)
+                imax = min(int((xlimits[1]-xmin)/deltax)+3, xshape)
+                if imin >= imax:
+                    raise NetCDFInterpolatorError("Provided ranges outside netCDF range")
+                self.iranges.append((imin, imax))
+                origin_new.append(xmin+imin*deltax)
+                shape_new.append(imax-imin)
+
+            self.origin = origin_new
+            self.shape = shape_new
+
+        self.ranges = ranges
 
         if self.mask is not None:
-            ir = [self.iranges[d] for d in self.dim_order]
-            self.mask = self.mask[ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
+            if old_iranges is None:
+                self.mask = self._read_window(self.mask, self.dim_order)
+            else:
+                self.mask = self._update_window(self.mask, old_iranges, self.dim_order,
+                                                lambda iranges: self._read_mask(self.dim_order, iranges))
 
         if self.interpolator is not None:
-            ir = [self.iranges[d] for d in self.dim_order]
-            if len(self.val.shape) == 2:
-                self.val = self.val[ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            elif len(self.val.shape) == 3:
-                self.val = self.val[:, ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            origin = [self.origin[d] for d in self.dim_order]
-            delta = [self.delta[d] for d in self.dim_order]
-            self.interpolator = Interpolator(origin, delta, self.val, self.mask)
+            if old_iranges is None:
+                self.val = self._read_window(self.val, self.dim_order)
+            else:
+                field = self._variable(self.field_name)
+                self.val = self._update_window(self.val, old_iranges, self.dim_order,
+                                               lambda iranges: self._read_window(field, self.dim_order, iranges=iranges))
+            self.interpolator = self.create_interpolator(self.val, self.mask, self.dim_order)
+
+    def _periodic_index_range(self, xlimits, xmin, xshape, deltax, period):
+        """Index range imin:imax for a periodic dimension that covers the full period. The coordinate
+        range may cross the periodic boundary, e.g. (350, 10) or (-10, 10) for a 0 to 360 degrees grid, in which case
+        imax is larger than the number of points, and the range wraps around."""
+        lower, upper = xlimits
+        if upper < lower:
+            upper += period
+        # add extra rows/columns for rounding off issues, as in set_ranges()
+        imin = int(math.floor((lower-xmin)/deltax))-1
+        imax = int(math.floor((upper-xmin)/deltax))+3
+        if imax-imin >= xshape:
+            return 0, xshape
+        # shift to start within the first period
+        shift = (imin // xshape)*xshape
+        return imin-shift, imax-shift
 
     def set_mask(self, field_name):
         """Sets a land mask from a mask field. This field should have a value of 0.0 for land points and 1.0 for the sea"""
@@ -323,9 +1357,11 @@ class NetCDFInterpolator(object):
         else:
             raise NetCDFInterpolatorError("Dimensions of mask field not the same as specified in __init__")
 
+        mask = self._variable(field_name)
+        self._mask_source = (mask, dim_order, None, None)
+        self._mask_file = (self.filename, self.backend)
         if self.iranges is not None:
-            ir = [self.iranges[d] for d in dim_order]
-            mask = mask[ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
+            mask = self._read_window(mask, dim_order)
 
         self._set_mask_and_dim_order(mask, dim_order)
 
@@ -351,9 +1387,12 @@ class NetCDFInterpolator(object):
                     self.mask = numpy.transpose(mask[:, :])
             self.interpolator.set_mask(self.mask)
 
-    def set_mask_from_fill_value(self, field_name, fill_value):
+    def set_mask_from_fill_value(self, field_name, fill_value, values=None, component=None):
         """Sets a land mask, where all points for which the supplied field equals the supplied fill value. The supplied field_name
-        does not have to be the same as the field that is interpolated from, set with set_field()."""
+        does not have to be the same as the field that is interpolated from, set with set_field(). For a 3D field the mask
+        is derived from the given component (index in the first dimension), by default the first. If the values of the field
+        (component) within the ranges have already been read with read_field(), they can be provided as values so that they
+        are not read again. When the ranges are changed, the mask is extended from the same field (component)."""
         val = self.nc.variables[field_name]
         # work out the dimension, in particular its order
         if list(val.dimensions)[-2:] == list(self.dimensions):
@@ -363,24 +1402,25 @@ class NetCDFInterpolator(object):
         else:
             raise NetCDFInterpolatorError("Dimensions of mask field not the same as specified in __init__")
 
-        if self.iranges is not None:
-            ir = [self.iranges[d] for d in dim_order]
-            if len(val.shape) == 2:
-                val = val[ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            elif len(val.shape) == 3:
-                # multiple values per gridpoint, just take the first one
-                val = val[0, ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            else:
-                raise NetCDFInterpolatorError("Field to extract mask from, should have 2 or 3 dimensions")
+        val = self._variable(field_name)
+        if len(val.shape) == 3 and component is None:
+            # multiple values per gridpoint, by default take the first one
+            component = 0
+        if values is not None:
+            # values as returned by read_field(), i.e. in the order of the dimensions specified in __init__
+            val = values
+            if dim_order[0] == 1:
+                val = val.T
         elif len(val.shape) == 2:
-            val = val[:]
+            val = self._read_window(val, dim_order)
         elif len(val.shape) == 3:
-            # multiple values per gridpoint, just take the first one
-            val = val[0, :, :]
+            val = self._read_window(val, dim_order, component=component)
         else:
             raise NetCDFInterpolatorError("Field to extract mask from, should have 2 or 3 dimensions")
 
-        mask = numpy.logical_not(numpy.isclose(val, fill_value))
+        self._mask_source = (self._variable(field_name), dim_order, fill_value, component)
+        self._mask_file = (self.filename, self.backend)
+        mask = _fill_value_mask(val, fill_value)
         self._set_mask_and_dim_order(mask, dim_order)
 
     def set_field(self, field_name):
@@ -396,14 +1436,11 @@ class NetCDFInterpolator(object):
         else:
             raise NetCDFInterpolatorError("Dimensions of field not the same as specified in __init__")
 
+        self.val = self._variable(field_name)
         if self.iranges is not None:
-            ir = [self.iranges[d] for d in dim_order]
-            if len(self.val.shape) == 2:
-                self.val = self.val[ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            elif len(self.val.shape) == 3:
-                self.val = self.val[:, ir[0][0]:ir[0][1], ir[1][0]:ir[1][1]]
-            else:
+            if len(self.val.shape) not in (2, 3):
                 raise NetCDFInterpolatorError("Field to interpolate, should have 2 or 3 dimensions")
+            self.val = self._read_window(self.val, dim_order)
 
         if self.mask is not None:
             if not self.dim_order == dim_order:
@@ -415,9 +1452,21 @@ class NetCDFInterpolator(object):
                     self.mask = numpy.transpose(self.mask[:, :])
         self.dim_order = dim_order
 
-        origin = [self.origin[d] for d in self.dim_order]
-        delta = [self.delta[d] for d in self.dim_order]
-        self.interpolator = Interpolator(origin, delta, self.val, self.mask)
+        self.interpolator = self.create_interpolator(self.val, self.mask, self.dim_order)
+
+    def create_interpolator(self, val, mask=None, dim_order=(0, 1)):
+        """Create an Interpolator object for the field val (and mask) defined on the grid of this NetCDFInterpolator.
+        The (last) two dimensions of val and mask should be in the order given by dim_order, where (0, 1)
+        corresponds to the order of the dimensions specified in __init__."""
+        if self.grid is None:
+            origin = [self.origin[d] for d in dim_order]
+            delta = [self.delta[d] for d in dim_order]
+            periods = [self.periods[d] for d in dim_order]
+            return Interpolator(origin, delta, val, mask, periods, stats=self.stats)
+        elif dim_order[0] == 0:
+            return GridInterpolator(self.grid, val, mask, stats=self.stats)
+        else:
+            return GridInterpolator(self.grid.transpose(), val, mask, stats=self.stats)
 
     def get_val(self, x, allow_extrapolation=False):
         """Interpolate the field chosen with set_field(). The order of the coordinates should correspond with the storage order in the file."""
@@ -428,3 +1477,15 @@ class NetCDFInterpolator(object):
         else:
             # swap dimensions
             return self.interpolator.get_val((x[1], x[0]), allow_extrapolation)
+
+    def get_vals(self, xs, allow_extrapolation=False):
+        """Interpolate the field chosen with set_field() in many points at once. xs should be an array of shape (npoints, 2)
+        with the coordinates in the same order as for get_val(). Returns an array whose first dimension corresponds to the points."""
+        if self.interpolator is None:
+            raise NetCDFInterpolatorError("Should call set_field() before calling get_vals()!")
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        if self.dim_order[0] == 0:
+            return self.interpolator.get_vals(xs, allow_extrapolation)
+        else:
+            # swap dimensions
+            return self.interpolator.get_vals(xs[:, ::-1], allow_extrapolation)
@@ -0,0 +1,235 @@
+"""Conversion between UTM and latitude/longitude coordinates, for numpy arrays of coordinates. The formulas are those of
+the utm package (by Tobias Bieniek, MIT license, see regression/utm.py), with some corrections to the conversion from
+UTM to latitude/longitude, and applied to all points at once:
+
+    import uptide.projection
+    lat, lon = uptide.projection.utm_to_latlon(easting, northing, 30, 'V')
+    easting, northing, zone_number, zone_letter = uptide.projection.utm_from_latlon(lat, lon)
+
+Interpolation of the tide in points given in model (UTM) coordinates, e.g. the nodes of a mesh, is done with a UTM
+projection object, which converts arrays of points of shape (npoints, 2) to the coordinates of a tidal database:
+
+    projection = uptide.projection.UTM(30, 'V', order='lonlat')  # for a database with (lon, lat) coordinates
+    lonlats = projection.transform(xys)
+    boundary = uptide.transect.TransectTidalInterpolator(tnci, xys, projection=projection)
+
+The projection may also be passed to a TidalNetCDFInterpolator (e.g. uptide.TPXOTidalInterpolator(..., projection=projection)),
+whose ranges and points are then all in model coordinates. See also uptide.service.TidePredictor."""
+import numpy
+
+
+class OutOfRangeError(ValueError):
+    pass
+
+
+K0 = 0.9996
+
+E = 0.00669438
+E2 = E * E
+E3 = E2 * E
+E_P2 = E / (1.0 - E)
+
+SQRT_E = numpy.sqrt(1 - E)
+_E = (1 - SQRT_E) / (1 + SQRT_E)
+_E2 = _E * _E
+_E3 = _E2 * _E
+_E4 = _E3 * _E
+
+M1 = (1 - E / 4 - 3 * E2 / 64 - 5 * E3 / 256)
+M2 = (3 * E / 8 + 3 * E2 / 32 + 45 * E3 / 1024)
+M3 = (15 * E2 / 256 + 45 * E3 / 1024)
+M4 = (35 * E3 / 3072)
+
+P2 = (3 * _E / 2 - 27 * _E3 / 32)
+P3 = (21 * _E2 / 16 - 55 * _E4 / 32)
+P4 = (151 * _E3 / 96)
+P5 = (1097 * _E4 / 512)
+
+R = 6378137
+
+# lower latitude of each zone letter, from south to north
+_ZONE_LATITUDES = numpy.arange(-80, 80, 8)
+_ZONE_LETTERS = 'CDEFGHJKLMNPQRSTUVWX'
+
+
+def _check_range(values, lower, upper, message):
+    if numpy.any(values < lower) or numpy.any(values > upper):
+        raise OutOfRangeError(message)
+
+
+def zone_number_to_central_longitude(zone_number):
+    return (numpy.asarray(zone_number) - 1) * 6 - 180 + 3
+
+
+def latitude_to_zone_letter(latitude):
+    """Return the zone letter(s) of the latitude(s), or None for latitudes outside -80 to 84."""
+    latitude = numpy.asarray(latitude, dtype=float)
+    index = numpy.clip(numpy.searchsorted(_ZONE_LATITUDES, latitude, side='right') - 1, 0, len(_ZONE_LETTERS) - 1)
+    letters = numpy.array(list(_ZONE_LETTERS), dtype=object)[numpy.atleast_1d(index)]
+    letters[numpy.atleast_1d((latitude < -80) | (latitude > 84))] = None
+    return letters.reshape(latitude.shape)[()]
+
+
+def latlon_to_zone_number(latitude, longitude):
+    latitude = numpy.asarray(latitude, dtype=float)
+    longitude = numpy.asarray(longitude, dtype=float)
+    zone_number = ((longitude + 180) / 6).astype(int) + 1
+    zone_number = numpy.where((56 <= latitude) & (latitude <= 64) & (3 <= longitude) & (longitude <= 12), 32, zone_number)
+    svalbard = (72 <= latitude) & (latitude <= 84) & (longitude >= 0)
+    for max_longitude, number in ((42, 37), (33, 35), (21, 33), (9, 31)):
+        zone_number = numpy.where(svalbard & (longitude <= max_longitude), number, zone_number)
+    return zone_number[()]
+
+
+def utm_to_latlon(easting, northing, zone_number, zone_letter=None, northern=None):
+    """Convert UTM coordinates (arrays of easting and northing) in the given zone to latitude and longitude (in degrees).
+    The hemisphere is given by either the zone_letter, or northern (True or False)."""
+    if (zone_letter is None) == (northern is None):
+        raise ValueError("Either zone_letter or northern should be provided")
+    easting = numpy.asarray(easting, dtype=float)
+    northing = numpy.asarray(northing, dtype=float)
+    _check_range(easting, 100000, 1000000, 'easting out of range (must be between 100.000 m and 999.999 m)')
+    _check_range(northing, 0, 10000000, 'northing out of range (must be between 0 m and 10.000.000 m)')
+    if not 1 <= zone_number <= 60:
+        raise OutOfRangeError('zone number out of range (must be between 1 and 60)')
+    if zone_letter is not None:
+        zone_letter = zone_letter.upper()
+        if not 'C' <= zone_letter <= 'X' or zone_letter in ['I', 'O']:
+            raise OutOfRangeError('zone letter out of range (must be between C and X)')
+        northern = zone_letter >= 'N'
+
+    x = easting - 500000
+    y = northing
+    if not northern:
+        y = y - 10000000
+
+    m = y / K0
+    mu = m / (R * M1)
+
+    p_rad = (mu + P2 * numpy.sin(2 * mu) + P3 * numpy.sin(4 * mu) + P4 * numpy.sin(6 * mu) + P5 * numpy.sin(8 * mu))
+
+    p_sin = numpy.sin(p_rad)
+    p_sin2 = p_sin * p_sin
+
+    p_cos = numpy.cos(p_rad)
+
+    p_tan = p_sin / p_cos
+    p_tan2 = p_tan * p_tan
+    p_tan4 = p_tan2 * p_tan2
+
+    ep_sin = 1 - E * p_sin2
+    ep_sin_sqrt = numpy.sqrt(1 - E * p_sin2)
+
+    n = R / ep_sin_sqrt
+    r = (1 - E) / ep_sin
+
+    c = E_P2 * p_cos**2
+    c2 = c * c
+
+    d = x / (n * K0)
+    d2 = d * d
+    d3 = d2 * d
+    d4 = d3 * d
+    d5 = d4 * d
+    d6 = d5 * d
+
+    # NOTE: this corrects the following errors of utm 0.2.5, which together shifted latitudes by up to about 20 m:
+    # P3 used _E3 instead of _E2, c used _E instead of E_P2, and the last term was not multiplied by p_tan / r
+    latitude = (p_rad - (p_tan / r)
+                * (d2 / 2
+                   - d4 / 24 * (5 + 3 * p_tan2 + 10 * c - 4 * c2 - 9 * E_P2)
+                   + d6 / 720 * (61 + 90 * p_tan2 + 298 * c + 45 * p_tan4 - 252 * E_P2 - 3 * c2)))
+
+    longitude = (d
+                 - d3 / 6 * (1 + 2 * p_tan2 + c)
+                 + d5 / 120 * (5 - 2 * c + 28 * p_tan2 - 3 * c2 + 8 * E_P2 + 24 * p_tan4)) / p_cos
+
+    return numpy.degrees(latitude), numpy.degrees(longitude) + zone_number_to_central_longitude(zone_number)
+
+
+def utm_from_latlon(latitude, longitude, force_zone_number=None):
+    """Convert latitude and longitude (arrays, in degrees) to UTM coordinates. Returns easting, northing, zone_number
+    and zone_letter, where the zone is determined for each point separately, unless force_zone_number is provided."""
+    latitude = numpy.asarray(latitude, dtype=float)
+    longitude = numpy.asarray(longitude, dtype=float)
+    _check_range(latitude, -80.0, 84.0, 'latitude out of range (must be between 80 deg S and 84 deg N)')
+    _check_range(longitude, -180.0, 180.0, 'longitude out of range (must be between 180 deg W and 180 deg E)')
+
+    lat_rad = numpy.radians(latitude)
+    lat_sin = numpy.sin(lat_rad)
+    lat_cos = numpy.cos(lat_rad)
+
+    lat_tan = lat_sin / lat_cos
+    lat_tan2 = lat_tan * lat_tan
+    lat_tan4 = lat_tan2 * lat_tan2
+
+    lon_rad = numpy.radians(longitude)
+
+    if force_zone_number is None:
+        zone_number = latlon_to_zone_number(latitude, longitude)
+    else:
+        zone_number = force_zone_number
+    central_lon_rad = numpy.radians(zone_number_to_central_longitude(zone_number))
+
+    zone_letter = latitude_to_zone_letter(latitude)
+
+    n = R / numpy.sqrt(1 - E * lat_sin**2)
+    c = E_P2 * lat_cos**2
+
+    a = lat_cos * (lon_rad - central_lon_rad)
+    a2 = a * a
+    a3 = a2 * a
+    a4 = a3 * a
+    a5 = a4 * a
+    a6 = a5 * a
+
+    m = R * (M1 * lat_rad
+             - M2 * numpy.sin(2 * lat_rad)
+             + M3 * numpy.sin(4 * lat_rad)
+             - M4 * numpy.sin(6 * lat_rad))
+
+    easting = K0 * n * (a
+                        + a3 / 6 * (1 - lat_tan2 + c)
+                        + a5 / 120 * (5 - 18 * lat_tan2 + lat_tan4 + 72 * c - 58 * E_P2)) + 500000
+
+    northing = K0 * (m + n * lat_tan * (a2 / 2
+                                        + a4 / 24 * (5 - lat_tan2 + 9 * c + 4 * c**2)
+                                        + a6 / 720 * (61 - 58 * lat_tan2 + lat_tan4 + 600 * c - 330 * E_P2)))
+    northing = numpy.where(latitude < 0, northing + 10000000, northing)
+
+    return easting, northing[()], zone_number, zone_letter
+
+
+class UTM(object):
+    """Projection between the UTM coordinates of a single zone and latitude/longitude. The zone is given by its number and
+    either its letter or northern (True or False for the hemisphere). The latitude/longitude coordinates are in the order
+    given by order, 'lonlat' or 'latlon', which should match the order of the coordinates of the tidal database."""
+    def __init__(self, zone_number, zone_letter=None, northern=None, order='lonlat'):
+        if order not in ('lonlat', 'latlon'):
+            raise ValueError("order should be 'lonlat' or 'latlon'")
+        if (zone_letter is None) == (northern is None):
+            raise ValueError("Either zone_letter or northern should be provided")
+        self.zone_number = zone_number
+        self.zone_letter = zone_letter
+        self.northern = northern
+        self.order = order
+
+    def transform(self, xys):
+        """Convert an array of UTM coordinates (easting, northing) of shape (npoints, 2), to an array of latitude/longitude
+        coordinates of the same shape."""
+        xys = numpy.asarray(xys, dtype=float).reshape(-1, 2)
+        lat, lon = utm_to_latlon(xys[:, 0], xys[:, 1], self.zone_number, self.zone_letter, self.northern)
+        if self.order == 'lonlat':
+            return numpy.stack([lon, lat], axis=1)
+        return numpy.stack([lat, lon], axis=1)
+
+    def inverse(self, xs):
+        """Convert an array of latitude/longitude coordinates of shape (npoints, 2) to UTM coordinates in this zone."""
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        if self.order == 'lonlat':
+            lon, lat = xs.T
+        else:
+            lat, lon = xs.T
+        lon = (lon + 180.) % 360. - 180.
+        easting, northing = utm_from_latlon(lat, lon, force_zone_number=self.zone_number)[:2]
+        return numpy.stack([easting, northing], axis=1)
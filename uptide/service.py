@@ -0,0 +1,248 @@
+"""Long-lived tidal prediction service. A TidePredictor keeps a tidal interpolator
+(with its NetCDF files opened and constituents loaded) in memory and caches its predictions
+at named stations. It can be queried directly, or through a simple local HTTP server:
+
+    import uptide
+    import uptide.service
+
+    tide = uptide.Tides(['M2', 'S2', 'K1', 'O1'])
+    tide.set_initial_time(datetime.datetime(2020, 1, 1))
+    tnci = uptide.TPXOTidalInterpolator(tide, grid_file, data_file, ranges=((356., 360.), (58., 61.)))
+    predictor = uptide.service.TidePredictor(tnci, stations={'wick': (356.9, 58.44), 'lerwick': (358.86, 60.15)})
+    etas = predictor.predict(['wick', 'lerwick'], [datetime.datetime(2020, 3, 1, 12, 0), ...])
+
+    uptide.service.serve(predictor, port=8000)  # or unix_socket='/tmp/uptide.sock'
+
+The server answers JSON POST requests to /predict, with either "stations" (a list of station names) or "points"
+(a list of coordinates), and "times" (a list of ISO 8601 datetimes in UTC), e.g.
+
+    {"stations": ["wick", "lerwick"], "times": ["2020-03-01T12:00", "2020-03-01T13:00"]}
+
+and returns {"values": [[...], [...]]}, with a row of values for each time. A GET request to /stations
+returns the known stations, and to /stats the cache statistics. Only the python standard library is used."""
+import collections
+import datetime
+import http.server
+import json
+import os
+import socketserver
+import threading
+import urllib.parse
+import numpy
+
+
+class LRUCache(object):
+    """A dictionary of limited size that discards the least recently used entries."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+
+    def discard(self, predicate):
+        """Remove all entries for which predicate(key) is true."""
+        for key in [key for key in self.data if predicate(key)]:
+            del self.data[key]
+
+
+def _utc_datetime64(dt):
+    if getattr(dt, 'tzinfo', None):
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return numpy.datetime64(dt, 'us')
+
+
+class TidePredictor(object):
+    """Predicts the tide at stations, or arbitrary points, using a tidal interpolator that is kept in memory.
+    The interpolator can be any of the uptide interpolators with set_time() and get_vals() methods,
+    e.g. a TidalNetCDFInterpolator, TidalVelocityInterpolator, MultiRegionTidalInterpolator or
+    FES2014TidalInterpolator. Stations are a dict that maps station names to coordinates, in the order
+    expected by the interpolator. Predictions are cached for each station (or point) and each time bucket:
+    times are rounded to a multiple of time_bucket seconds (after datetime0, by default the datetime0 of the interpolator
+    or of its Tides object), and the cache holds at most cache_size values. Methods are thread-safe.
+
+    If a projection is provided (see uptide.projection), the coordinates of stations and points are in model coordinates
+    (e.g. UTM), and are converted to the coordinates of the interpolator in bulk. The converted coordinates of the stations
+    are kept, so that they are only converted once."""
+    def __init__(self, interpolator, stations=None, time_bucket=60., cache_size=1000000, datetime0=None, projection=None):
+        self.interpolator = interpolator
+        self.projection = projection
+        self.stations = {}
+        # coordinates of the stations in the coordinates of the interpolator
+        self._station_coordinates = {}
+        self.time_bucket = time_bucket
+        self.cache = LRUCache(cache_size)
+        self._add_stations(stations or {})
+        # the datetime after which the times passed to interpolator.set_time() are counted
+        interpolator_datetime0 = getattr(interpolator, 'datetime0', None)
+        if interpolator_datetime0 is None:
+            interpolator_datetime0 = getattr(getattr(interpolator, 'tide', None), 'datetime0', None)
+        if datetime0 is None:
+            datetime0 = interpolator_datetime0
+        if datetime0 is None:
+            raise ValueError("datetime0 should be provided for an interpolator without datetime0 or tide")
+        self.datetime0 = _utc_datetime64(datetime0)
+        # seconds after the datetime0 of the interpolator of the time buckets' datetime0
+        if interpolator_datetime0 is None:
+            self._time_offset = 0.
+        else:
+            self._time_offset = (self.datetime0 - _utc_datetime64(interpolator_datetime0)) / numpy.timedelta64(1, 's')
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _add_stations(self, stations):
+        names = list(stations)
+        xs = numpy.array([stations[name] for name in names], dtype=float).reshape(-1, 2)
+        for name, x, coordinates in zip(names, xs, self._transform(xs)):
+            if name in self.stations and self.stations[name] != tuple(x):
+                # the station has moved: discard its cached predictions
+                self.cache.discard(lambda key: key[0] == name)
+            self.stations[name] = tuple(x)
+            self._station_coordinates[name] = coordinates
+
+    def _transform(self, xs):
+        if self.projection is None or len(xs) == 0:
+            return xs
+        return self.projection.transform(xs)
+
+    def add_station(self, name, x):
+        """Add a station name with coordinates x, or move an existing station to x."""
+        with self.lock:
+            self._add_stations({name: x})
+
+    def _buckets(self, times):
+        """Convert times to time bucket indices. Times may be datetimes, numpy.datetime64, ISO 8601
+        strings (all in UTC), or numbers, which are interpreted as seconds after datetime0."""
+        times = numpy.asarray(times)
+        if times.dtype.kind in 'iuf':
+            seconds = times.astype(float)
+        else:
+            if times.dtype.kind == 'O':
+                times = numpy.array([t.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                                     if getattr(t, 'tzinfo', None) else t for t in times.ravel()]).reshape(times.shape)
+            seconds = (times.astype('datetime64[us]') - self.datetime0) / numpy.timedelta64(1, 's')
+        return numpy.round(seconds/self.time_bucket).astype(int)
+
+    def predict(self, stations, times):
+        """Predict the tide at the given stations (names, or coordinates of points) and times. Returns an array of
+        shape (ntimes, nstations), or (ntimes, nstations, 2) for a TidalVelocityInterpolator."""
+        keys = [station if isinstance(station, str) else tuple(float(c) for c in station) for station in stations]
+        with self.lock:
+            points = numpy.empty((len(keys), 2))
+            is_station = numpy.array([isinstance(key, str) for key in keys], dtype=bool)
+            for k in numpy.flatnonzero(is_station):
+                points[k] = self._station_coordinates[keys[k]]
+            if not is_station.all():
+                points[~is_station] = self._transform(numpy.array([key for key in keys if not isinstance(key, str)]))
+            buckets = self._buckets(times)
+            values = [[self.cache.get((key, bucket)) for key in keys] for bucket in buckets]
+            for bucket, row in zip(buckets, values):
+                missing = [k for k, value in enumerate(row) if value is None]
+                self.hits += len(row) - len(missing)
+                if not missing:
+                    continue
+                self.misses += len(missing)
+                self.interpolator.set_time(bucket*self.time_bucket + self._time_offset)
+                new_values = self.interpolator.get_vals(points[missing])
+                for k, value in zip(missing, new_values):
+                    row[k] = value
+                    self.cache.put((keys[k], bucket), value)
+        if not keys or not len(buckets):
+            return numpy.zeros((len(buckets), len(keys)))
+        return numpy.array(values, dtype=float)
+
+    def stats(self):
+        """Return the number of cache hits, misses and the number of cached values."""
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.cache)}
+
+
+class TidePredictorRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles requests to the server created by serve(). The TidePredictor is available as self.server.predictor."""
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/stations':
+            self._send_json(self.server.predictor.stations)
+        elif path == '/stats':
+            self._send_json(self.server.predictor.stats())
+        else:
+            self._send_json({'error': 'unknown path {}'.format(path)}, 404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path != '/predict':
+            self._send_json({'error': 'unknown path {}'.format(path)}, 404)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            stations = request['stations'] if 'stations' in request else request['points']
+            times = numpy.array(request['times'], dtype='datetime64[us]')
+            values = self.server.predictor.predict(stations, times)
+        except Exception as e:
+            self._send_json({'error': '{}: {}'.format(type(e).__name__, e)}, 400)
+            return
+        self._send_json({'values': values.tolist()})
+
+    def address_string(self):
+        # for unix sockets, client_address is not a (host, port) tuple
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'unix-socket'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(predictor, host='127.0.0.1', port=8000, unix_socket=None, verbose=False):
+    """Create (but do not start) a server for predictor, listening on host and port, or on the unix socket unix_socket if
+    specified. Call its serve_forever() method to start it. With port=0, a free port is chosen which is available as
+    server.server_address[1]."""
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, TidePredictorRequestHandler)
+    else:
+        server = http.server.ThreadingHTTPServer((host, port), TidePredictorRequestHandler)
+    server.predictor = predictor
+    server.verbose = verbose
+    return server
+
+
+def serve(predictor, host='127.0.0.1', port=8000, unix_socket=None, verbose=True):
+    """Serve predictions of predictor (a TidePredictor) until interrupted, see make_server()."""
+    server = make_server(predictor, host=host, port=port, unix_socket=unix_socket, verbose=verbose)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
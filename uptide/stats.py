@@ -0,0 +1,92 @@
+"""Optional instrumentation of the interpolators. A Stats object can be passed to the netCDF based interpolators
+(e.g. TPXOTidalInterpolator(..., stats=stats), or stats=True to create one), which then record the time spent in,
+and the number of calls of, each phase of the computation, and a number of counters:
+
+    import uptide.stats
+    stats = uptide.stats.Stats()
+    tnci = uptide.TPXOTidalInterpolator(tide, grid_file, data_file, ranges=ranges, stats=stats)
+    tnci.set_time(t)
+    etas = tnci.get_vals(xs, allow_extrapolation=True)
+    print(stats)
+    stats.times['set_time'], stats.counters['bytes_read']
+
+The phases are:
+
+    read        - reading fields (constituents, masks) from NetCDF files
+    load        - loading the constituents, including reading and conversion
+    convert     - conversion of amplitudes and phases to complex components
+    set_time    - reconstruction of the tidal signal on the grid in set_time()
+    stencil     - computation of interpolation weights (Interpolator.compute_stencil(), used by get_vals())
+    get_val     - interpolation in a single point
+    get_vals    - interpolation in many points at once
+
+and the counters:
+
+    bytes_read                  - bytes read from NetCDF files (whole chunks for chunked variables, not counting
+                                  chunks found in the chunk cache)
+    bytes_mapped                - bytes of memory-mapped fields within the ranges (see mmap=True), read on demand
+    allocated_bytes             - bytes of arrays allocated for the constituents and reconstructed fields
+    extrapolated_points         - number of interpolations in land points that required extrapolation
+    extrapolation_cache_hits    - number of extrapolated points whose neighbouring sea points were cached
+    extrapolation_cache_misses  - number of extrapolated points whose neighbouring sea points had to be searched
+    chunk_cache_hits            - number of storage chunks of chunked variables found in the chunk cache
+    chunk_cache_misses          - number of storage chunks of chunked variables read (and decompressed) from file
+
+When no Stats object is provided (the default), nothing is recorded and the only overhead is a check
+whether the interpolator's stats attribute is None."""
+import collections
+import contextlib
+import threading
+import time
+
+
+class Stats(object):
+    """Accumulates the wall time (times) and number of calls (calls) per phase, and counters, of one or more interpolators.
+    Methods are thread-safe."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all times, calls and counters to zero."""
+        with self.lock:
+            self.times = collections.defaultdict(float)
+            self.calls = collections.defaultdict(int)
+            self.counters = collections.defaultdict(int)
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        """Context manager that adds the wall time spent within it to phase."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            with self.lock:
+                self.times[phase] += dt
+                self.calls[phase] += 1
+
+    def add(self, counter, n=1):
+        """Add n to counter."""
+        with self.lock:
+            self.counters[counter] += n
+
+    def as_dict(self):
+        """Return the times, calls and counters as a dict of dicts."""
+        with self.lock:
+            return {'times': dict(self.times), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def __str__(self):
+        lines = ['{:<30} {:>12} {:>10}'.format('phase', 'time (s)', 'calls')]
+        for phase in sorted(self.times):
+            lines.append('{:<30} {:>12.6f} {:>10}'.format(phase, self.times[phase], self.calls[phase]))
+        for counter in sorted(self.counters):
+            lines.append('{:<30} {:>12}'.format(counter, self.counters[counter]))
+        return '\n'.join(lines)
+
+
+def _stats(stats):
+    """Return a new Stats object if stats is True, and stats itself otherwise (a Stats object or None)."""
+    if stats is True:
+        return Stats()
+    return stats
@@ -0,0 +1,236 @@
+"""Storage backends for NetCDFInterpolator. A backend opens a file (or directory) and returns a dataset object
+with the same API as a netCDF4.Dataset, as far as it is used by uptide: a variables dict of variables with
+dimensions, shape and dtype attributes, numpy style indexing with slices and integers, and their attributes
+(e.g. units, _FillValue) as python attributes; a dimensions dict that maps dimension names to their sizes; and a
+close() method. The available backends are:
+
+    netcdf - NetCDF3 and NetCDF4 files read with the netCDF4 package (or Scientific or scipy)
+    h5py   - NetCDF4 or other HDF5 files read with h5py. Dimension names are taken from the dimension
+             scales attached to each dataset, as written by the netCDF4 library.
+    zarr   - Zarr stores (directories), such as written by xarray's to_zarr(). Dimension names are
+             taken from the _ARRAY_DIMENSIONS attribute (Zarr v2) or the dimension_names (Zarr v3) of each array.
+
+By default the backend is chosen from the file name: directories and names ending in .zarr use zarr,
+names ending in .h5, .hdf5 or .he5 use h5py, and all other files use netcdf. A backend can also be
+selected explicitly, e.g. NetCDFInterpolator(..., backend='h5py') or TPXOTidalInterpolator(..., backend='h5py'). Further
+backends may be added to the backends dict, as a function that takes a file name and returns a dataset object.
+
+With the h5py and zarr backends, values are read from the chunks of the stored arrays that overlap the
+ranges. Reads from zarr stores are thread-safe, so that the constituents are read concurrently
+(see TidalNetCDFInterpolator)."""
+import os.path
+import numpy
+
+_NetCDFFile = None
+
+
+def _netcdf_file_class():
+    """Return the python netcdf class used to open NetCDF files. It is only imported when first needed,
+    so that importing uptide does not require, or pay the import cost of, a netCDF package."""
+    global _NetCDFFile
+    if _NetCDFFile is None:
+        # horrible kludge to import python netcdf class - there's three different implementations to choose from!
+        # luckily they adhere to the same API
+        try:
+            # this seems to be the most mature and also handles netcdf4 files
+            from netCDF4 import Dataset as NetCDFFile
+        except ImportError:
+            try:
+                # this one is older but is quite often installed
+                from Scientific.IO.NetCDF import NetCDFFile
+            except ImportError:
+                # finally, try the one in scipy that I hear conflicting things about
+                try:
+                    # this only works in python 2.7
+                    from scipy.io.netcdf import NetCDFFile
+                except ImportError:
+                    # in python 2.6 it's called something else
+                    from scipy.io.netcdf import netcdf_file as NetCDFFile
+        _NetCDFFile = NetCDFFile
+    return _NetCDFFile
+
+
+def _attribute_value(value):
+    """Convert an attribute value as stored by h5py or zarr to the form returned by netCDF4."""
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, numpy.ndarray):
+        if value.dtype.kind == 'S':
+            value = numpy.char.decode(value)
+        if value.size == 1:
+            return value.reshape(()).item()
+    if isinstance(value, list) and len(value) == 1:
+        return value[0]
+    return value
+
+
+def _mask_and_scale(values, attributes):
+    """Mask the values that equal the missing_value or _FillValue attributes, or are outside valid_min, valid_max or
+    valid_range, and unpack values with the scale_factor and add_offset attributes, as the netCDF4 library does."""
+    mask = None
+    if any(key in attributes for key in ('missing_value', '_FillValue', 'valid_min', 'valid_max', 'valid_range')):
+        mask = numpy.zeros(values.shape, dtype=bool)
+        for key in ('missing_value', '_FillValue'):
+            if key in attributes:
+                mask |= numpy.isin(values, numpy.asarray(attributes[key], dtype=values.dtype))
+        valid_min, valid_max = attributes.get('valid_range', (None, None))
+        valid_min = attributes.get('valid_min', valid_min)
+        valid_max = attributes.get('valid_max', valid_max)
+        if valid_min is not None:
+            mask |= values < valid_min
+        if valid_max is not None:
+            mask |= values > valid_max
+    if 'scale_factor' in attributes:
+        values = values * attributes['scale_factor']
+    if 'add_offset' in attributes:
+        values = values + attributes['add_offset']
+    if mask is not None:
+        values = numpy.ma.masked_array(values, mask=mask)
+    return values
+
+
+class ArrayVariable(object):
+    """A variable of a dataset returned by the h5py and zarr backends, wrapping an array-like object (a h5py.Dataset or
+    zarr.Array) that is indexed with numpy style slices and integers. Values are returned as numpy arrays. As with
+    netCDF4, missing values are masked (returning a masked array) and packed values are unpacked with scale_factor and
+    add_offset, unless this is switched off with set_auto_maskandscale(False)."""
+    def __init__(self, array, dimensions, attributes, thread_safe=False):
+        self.array = array
+        self.dimensions = tuple(dimensions)
+        self.shape = tuple(array.shape)
+        self.dtype = array.dtype
+        self.chunks = getattr(array, 'chunks', None)
+        self.attributes = dict((key, _attribute_value(value)) for key, value in attributes.items())
+        # whether values can be read concurrently from several threads
+        self.thread_safe = thread_safe
+        self.maskandscale = True
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['attributes'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def ncattrs(self):
+        return list(self.attributes)
+
+    def set_auto_maskandscale(self, maskandscale):
+        self.maskandscale = maskandscale
+
+    def __getitem__(self, index):
+        values = numpy.asarray(self.array[index])
+        if self.maskandscale:
+            values = _mask_and_scale(values, self.attributes)
+        return values
+
+    def __array__(self, dtype=None, copy=None):
+        return numpy.asarray(self[...], dtype=dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+
+class ArrayDataset(object):
+    """A dataset returned by the h5py and zarr backends, with variables (a dict of ArrayVariables) and dimensions
+    (a dict that maps dimension names to sizes)."""
+    def __init__(self, variables, close=None):
+        self.variables = variables
+        self.dimensions = {}
+        for var in variables.values():
+            for dimension, n in zip(var.dimensions, var.shape):
+                self.dimensions.setdefault(dimension, n)
+        self._close = close
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+        self._close = None
+
+
+# attributes used by the netCDF4 library to store its metadata in HDF5 files
+_hdf5_netcdf_attributes = {'DIMENSION_LIST', 'REFERENCE_LIST', 'CLASS', 'NAME', '_Netcdf4Dimid', '_Netcdf4Coordinates',
+                           '_nc3_strict', '_NCProperties'}
+
+
+def open_h5py(filename):
+    """Open a NetCDF4 or other HDF5 file with h5py."""
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("The h5py storage backend requires h5py. Try: pip install h5py")
+    f = h5py.File(filename, 'r')
+    variables = {}
+    for name, dset in f.items():
+        if not isinstance(dset, h5py.Dataset):
+            continue
+        if _attribute_value(dset.attrs.get('NAME', '')).startswith('This is a netCDF dimension but not a netCDF variable'):
+            # dimension without a coordinate variable
+            continue
+        dimensions = []
+        for i, dim in enumerate(dset.dims):
+            if len(dim) > 0:
+                dimensions.append(dim[0].name.split('/')[-1])
+            elif dim.label:
+                dimensions.append(dim.label)
+            else:
+                dimensions.append('phony_dim_{}_{}'.format(name, i))
+        attributes = dict((key, value) for key, value in dset.attrs.items() if key not in _hdf5_netcdf_attributes)
+        variables[name] = ArrayVariable(dset, dimensions, attributes)
+    return ArrayDataset(variables, f.close)
+
+
+def open_zarr(filename):
+    """Open a Zarr store (directory), e.g. as written by xarray."""
+    try:
+        import zarr
+    except ImportError:
+        raise ImportError("The zarr storage backend requires zarr. Try: pip install zarr")
+    group = zarr.open_group(filename, mode='r')
+    variables = {}
+    for name, array in group.arrays():
+        attributes = dict(array.attrs)
+        dimensions = attributes.pop('_ARRAY_DIMENSIONS', None)
+        if dimensions is None:
+            dimensions = getattr(getattr(array, 'metadata', None), 'dimension_names', None)
+        if dimensions is None:
+            dimensions = ['phony_dim_{}_{}'.format(name, i) for i in range(len(array.shape))]
+        # Zarr v3 arrays always have a fill_value (0 by default) for uninitialized chunks, which does not mark missing
+        # values: these are recorded in the _FillValue attribute. In Zarr v2 the fill_value is null unless set,
+        # and is used by xarray to store _FillValue
+        zarr_format = getattr(getattr(array, 'metadata', None), 'zarr_format', 2)
+        if '_FillValue' not in attributes and zarr_format == 2 and getattr(array, 'fill_value', None) is not None:
+            attributes['_FillValue'] = array.fill_value
+        variables[name] = ArrayVariable(array, dimensions, attributes, thread_safe=True)
+    return ArrayDataset(variables)
+
+
+def open_netcdf(filename):
+    """Open a NetCDF file with the netCDF4 package (or another python netCDF implementation)."""
+    return _netcdf_file_class()(filename, 'r')
+
+
+backends = {
+    'netcdf': open_netcdf,
+    'h5py': open_h5py,
+    'zarr': open_zarr,
+}
+
+
+def guess_backend(filename):
+    """Choose the backend for filename based on its name, see above."""
+    if os.path.isdir(filename) or filename.rstrip('/').endswith('.zarr'):
+        return 'zarr'
+    if os.path.splitext(filename)[1].lower() in ('.h5', '.hdf5', '.he5'):
+        return 'h5py'
+    return 'netcdf'
+
+
+def open_dataset(filename, backend=None):
+    """Open filename with the given backend (a name in backends), or the backend guessed from its name."""
+    if backend is None:
+        backend = guess_backend(filename)
+    try:
+        opener = backends[backend]
+    except KeyError:
+        raise ValueError("Unknown storage backend {}, should be one of: {}".format(backend, ', '.join(backends)))
+    return opener(filename)
@@ -1,17 +1,44 @@
 import numpy
 import uptide.netcdf_reader as netcdf_reader
+from uptide.tides import PreparedTides
+from uptide.stats import _stats
+import uptide.ellipse as ellipse
 import itertools
+import concurrent.futures
+import copy
 import os.path
 
 _deg2rad = numpy.pi/180.
 
 
+def _amplitudes_and_phases_to_complex(amp, phase, amplitude_scale=1.0):
+    # NOTE: I did try several things with packing everything in a single nx x ny x nc x 2 array
+    # (and making sure things are  contiguous in memory in the right order)
+    # and contracting it with a nc x 2 array to compute the tides at all nx x ny points
+    # but everything I tried was slower than this simple version
+    if amplitude_scale != 1.0:
+        amp = amp*amplitude_scale
+    return amp*numpy.cos(phase*_deg2rad), -amp*numpy.sin(phase*_deg2rad)
+
+
 class TidalNetCDFInterpolator(object):
     def __init__(self, tide, grid_file_name, dimensions, coordinate_fields,
-                 ranges=None, mask=None):
+                 ranges=None, mask=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
         """Initiate a TidalNetCDFInterpolator. The specification of the names of the dimensions
         and coordinate_fields is the same as for the NetCDFInterpolator class, see its documentation.
         ranges and mask may be specified in a similar way to the NetCDFInterpolator class.
+        With mmap=True, uncompressed fields are memory-mapped rather than read, see NetCDFInterpolator.
+        The storage backend used to read the files (e.g. backend='zarr' or 'h5py') is by default chosen
+        based on the filename, see uptide.storage.
+        The constituents are loaded concurrently by a pool of max_workers threads (by default the
+        default number of workers of concurrent.futures.ThreadPoolExecutor), use max_workers=1 to load them one by one.
+        Constituents stored in a single 3D field are read together, in as few reads as possible.
+        If a uptide.stats.Stats object is provided (or stats=True to create one), the time spent in reading, loading,
+        set_time() and interpolation, and counters such as the number of bytes read, are recorded in tnci.stats.
+        If a projection is provided (see uptide.projection), the ranges and the points passed to get_val(), get_vals(),
+        compute_stencil() and get_complex_components() are in model coordinates (e.g. UTM), which are converted to the
+        coordinates of the NetCDF grid. The ranges are then converted to the ranges of the NetCDF coordinates
+        that contain the converted boundary of the rectangle in model coordinates.
         NOTE: setting a correct coordinate ranges is strongly recommended when reading
         from a NetCDF data base that is significantly bigger than the region of interest,
         as otherwise the tidal signal will be reconstructed for all points of the NetCDF grid
@@ -47,16 +74,33 @@ class TidalNetCDFInterpolator(object):
 
             tnci.set_time(t) # t in seconds after the datetime set with tide.set_initial_time()
             tnci.get_val(x)  # interpolate the tidal signal in location x
+            tnci.get_vals(xs)  # or in many locations at once, xs is an array of shape (npoints, 2)
+
+        The NetCDF files can be released with tnci.close() (or by using tnci in a with statement)
+        when no further calls to set_ranges() are needed. Files are opened only once for all interpolators
+        that read from them, see NetCDFInterpolator.
 
         Note that each call to set_time() the tidal signal is reconstructed in all points of the (restricted)
         NetCDF grid. Therefore this method is only efficient if a significant number of interpolations are
         done for each time.
 
+        The ranges may be changed at any point with another call to set_ranges(), e.g. when the region of
+        interest moves. Only the constituent values that were not already within the previous ranges are then
+        read from file. To work with several (disjoint) regions of the same data base, see MultiRegionTidalInterpolator.
+
         """
         self.tide = tide
         self.grid_file_name = grid_file_name
+        self.max_workers = max_workers
+        self.projection = projection
+        # NetCDFInterpolators for the files, other than the grid file, that the constituents are read from
+        self._data_ncis = {}
+        # PreparedTides for real_part and imag_part, created in set_time()
+        self._prepared = None
         self.nci = netcdf_reader.NetCDFInterpolator(grid_file_name, dimensions,
-                                                    coordinate_fields)
+                                                    coordinate_fields, mmap=mmap, stats=stats, backend=backend)
+        self.stats = self.nci.stats
+        self._update_mask()
 
         if ranges is not None:
             self.set_ranges(ranges)
@@ -64,30 +108,129 @@ class TidalNetCDFInterpolator(object):
             self.set_mask(mask)
 
     def set_ranges(self, ranges):
-        self.nci.set_ranges(ranges)
+        """Set the range of the coordinates, see NetCDFInterpolator.set_ranges(). This may be called again to
+        change the ranges, in which case the constituents are only read from file for the part of the new ranges
+        that is not covered by the previous ranges. If set_time() has been called, the tidal signal is recomputed."""
+        old_iranges = self.nci.iranges
+        self.nci.set_ranges(self._transform_ranges(ranges))
+        if hasattr(self, "real_part"):
+            if old_iranges is None:
+                self.real_part = numpy.ascontiguousarray(self.nci._read_window(self.real_part, (0, 1)))
+                self.imag_part = numpy.ascontiguousarray(self.nci._read_window(self.imag_part, (0, 1)))
+            else:
+                self.real_part, self.imag_part = self.nci._update_window(
+                    numpy.array([self.real_part, self.imag_part]), old_iranges, (0, 1),
+                    lambda iranges: numpy.array(self._read_constituents(iranges)))
+            self._prepared = None
+        self._update_mask()
+        if hasattr(self, "t"):
+            self.set_time(self.t)
+
+    def _transform(self, xs):
+        # convert points, an array of shape (npoints, 2), from model coordinates to the coordinates of the NetCDF grid
+        if self.projection is None:
+            return xs
+        return self.projection.transform(xs)
+
+    def _transform_ranges(self, ranges):
+        # the sides of the rectangle given by ranges in model coordinates are curved in the coordinates of the NetCDF
+        # grid, so the ranges of the grid coordinates are taken from points along all four sides
+        if self.projection is None:
+            return ranges
+        (x0, x1), (y0, y1) = ranges
+        s = numpy.linspace(0., 1., 33)
+        sides = [numpy.stack([x0 + s*(x1-x0), numpy.full_like(s, y)], axis=1) for y in (y0, y1)]
+        sides += [numpy.stack([numpy.full_like(s, x), y0 + s*(y1-y0)], axis=1) for x in (x0, x1)]
+        xs = self.projection.transform(numpy.concatenate(sides))
+        return tuple(zip(xs.min(axis=0), xs.max(axis=0)))
+
+    def in_ranges(self, xs):
+        """Return a boolean array that is True for the points xs, an array of shape (npoints, 2), that lie within the
+        ranges, see NetCDFInterpolator.in_ranges(). With a projection, xs are in model coordinates."""
+        return self.nci.in_ranges(self._transform(xs))
 
     def set_mask(self, field_name):
         self.nci.set_mask(field_name)
+        self._update_mask()
+
+    def set_mask_from_fill_value(self, field_name, fill_value, values=None, component=None):
+        self.nci.set_mask_from_fill_value(field_name, fill_value, values=values, component=component)
+        self._update_mask()
+
+    def _update_mask(self):
+        # store the mask of self.nci with its dimensions in the same order as the constituent values
+        # the mask is read into memory (unless memory-mapped), as it is needed in every set_time()
+        mask = self.nci.mask
+        if mask is None:
+            self.mask = None
+            return
+        if not isinstance(mask, numpy.ndarray):
+            mask = mask[:, :]
+        if self.nci.dim_order[0] == 0:
+            self.mask = mask
+        else:
+            self.mask = mask.T
+        if hasattr(self, "real_part"):
+            self._discard_chunks()
+
+    def _discard_chunks(self):
+        # once the constituents (and mask) have been read, drop the chunks of our files from the chunk cache: the files
+        # are kept open for set_ranges(), and their chunks would otherwise be retained until they are closed
+        for nci in [self.nci] + list(self._data_ncis.values()):
+            if nci._files:
+                netcdf_reader.chunk_cache.discard(nci.nc)
+
+    def _load(self, read_method, *args):
+        # read the constituents, and remember how to do so for reading additional values in set_ranges()
+        self._reader = (read_method, args)
+        if self.stats is None:
+            self.real_part, self.imag_part = self._read_constituents()
+        else:
+            with self.stats.timer('load'):
+                self.real_part, self.imag_part = self._read_constituents()
+            self.stats.add('allocated_bytes', self.real_part.nbytes + self.imag_part.nbytes)
+        self._prepared = None
+        self._discard_chunks()
 
-    def set_mask_from_fill_value(self, field_name, fill_value):
-        self.nci.set_mask_from_fill_value(field_name, fill_value)
+    def _read_constituents(self, iranges=None):
+        read_method, args = self._reader
+        return getattr(self, read_method)(*args, iranges=iranges)
 
     def load_amplitudes_and_phases(self, amplitude_file_name, amplitude_field_names,
-                                   phase_file_name, phase_field_names):
+                                   phase_file_name, phase_field_names, amplitude_scale=1.0, fill_value=None):
         """Load amplitude and phases of the different constituents where amplitudes
         and phases are stored as separate fields in the NetCDF. The amplitude and phase
         field names should be in the same order as tide.constituents. ampltide and
         phase file_name may be a single string, or an array of strings to indicate
-        seperate filenames for each constituent."""
-
-        amp = numpy.array(self._collect_fields_val(amplitude_file_name, amplitude_field_names))
-        phase = numpy.array(self._collect_fields_val(phase_file_name, phase_field_names))
-        self.real_part = amp*numpy.cos(phase*_deg2rad)
-        self.imag_part = -amp*numpy.sin(phase*_deg2rad)
-        # NOTE: I did try several things with packing everything in a single nx x ny x nc x 2 array
-        # (and making sure things are  contiguous in memory in the right order)
-        # and contracting it with a nc x 2 array to compute the tides at all nx x ny points
-        # but everything I tried was slower than this simple version
+        seperate filenames for each constituent. The amplitudes are multiplied by amplitude_scale,
+        e.g. 0.01 for amplitudes stored in cm. If a fill_value is provided, the land mask is set from the points
+        where the amplitude of the first constituent equals fill_value (see set_mask_from_fill_value()), using the
+        amplitudes as read for the constituents. The first amplitude field should then be stored in the grid file."""
+        self._load('_read_amplitudes_and_phases', amplitude_file_name, amplitude_field_names,
+                   phase_file_name, phase_field_names, amplitude_scale, fill_value)
+
+    def _read_amplitudes_and_phases(self, amplitude_file_name, amplitude_field_names,
+                                    phase_file_name, phase_field_names, amplitude_scale=1.0, fill_value=None, iranges=None):
+        amplitude_sources = self._field_sources(amplitude_file_name, amplitude_field_names)
+        amp, phase = self._read_fields(amplitude_sources, self._field_sources(phase_file_name, phase_field_names), iranges)
+        return self._convert_amplitudes_and_phases(amp, phase, amplitude_sources[0], iranges, amplitude_scale, fill_value)
+
+    def _convert_amplitudes_and_phases(self, amp, phase, amplitude_source, iranges=None,
+                                       amplitude_scale=1.0, fill_value=None):
+        """Convert the amplitudes and phases of all constituents to complex components in a single pass. If fill_value is
+        provided, the mask is derived from the amplitudes of the first constituent, read from the field (component) given by
+        amplitude_source=(nci, field_name, component), when the constituents are loaded, so that the field is not read
+        again. When additional values are read in set_ranges(), the mask has already been extended by the
+        NetCDFInterpolator from the same field (component)."""
+        if fill_value is not None and iranges is None:
+            nci, field_name, component = amplitude_source
+            if nci is not self.nci:
+                raise netcdf_reader.NetCDFInterpolatorError("Mask can only be derived from a field in the grid file")
+            self.set_mask_from_fill_value(field_name, fill_value, values=amp[0], component=component)
+        if self.stats is None:
+            return _amplitudes_and_phases_to_complex(amp, phase, amplitude_scale)
+        with self.stats.timer('convert'):
+            return _amplitudes_and_phases_to_complex(amp, phase, amplitude_scale)
 
     def load_complex_components(self, real_file_name, real_field_names,
                                 imag_file_name, imag_field_names):
@@ -96,44 +239,89 @@ class TidalNetCDFInterpolator(object):
         field names should be in the same order as tide.constituents.
         The file_name may be a single string, or an array of strings to indicate
         seperate filenames for each constituent."""
-        self.real_part = numpy.array(self._collect_fields_val(real_file_name, real_field_names))
-        self.imag_part = numpy.array(self._collect_fields_val(imag_file_name, imag_field_names))
+        self._load('_read_complex_components', real_file_name, real_field_names,
+                   imag_file_name, imag_field_names)
+
+    def _read_complex_components(self, real_file_name, real_field_names,
+                                 imag_file_name, imag_field_names, iranges=None):
+        return self._read_fields(self._field_sources(real_file_name, real_field_names),
+                                 self._field_sources(imag_file_name, imag_field_names),
+                                 iranges)
+
+    def _data_nci(self, file_name):
+        # returns a NetCDFInterpolator to read from file_name, these are kept to read again in set_ranges()
+        if file_name == self.grid_file_name:
+            return self.nci
+        if file_name not in self._data_ncis:
+            # copies grid, mask and ranges information from self.nci (the "grid" netCDF file)
+            self._data_ncis[file_name] = netcdf_reader.NetCDFInterpolator(file_name, self.nci)
+        return self._data_ncis[file_name]
 
-    def _collect_fields_val(self, file_name, field_names):
-        val = []
+    def _field_sources(self, file_name, field_names):
+        # list of (nci, field_name, component) to read the fields of the separate constituents from
         if isinstance(file_name, str):
             file_names = itertools.repeat(file_name)
         else:
             file_names = file_name
-
-        nci_filenm = self.grid_file_name
-        nci = self.nci
-
-        for filenm, fieldnm in zip(file_names, field_names):
-            if not filenm == nci_filenm:
-                # copies grid, mask and ranges information from self.nci (the "grid" netCDF file)
-                nci = netcdf_reader.NetCDFInterpolator(filenm, self.nci)
-                nci_filenm = filenm
-            nci.set_field(fieldnm)
-            if nci.dim_order[0] == 0:
-                val.append(nci.val[:])
-            else:
-                val.append(nci.val[:].T)
-        return val
+        return [(self._data_nci(filenm), fieldnm, None) for filenm, fieldnm in zip(file_names, field_names)]
+
+    def _read_block_fields(self, file_name1, field_name1, field_components1,
+                           file_name2, field_name2, field_components2, iranges=None):
+        """Read the constituents stored in the 3D fields field_name1 and field_name2, each with a single
+        sorted read (see NetCDFInterpolator.read_components()). The two fields are read concurrently,
+        unless max_workers=1. Returns two arrays of shape (nconstituents, ...)."""
+        sources = [(self._data_nci(file_name1), field_name1, field_components1),
+                   (self._data_nci(file_name2), field_name2, field_components2)]
+
+        def read(source):
+            nci, field_name, components = source
+            return nci.read_components(field_name, components, iranges=iranges)
+
+        if self.max_workers == 1:
+            return [read(source) for source in sources]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            return list(executor.map(read, sources))
+
+    def _read_fields(self, sources1, sources2, iranges=None):
+        """Read a pair of fields for each constituent, from the (nci, field_name, component) entries
+        of sources1 and sources2. The constituents are read concurrently using a pool of max_workers threads
+        (the netCDF reads themselves are serialized, but overlap with reads of memory-mapped fields and of
+        thread-safe storage backends, and with the copying out of cached chunks).
+        The results are always combined in the order of the constituents, into two arrays of shape (nconstituents, ...)."""
+        def read(k):
+            (nci1, field1, component1), (nci2, field2, component2) = sources1[k], sources2[k]
+            val1 = nci1.read_field(field1, component=component1, iranges=iranges)
+            val2 = nci2.read_field(field2, component=component2, iranges=iranges)
+            return val1, val2
+
+        n = len(sources1)
+        if self.max_workers == 1 or n < 2:
+            parts = [read(k) for k in range(n)]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                parts = list(executor.map(read, range(n)))
+        return numpy.array([part[0] for part in parts]), numpy.array([part[1] for part in parts])
 
     def load_amplitudes_and_phases_block(self,
                                          amplitude_file_name, amplitude_field_name, amplitude_field_components,
-                                         phase_file_name, phase_field_name, phase_field_components):
+                                         phase_file_name, phase_field_name, phase_field_components, fill_value=None):
         """Load amplitude and phases of the different constituents where amplitudes
         and phases are stored in a single 3d field. The first dimension of this
         field should correspond the different constituents stored. ..._field_components
         refers to which indices of this first dimension correspond to the constituents
-        specified in tide.consituents."""
-
-        amp = numpy.array(self._collect_fields_block(amplitude_file_name, amplitude_field_name, amplitude_field_components))
-        phase = numpy.array(self._collect_fields_block(phase_file_name, phase_field_name, phase_field_components))
-        self.real_part = amp*numpy.cos(phase*_deg2rad)
-        self.imag_part = -amp*numpy.sin(phase*_deg2rad)
+        specified in tide.consituents. If a fill_value is provided, the land mask is set
+        from the amplitudes as read for the constituents, see load_amplitudes_and_phases()."""
+        self._load('_read_amplitudes_and_phases_block', amplitude_file_name, amplitude_field_name, amplitude_field_components,
+                   phase_file_name, phase_field_name, phase_field_components, fill_value)
+
+    def _read_amplitudes_and_phases_block(self,
+                                          amplitude_file_name, amplitude_field_name, amplitude_field_components,
+                                          phase_file_name, phase_field_name, phase_field_components, fill_value=None,
+                                          iranges=None):
+        amp, phase = self._read_block_fields(amplitude_file_name, amplitude_field_name, amplitude_field_components,
+                                             phase_file_name, phase_field_name, phase_field_components, iranges)
+        amplitude_source = (self._data_nci(amplitude_file_name), amplitude_field_name, amplitude_field_components[0])
+        return self._convert_amplitudes_and_phases(amp, phase, amplitude_source, iranges, fill_value=fill_value)
 
     def load_complex_components_block(self,
                                       real_file_name, real_field_name, real_field_components,
@@ -143,46 +331,270 @@ class TidalNetCDFInterpolator(object):
         field should correspond the different constituents stored. ..._field_components
         refers to which indices of this first dimension correspond to the constituents
         specified in tide.consituents."""
+        self._load('_read_complex_components_block', real_file_name, real_field_name, real_field_components,
+                   imag_file_name, imag_field_name, imag_field_components)
 
-        self.real_part = numpy.array(self._collect_fields_block(real_file_name, real_field_name, real_field_components))
-        self.imag_part = numpy.array(self._collect_fields_block(imag_file_name, imag_field_name, imag_field_components))
-
-    def _collect_fields_block(self, file_name, field_name, field_components):
-        if file_name == self.grid_file_name:
-            nci = self.nci
-        else:
-            # copies grid, mask and ranges information from self.nci (the "grid" netCDF file)
-            nci = netcdf_reader.NetCDFInterpolator(file_name, self.nci)
-        nci.set_field(field_name)
-
-        val = []
-        for component in field_components:
-            if nci.dim_order[0] == 0:
-                val.append(nci.val[component, :, :])
-            else:
-                val.append(nci.val[component, :, :].T)
-        return val
+    def _read_complex_components_block(self,
+                                       real_file_name, real_field_name, real_field_components,
+                                       imag_file_name, imag_field_name, imag_field_components, iranges=None):
+        return self._read_block_fields(real_file_name, real_field_name, real_field_components,
+                                       imag_file_name, imag_field_name, imag_field_components, iranges)
 
     def set_time(self, t):
         """Set the time in seconds after the datetime specified by tide.set_initial_time(). Recomputes
         the tidal signal on all points of the NetCDF grid."""
         if not hasattr(self, "real_part"):
             raise Exception("Need to call load_amplitudes_and_phases() first!")
-        val = self.tide.from_complex_components(self.real_part, self.imag_part, t)
-        self.interpolator = netcdf_reader.Interpolator(self.nci.origin, self.nci.delta, val, self.nci.mask)
+        self.t = t
+        if self._prepared is None:
+            self._prepared = PreparedTides(self.tide, self.real_part, self.imag_part)
+        if self.stats is None:
+            val = self._prepared.evaluate(t)
+        else:
+            with self.stats.timer('set_time'):
+                val = self._prepared.evaluate(t)
+            self.stats.add('allocated_bytes', val.nbytes)
+        self.interpolator = self.nci.create_interpolator(val, self.mask)
 
     def get_val(self, x, allow_extrapolation=False):
         """Interpolates the tidal signal in point x, computed in set_time(). The order
         of the coordinates x is determined by the storage order in the NetCDF file."""
         if not hasattr(self, "interpolator"):
             raise Exception("Need to call set_time() first!")
+        if self.projection is not None:
+            x = tuple(self.projection.transform([x])[0])
         return self.interpolator.get_val(x, allow_extrapolation)
 
+    def get_vals(self, xs, allow_extrapolation=False):
+        """Interpolates the tidal signal computed in set_time() in many points at once. xs should be an array
+        of shape (npoints, 2), with the coordinates in the same order as for get_val()."""
+        if not hasattr(self, "interpolator"):
+            raise Exception("Need to call set_time() first!")
+        return self.interpolator.get_vals(self._transform(xs), allow_extrapolation)
+
+    def compute_stencil(self, xs, allow_extrapolation=False):
+        """Compute the interpolation weights (a netcdf_reader.Stencil) for the points xs, an array of shape (npoints, 2),
+        on the (restricted) grid and taking into account the mask. These remain valid until the ranges are changed."""
+        if not hasattr(self, "real_part"):
+            raise Exception("Need to call load_amplitudes_and_phases() first!")
+        interpolator = self.nci.create_interpolator(self.real_part[0], self.mask)
+        return interpolator.compute_stencil(self._transform(xs), allow_extrapolation)
+
+    def get_complex_components(self, xs, allow_extrapolation=False, stencil=None):
+        """Interpolate the real and imaginary parts of the constituents in the points xs, an array of shape (npoints, 2).
+        Returns two arrays of shape (npoints, nconstituents). A stencil computed with compute_stencil(xs) may be provided."""
+        if stencil is None:
+            stencil = self.compute_stencil(xs, allow_extrapolation)
+        return stencil.apply(self.real_part), stencil.apply(self.imag_part)
+
+    def copy(self, ranges=None):
+        """Return a copy of this TidalNetCDFInterpolator that shares its NetCDF files and grid information. If ranges
+        are provided, the copy is restricted to these; any constituent values that lie within the ranges of this
+        TidalNetCDFInterpolator are copied and only the remaining part is read from file."""
+        tnci = copy.copy(self)
+        tnci.nci = self.nci.copy()
+        tnci._data_ncis = dict((file_name, nci.copy()) for file_name, nci in self._data_ncis.items())
+        if ranges is not None:
+            tnci.set_ranges(ranges)
+        return tnci
+
+    def close(self):
+        """Release the NetCDF files used by this TidalNetCDFInterpolator, see NetCDFInterpolator.close(). After this
+        the tidal signal can still be computed and interpolated, but the ranges can no longer be changed."""
+        self.nci.close()
+        for nci in self._data_ncis.values():
+            nci.close()
+        self._data_ncis = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MultiRegionTidalInterpolator(object):
+    def __init__(self, tnci, ranges_list):
+        """Interpolate the tidal signal of a TidalNetCDFInterpolator tnci in several, possibly disjoint, regions
+        of its NetCDF grid, e.g. the regions around several separate domains. ranges_list is a list of ranges,
+        each specified as for TidalNetCDFInterpolator.set_ranges(). The tidal signal is only reconstructed
+        within these regions in set_time(). tnci is used for the first region, and copies of it for the others.
+        In get_val() and get_vals() each point is interpolated from the first region that contains it.
+        The regions can be changed with set_ranges(ranges_list), in which case only the values that are not
+        already within the corresponding previous region are read from file."""
+        self.tide = tnci.tide
+        self.regions = [tnci]
+        self.set_ranges(ranges_list)
+
+    def set_ranges(self, ranges_list):
+        """Change the ranges of the regions. The i-th region is moved to ranges_list[i], regions are added
+        or removed if the number of ranges has changed."""
+        if len(ranges_list) == 0:
+            raise ValueError("Need at least one region")
+        regions = []
+        for i, ranges in enumerate(ranges_list):
+            if i < len(self.regions):
+                self.regions[i].set_ranges(ranges)
+                regions.append(self.regions[i])
+            else:
+                regions.append(self.regions[0].copy(ranges))
+        # release the NetCDF files of the regions that are removed
+        for tnci in self.regions[len(ranges_list):]:
+            tnci.close()
+        self.regions = regions
+
+    def set_time(self, t):
+        """Set the time in seconds after the datetime specified by tide.set_initial_time(). Recomputes
+        the tidal signal in all regions."""
+        for tnci in self.regions:
+            tnci.set_time(t)
+
+    def _region_index(self, xs):
+        # the index of the first region that contains each point
+        index = numpy.full(len(xs), -1)
+        for i, tnci in reversed(list(enumerate(self.regions))):
+            index[tnci.in_ranges(xs)] = i
+        return index
+
+    def get_val(self, x, allow_extrapolation=False):
+        """Interpolates the tidal signal in point x, from the first region that contains it."""
+        i = self._region_index(numpy.array([x], dtype=float))[0]
+        if i < 0:
+            raise netcdf_reader.CoordinateError("Coordinate not within any of the regions", x, None, None)
+        return self.regions[i].get_val(x, allow_extrapolation)
+
+    def get_vals(self, xs, allow_extrapolation=False):
+        """Interpolates the tidal signal in many points at once, where xs is an array of shape (npoints, 2).
+        Each point is interpolated from the first region that contains it."""
+        xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        index = self._region_index(xs)
+        if numpy.any(index < 0):
+            k = numpy.nonzero(index < 0)[0][0]
+            raise netcdf_reader.CoordinateError("Coordinate not within any of the regions", tuple(xs[k]), None, None)
+        vals = numpy.empty(len(xs))
+        for i, tnci in enumerate(self.regions):
+            points = index == i
+            if numpy.any(points):
+                vals[points] = tnci.get_vals(xs[points], allow_extrapolation)
+        return vals
+
+    def close(self):
+        """Release the NetCDF files used by all regions."""
+        for tnci in self.regions:
+            tnci.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TidalVelocityInterpolator(object):
+    def __init__(self, tnci_u, tnci_v):
+        """Interpolate both components of the tidal velocity (or transport), given a TidalNetCDFInterpolator for
+        each component, e.g. as created by TPXOncTidalComponentInterpolator() (see also TPXOncTidalVelocityInterpolator()).
+        If both components are stored on the same grid with the same mask, the tidal signal of both components is
+        computed in a single pass in set_time() and the interpolation weights are only computed once. Otherwise (e.g. for
+        the C-grid of TPXO) the components are interpolated separately, but the NetCDF files are still opened only once.
+        The calling sequence is:
+
+            tvi.set_time(t)
+            uv = tvi.get_val(x)  # array of shape (2,)
+            uvs = tvi.get_vals(xs)  # array of shape (npoints, 2)
+
+        Tidal ellipse parameters of each constituent in the points xs are obtained with tvi.get_ellipse_parameters(xs),
+        or in all points of the grid with tvi.get_grid_ellipse_parameters()."""
+        self.components = (tnci_u, tnci_v)
+        self.tide = tnci_u.tide
+        self._update_shared()
+
+    def _update_shared(self):
+        tnci_u, tnci_v = self.components
+        if tnci_u.mask is None or tnci_v.mask is None:
+            same_mask = tnci_u.mask is None and tnci_v.mask is None
+        else:
+            same_mask = numpy.array_equal(tnci_u.mask, tnci_v.mask)
+        self.shared_grid = same_mask and tnci_u.nci.same_grid(tnci_v.nci)
+        self._prepared = None
+
+    def set_ranges(self, ranges):
+        """Set the ranges of both components, see TidalNetCDFInterpolator.set_ranges()."""
+        for tnci in self.components:
+            tnci.set_ranges(ranges)
+        self._update_shared()
+        if hasattr(self, "t"):
+            self.set_time(self.t)
+
+    def set_time(self, t):
+        """Set the time in seconds after the datetime specified by tide.set_initial_time(). Recomputes
+        the tidal signal of both components."""
+        self.t = t
+        if not self.shared_grid:
+            for tnci in self.components:
+                tnci.set_time(t)
+            return
+        tnci_u, tnci_v = self.components
+        if self._prepared is None:
+            self._prepared = PreparedTides(self.tide, numpy.stack([tnci_u.real_part, tnci_v.real_part], axis=1),
+                                           numpy.stack([tnci_u.imag_part, tnci_v.imag_part], axis=1))
+        self.val = self._prepared.evaluate(t)
+        self.interpolator = tnci_u.nci.create_interpolator(self.val[0], tnci_u.mask)
+
+    def get_val(self, x, allow_extrapolation=False):
+        """Interpolates both components of the tidal signal in point x. Returns an array of shape (2,)."""
+        return self.get_vals([x], allow_extrapolation)[0]
 
-def AMCGTidalInterpolator(tide, netcdf_file_name, ranges=None):
+    def get_vals(self, xs, allow_extrapolation=False):
+        """Interpolates both components of the tidal signal in many points at once, where xs is an array
+        of shape (npoints, 2). Returns an array of shape (npoints, 2)."""
+        if not hasattr(self, "t"):
+            raise Exception("Need to call set_time() first!")
+        if self.shared_grid:
+            stencil = self.interpolator.compute_stencil(self.components[0]._transform(xs), allow_extrapolation)
+            return stencil.apply(self.val)
+        return numpy.stack([tnci.get_vals(xs, allow_extrapolation) for tnci in self.components], axis=1)
+
+    def get_ellipse_parameters(self, xs, allow_extrapolation=False):
+        """Compute the tidal ellipse parameters, see ellipse.tidal_ellipse_parameters(), of each constituent in the points xs,
+        an array of shape (npoints, 2). Returns the major and minor radii, direction and phase as four arrays of
+        shape (npoints, nconstituents)."""
+        stencil = None
+        if self.shared_grid:
+            stencil = self.components[0].compute_stencil(xs, allow_extrapolation)
+        complex_components = []
+        for tnci in self.components:
+            complex_components += tnci.get_complex_components(xs, allow_extrapolation, stencil=stencil)
+        return ellipse.tidal_ellipse_parameters_from_complex(*complex_components)
+
+    def get_grid_ellipse_parameters(self, chunk_size=65536):
+        """Compute the tidal ellipse parameters of each constituent in all points of the (restricted) grid, see
+        ellipse.tidal_ellipse_parameters_from_complex(). Returns the major and minor radii, direction and phase as
+        four arrays of shape (nconstituents, n0, n1), where n0 and n1 are the dimensions of the grid in the order of
+        the dimensions of the NetCDF interpolators. The computation is done in chunks of chunk_size values. This requires both
+        components to be stored on the same grid."""
+        if not self.shared_grid:
+            raise Exception("The u and v components are not on the same grid, use get_ellipse_parameters() instead")
+        tnci_u, tnci_v = self.components
+        return ellipse.tidal_ellipse_parameters_from_complex(tnci_u.real_part, tnci_u.imag_part,
+                                                             tnci_v.real_part, tnci_v.imag_part, chunk_size=chunk_size)
+
+    def close(self):
+        """Release the NetCDF files of both components."""
+        for tnci in self.components:
+            tnci.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def AMCGTidalInterpolator(tide, netcdf_file_name, ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
     tnci = TidalNetCDFInterpolator(tide, netcdf_file_name,
                                    ('latitude', 'longitude'), ('latitude', 'longitude'),
-                                   ranges=ranges)
+                                   ranges=ranges, mmap=mmap, max_workers=max_workers, stats=stats, backend=backend, projection=projection)
     """Create a TidalNetCDFInterpolator based on the 'AMCG' storage conventions
     where amplitudes and phases are stored in separate fields in a single file
     with field names such as M2amp, M2phase, etc. If present a field named "mask"
@@ -201,18 +613,21 @@ def AMCGTidalInterpolator(tide, netcdf_file_name, ranges=None):
 
 
 def TPXOTidalInterpolator(tide, grid_file_name, data_file_name,
-                          ranges=None):
+                          ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
     """Create a TidalNetCDFInterpolator from OTPSnc NetCDF files, where
     the grid is stored in a separate file (with "lon_z", "lat_z" and "mz"
     fields). The actual data is read from a seperate file with hRe and hIm
     fields."""
     # read grid, ranges and mask from grid netCDF
     tnci = TidalNetCDFInterpolator(tide, grid_file_name,
-                                   ('nx', 'ny'), ('lon_z', 'lat_z'), ranges=ranges)
+                                   ('nx', 'ny'), ('lon_z', 'lat_z'), ranges=ranges, mmap=mmap,
+                                   max_workers=max_workers, stats=stats, backend=backend, projection=projection)
     if "mz" in tnci.nci.nc.variables:
         tnci.set_mask("mz")
     # now swap its nci (keeping all above information) with one for the data file
-    tnci.nci = netcdf_reader.NetCDFInterpolator(data_file_name, tnci.nci)
+    grid_nci = tnci.nci
+    tnci.nci = netcdf_reader.NetCDFInterpolator(data_file_name, grid_nci)
+    grid_nci.close()
 
     # constituents available in the netCDF file
     constituents = tnci.nci.nc.variables['con'][:]
@@ -226,7 +641,7 @@ def TPXOTidalInterpolator(tide, grid_file_name, data_file_name,
 
 
 def TPXOncTidalComponentInterpolator(tide, grid_file_name, data_file_name,
-                                     grid_field_name, field_name, ranges=None):
+                                     grid_field_name, field_name, ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
     """Create a TidalNetCDFInterpolator from OTPSnc NetCDF files, where
     the grid is stored in a separate file (with "lon_X", "lat_X" and "mX"
     fields), where X is velocity component u or v. The actual phase and amplitude data is read
@@ -236,12 +651,15 @@ def TPXOncTidalComponentInterpolator(tide, grid_file_name, data_file_name,
     tnci = TidalNetCDFInterpolator(tide, grid_file_name,
                                    ('nx', 'ny'),
                                    ('lon_{}'.format(grid_field_name),
-                                    'lat_{}'.format(grid_field_name)), ranges=ranges)
+                                    'lat_{}'.format(grid_field_name)), ranges=ranges, mmap=mmap,
+                                   max_workers=max_workers, stats=stats, backend=backend, projection=projection)
     mask_name = 'm{}'.format(grid_field_name)
     if mask_name in tnci.nci.nc.variables:
         tnci.set_mask(mask_name)
     # now swap its nci (keeping all above information) with one for the data file
-    tnci.nci = netcdf_reader.NetCDFInterpolator(data_file_name, tnci.nci)
+    grid_nci = tnci.nci
+    tnci.nci = netcdf_reader.NetCDFInterpolator(data_file_name, grid_nci)
+    grid_nci.close()
 
     # constituents available in the netCDF file
     constituents = tnci.nci.nc.variables['con'][:]
@@ -254,20 +672,34 @@ def TPXOncTidalComponentInterpolator(tide, grid_file_name, data_file_name,
     return tnci
 
 
+def TPXOncTidalVelocityInterpolator(tide, grid_file_name, data_file_name, transports=False,
+                                    ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
+    """Create a TidalVelocityInterpolator from OTPSnc NetCDF files for both the u and v components of
+    the velocity (or the transport if transports=True). The grids are read from the lon_u, lat_u, mu and
+    lon_v, lat_v, mv fields of the grid file, see TPXOncTidalComponentInterpolator()."""
+    # u and v share a single Stats object
+    stats = _stats(stats)
+    tncis = []
+    for component in ('u', 'v'):
+        field_name = component.upper() if transports else component
+        tncis.append(TPXOncTidalComponentInterpolator(tide, grid_file_name, data_file_name, component, field_name,
+                                                      ranges=ranges, mmap=mmap, max_workers=max_workers, stats=stats, backend=backend, projection=projection))
+    return TidalVelocityInterpolator(*tncis)
+
+
 # old name:
 OTPSncTidalInterpolator = TPXOTidalInterpolator
 OTPSncTidalComponentInterpolator = TPXOncTidalComponentInterpolator
 
 
-def FESTidalInterpolator(tide, fes_file_name, ranges=None):
+def FESTidalInterpolator(tide, fes_file_name, ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
     # read grid, ranges and mask from grid netCDF
     """Create a TidalNetCDFInterpolator from FES NetCDF files, where
     all constituents are stored in a single file. The amplitudes
     and phases are read from its Ha and Hg fields."""
     tnci = TidalNetCDFInterpolator(tide, fes_file_name,
-                                   ('Y', 'X'), ('lat', 'lon'), ranges=ranges)
+                                   ('Y', 'X'), ('lat', 'lon'), ranges=ranges, mmap=mmap, max_workers=max_workers, stats=stats, backend=backend, projection=projection)
     fill_value = tnci.nci.nc.variables['Ha'].missing_value
-    tnci.set_mask_from_fill_value('Ha', fill_value)
 
     # constituents available in the netCDF file
     constituents = tnci.nci.nc.variables['spectrum'][:]
@@ -275,12 +707,37 @@ def FESTidalInterpolator(tide, fes_file_name, ranges=None):
     constituent_index = dict(((constituent.tobytes().decode("utf-8").strip(' \x00').lower(), i) for i, constituent in enumerate(constituents)))
     # the indices of the requested constituents
     components = [constituent_index[constituent.lower()] for constituent in tide.constituents]
+    # the mask is derived from the amplitudes as they are loaded
     tnci.load_amplitudes_and_phases_block(fes_file_name, 'Ha', components,
-                                          fes_file_name, 'Hg', components)
+                                          fes_file_name, 'Hg', components, fill_value=fill_value)
+    return tnci
+
+
+def FES2014NetCDFTidalInterpolator(tide, fes_data_path, ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
+    """Create a TidalNetCDFInterpolator from the FES2014 NetCDF files, without the need for
+    the fes library (see FES2014TidalInterpolator). The files of the constituents in tide.constituents are
+    read from fes_data_path, with the same names as used by FES2014TidalInterpolator: e.g. m2.nc for M2, with "lat",
+    "lon", "amplitude" (in cm) and "phase" fields. The mask is derived from the fill value of the amplitude
+    field in the first of these files, if it has one (i.e. not for the extrapolated FES2014 solution).
+    As for FES2014TidalInterpolator, the coordinates are (lat, lon) with 0<lon<360, and
+    ranges may cross the periodic boundary at lon=0. Note that unlike FES2014TidalInterpolator,
+    only the constituents in tide.constituents are included, and not the equilibrium long period tide."""
+    file_names = [os.path.join(fes_data_path, constituent.lower() + '.nc') for constituent in tide.constituents]
+    tnci = TidalNetCDFInterpolator(tide, file_names[0], ('lat', 'lon'), ('lat', 'lon'),
+                                   ranges=ranges, mmap=mmap, max_workers=max_workers, stats=stats, backend=backend, projection=projection)
+    amplitude = tnci.nci.nc.variables['amplitude']
+    fill_value = None
+    for fill_value_attribute in ('_FillValue', 'missing_value'):
+        if hasattr(amplitude, fill_value_attribute):
+            fill_value = getattr(amplitude, fill_value_attribute)
+            break
+    n = len(file_names)
+    tnci.load_amplitudes_and_phases(file_names, ['amplitude']*n, file_names, ['phase']*n,
+                                    amplitude_scale=0.01, fill_value=fill_value)
     return tnci
 
 
-def FES2012TidalInterpolator(tide, fes_ini_file_name, fes_data_path=None, ranges=None):
+def FES2012TidalInterpolator(tide, fes_ini_file_name, fes_data_path=None, ranges=None, mmap=False, max_workers=None, stats=None, backend=None, projection=None):
     if fes_data_path is None:
         fes_data_path, tail = os.path.split(fes_ini_file_name)
     # remove double and trailing /s, change '' to '.':
@@ -292,7 +749,7 @@ def FES2012TidalInterpolator(tide, fes_ini_file_name, fes_data_path=None, ranges
     lon_name = first_entry['LONGITUDE']
     lat_name = first_entry['LATITUDE']
     tnci = TidalNetCDFInterpolator(tide, grid_file_name, (lon_name, lat_name),
-                                   (lon_name, lat_name), ranges=ranges)
+                                   (lon_name, lat_name), ranges=ranges, mmap=mmap, max_workers=max_workers, stats=stats, backend=backend, projection=projection)
 
     file_names = []
     amplitude_names = []
@@ -107,6 +107,95 @@ class Tides(object):
         return 2*numpy.pi/(self.omega[ind2]-self.omega[ind1])
 
 
+class PreparedTides(object):
+
+    """Evaluates the tide, for fixed real and imaginary parts of the constituents,
+    at many different times. The nodal corrections f and u and the Greenwich arguments phi of
+    the Tides object are folded into the complex components once, so that each evaluation only
+    requires a single contraction of the coefficients with cos(omega*t) and sin(omega*t).
+    The coefficients are recomputed automatically when the nodal corrections (or the initial time)
+    of the Tides object change.
+
+    The contraction is computed by one of the following engines:
+
+        dot    - numpy.dot, i.e. a BLAS matrix-vector (or, for many times, matrix-matrix) product (the default)
+        einsum - numpy.einsum, with its contraction path computed once (numpy.einsum_path) for each shape of times
+
+    Both avoid the temporary arrays of the size of the grid that Tides.from_complex_components() allocates for each
+    constituent. The result can be written into a preallocated array with evaluate(t, out=...)."""
+
+    engines = ('dot', 'einsum')
+
+    def __init__(self, tide, real_parts, imag_parts, engine='dot'):
+        """Prepare the evaluation of the tide for the real and imaginary parts
+        of the constituents of tide (the Tides object), see Tides.from_complex_components()."""
+        if engine not in self.engines:
+            raise ValueError("Unknown engine {}, should be one of: {}".format(engine, ', '.join(self.engines)))
+        self.tide = tide
+        self.real_parts = numpy.asarray(real_parts, dtype=float)
+        self.imag_parts = numpy.asarray(imag_parts, dtype=float)
+        self.shape = self.real_parts.shape[1:]
+        self.engine = engine
+        self.nodal = None
+        # einsum contraction paths for each shape of the time weights
+        self._einsum_paths = {}
+
+    @classmethod
+    def from_amplitude_phase(cls, tide, amplitudes, phases, engine='dot'):
+        """Prepare the evaluation of the tide for amplitudes and phases (in radians), see Tides.from_amplitude_phase()."""
+        amplitudes = numpy.asarray(amplitudes, dtype=float)
+        phases = numpy.asarray(phases, dtype=float)
+        return cls(tide, amplitudes*numpy.cos(phases), -amplitudes*numpy.sin(phases), engine=engine)
+
+    def _nodal_changed(self):
+        if self.nodal is None:
+            return True
+        return not all(numpy.array_equal(x, y) for x, y in zip(self.nodal, (self.tide.f, self.tide.phi, self.tide.u)))
+
+    def _fold(self):
+        """Compute coefficients such that the tide at time t is given by
+        cos(omega*t)*coefficients[:n] - sin(omega*t)*coefficients[n:] summed over the n constituents."""
+        tide = self.tide
+        self.nodal = (numpy.array(tide.f), numpy.array(tide.phi), numpy.array(tide.u))
+        scale = tide.f*numpy.exp(1j*(tide.phi+tide.u))
+        n = len(scale)
+        real_parts = self.real_parts.reshape(n, -1)
+        imag_parts = self.imag_parts.reshape(n, -1)
+        self.coefficients = numpy.concatenate([
+            scale.real[:, None]*real_parts - scale.imag[:, None]*imag_parts,
+            scale.real[:, None]*imag_parts + scale.imag[:, None]*real_parts])
+
+    def evaluate(self, t, out=None):
+        """Compute the tide at time t (seconds since the date+time set with tide.set_initial_time()).
+        If t is an array of times, an array of shape t.shape + self.shape is returned. The result may be
+        written into out, a C-contiguous float array of that shape, which is then returned."""
+        if self._nodal_changed():
+            self._fold()
+        t = numpy.asarray(t, dtype=float)
+        omegat = numpy.multiply.outer(t, self.tide.omega)
+        weights = numpy.concatenate([numpy.cos(omegat), -numpy.sin(omegat)], axis=-1)
+        shape = t.shape + self.shape
+        if out is None:
+            result = None
+        else:
+            if out.shape != shape or out.dtype != self.coefficients.dtype or not out.flags.c_contiguous:
+                raise ValueError("out should be a C-contiguous array of shape {} and dtype {}".format(
+                    shape, self.coefficients.dtype))
+            result = out.reshape(weights.shape[:-1] + self.coefficients.shape[1:])
+
+        if self.engine == 'dot':
+            result = numpy.dot(weights, self.coefficients, out=result)
+        else:
+            path = self._einsum_paths.get(weights.shape)
+            if path is None:
+                path = numpy.einsum_path('...k,kp->...p', weights, self.coefficients, optimize='optimal')[0]
+                self._einsum_paths[weights.shape] = path
+            result = numpy.einsum('...k,kp->...p', weights, self.coefficients, out=result, optimize=path)
+        if out is not None:
+            return out
+        return result.reshape(shape)[()]
+
+
 def select_constituents(constituents, period):
     """Select constituents according to Rayleigh criterion.
 
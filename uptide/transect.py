@@ -0,0 +1,82 @@
+"""Tidal signals along transects, polylines and mesh boundaries. A TransectTidalInterpolator computes the interpolation
+weights in all points of a transect, and interpolates the complex components of the constituents in these points, once.
+After that the tide is evaluated in all points at once, for one or many times, without interpolating again:
+
+    tnci = uptide.TPXOTidalInterpolator(tide, grid_file, data_file, ranges=ranges)
+    transect = uptide.transect.TransectTidalInterpolator.from_polyline(tnci, [(-3., 58.5), (-2., 59.)], spacing=0.01)
+    etas = transect.get_vals(t)  # in all points transect.xs at time t
+    etas = transect.get_vals_at_times(ts)  # array of shape (ntimes, npoints)
+
+or for the boundary nodes of a Gmsh mesh (see uptide.mesh), with physical ids 2, 3 and 4, or for points at a given
+spacing along these boundaries:
+
+    boundary = uptide.transect.TransectTidalInterpolator.from_gmsh(tnci, 'mesh.msh', [2, 3, 4], allow_extrapolation=True)
+    boundary = uptide.transect.TransectTidalInterpolator.from_gmsh(tnci, 'mesh.msh', [2, 3, 4], spacing=0.01)
+
+The coordinates of the points are in the same order as for tnci.get_vals(). Alternatively, points may be given in model
+coordinates (e.g. UTM) together with a projection (see uptide.projection), which converts them in bulk to the coordinates
+of tnci once, when the TransectTidalInterpolator is created:
+
+    projection = uptide.projection.UTM(30, 'V', order='lonlat')
+    boundary = uptide.transect.TransectTidalInterpolator.from_gmsh(tnci, 'mesh.msh', [2, 3, 4], projection=projection)"""
+import numpy
+from uptide.tides import PreparedTides
+
+
+def resample_polyline(vertices, spacing):
+    """Return points along the polyline through vertices, an array of shape (nvertices, 2), at equal distances
+    (measured along the polyline) of at most spacing, starting at the first and ending at the last vertex."""
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 2)
+    s = numpy.concatenate([[0.], numpy.cumsum(numpy.hypot(*numpy.diff(vertices, axis=0).T))])
+    n = max(int(numpy.ceil(s[-1]/spacing)), 1)
+    snew = numpy.linspace(0., s[-1], n+1)
+    return numpy.stack([numpy.interp(snew, s, vertices[:, 0]), numpy.interp(snew, s, vertices[:, 1])], axis=1)
+
+
+class TransectTidalInterpolator(object):
+    """Evaluates the tide of a TidalNetCDFInterpolator tnci in a fixed set of points xs, an array of shape (npoints, 2).
+    If a projection is provided, xs are in model coordinates, and their transformed coordinates are stored in
+    self.coordinates."""
+    def __init__(self, tnci, xs, allow_extrapolation=False, projection=None):
+        self.xs = numpy.asarray(xs, dtype=float).reshape(-1, 2)
+        if projection is None:
+            self.coordinates = self.xs
+        else:
+            self.coordinates = projection.transform(self.xs)
+        self.stencil = tnci.compute_stencil(self.coordinates, allow_extrapolation)
+        real_parts, imag_parts = tnci.get_complex_components(self.coordinates, stencil=self.stencil)
+        self.prepared = PreparedTides(tnci.tide, real_parts.T, imag_parts.T)
+
+    @classmethod
+    def from_polyline(cls, tnci, vertices, spacing, allow_extrapolation=False, projection=None):
+        """Create a TransectTidalInterpolator for points along the polyline through vertices, see resample_polyline().
+        With a projection, the polyline is resampled in model coordinates."""
+        return cls(tnci, resample_polyline(vertices, spacing), allow_extrapolation, projection)
+
+    @classmethod
+    def from_gmsh(cls, tnci, msh_file_name, physical_ids, allow_extrapolation=False, projection=None, spacing=None):
+        """Create a TransectTidalInterpolator for the nodes of the boundary segments with the given physical ids
+        of a Gmsh mesh, see uptide.mesh.read_boundary_nodes(). If a spacing is provided, the boundary segments are
+        instead joined into polylines (see uptide.mesh.read_boundary_polylines()), which are each resampled with
+        resample_polyline(). A polyline that starts where the previous one ends does not repeat that point. With a
+        projection, spacing is in model coordinates."""
+        from uptide import mesh
+        if spacing is None:
+            xs = mesh.read_boundary_nodes(msh_file_name, physical_ids)
+        else:
+            polylines = [resample_polyline(polyline, spacing)
+                         for polyline in mesh.read_boundary_polylines(msh_file_name, physical_ids)]
+            for i in range(1, len(polylines)):
+                # polylines that meet where the boundary branches share the vertex there
+                if numpy.array_equal(polylines[i][0], polylines[i-1][-1]):
+                    polylines[i] = polylines[i][1:]
+            xs = numpy.concatenate(polylines or [numpy.zeros((0, 2))])
+        return cls(tnci, xs, allow_extrapolation, projection)
+
+    def get_vals(self, t):
+        """Return the tide in all points at time t (in seconds after the datetime set with tide.set_initial_time())."""
+        return self.prepared.evaluate(t)
+
+    def get_vals_at_times(self, ts):
+        """Return the tide in all points at the times ts, as an array of shape (ntimes, npoints)."""
+        return self.prepared.evaluate(numpy.asarray(ts, dtype=float).reshape(-1))